@@ -4,14 +4,16 @@ from typing import Optional, Literal
 from pydantic import BaseModel, Field, root_validator
 from pydantic_yaml import parse_yaml_file_as
 from struct import pack
-from device import Device
+from .device import Device
 
 class KPZ101Config(BaseModel):
     """Configuration du KPZ101 (Pydantic v2 compatible)"""
 
     name: str = "KPZ101_default_controller"
     # Pydantic v2 => on remplace `regex` par `pattern`
-    serial_nm: str = Field(..., pattern=r"^29.*")  
+    # numéro de série, ou nom logique résolu par discovery (fichier `instruments`)
+    serial_nm: str = Field(..., pattern=r"^(29|[A-Za-z_]).*")
+    instruments: Optional[str] = None
     baudrate: int = 115200
 
     mode: Literal["open_loop", "closed_loop"] = "open_loop"
@@ -41,7 +43,11 @@ class KPZ101:
     def __init__(self, config_file="config_KPZ.yaml") -> None:
         print("=== DEBUG: Ctor KPZ101 called ===")
         self.conf = parse_yaml_file_as(KPZ101Config, config_file)
-        self.dev = Device(self.conf.serial_nm, self.conf.baudrate)
+        if self.conf.serial_nm.startswith("29"):
+            self.dev = Device(self.conf.serial_nm, self.conf.baudrate)
+        else:
+            from .discovery import DeviceRegistry
+            self.dev = DeviceRegistry(self.conf.instruments).device(self.conf.serial_nm, self.conf.baudrate, "KPZ101")
 
     def __enter__(self):
         self.dev.begin_connection()
@@ -3,15 +3,42 @@ from pydantic import BaseModel, field_validator, Field, ValidationInfo
 from pydantic_yaml import parse_yaml_file_as
 from apt_interface import VALID_BAUDRATES
 from struct import pack, unpack
-from typing import Iterable
+from typing import Iterable, NamedTuple, Optional
 from typing import Literal, Annotated
+import numpy as np
+
+# Réponse à la requête de lecture 0x07dd : en-tête (6 octets) + canal, lecture, réservé
+READING = np.dtype([("func", "<u2"), ("length", "<u2"), ("dest", "u1"), ("src", "u1"),
+                    ("chann", "<u2"), ("reading", "<i2"), ("reserved", "<u2")])
+
+
+class ReadingStats(NamedTuple):
+    mean: float
+    median: float
+    std: float
+    used: int       # lectures conservées
+    rejected: int   # lectures écartées (valeurs aberrantes)
+
+
+def reading_stats(readings: np.ndarray, reject: Optional[float] = 3.0) -> ReadingStats:
+    """Statistiques de lectures, sans celles à plus de `reject` écarts-types robustes de la médiane"""
+    median = float(np.median(readings))
+    kept = readings
+    if reject is not None and len(readings) > 2:
+        mad = 1.4826 * np.median(np.abs(readings - median))
+        if mad > 0:
+            kept = readings[np.abs(readings - median) <= reject * mad]
+    std = float(kept.std(ddof=1)) if len(kept) > 1 else 0.0
+    return ReadingStats(float(kept.mean()), median, std, len(kept), len(readings) - len(kept))
 
 
 class KSG101Config(BaseModel):
     """Description du fichier yaml"""
 
     name: str = "KPZ101_default_controller"
-    serial_nm: Annotated[str, Field(pattern=r"^59.*")]
+    # numéro de série, ou nom logique résolu par discovery (fichier `instruments`)
+    serial_nm: Annotated[str, Field(pattern=r"^(59|[A-Za-z_]).*")]
+    instruments: Optional[str] = None
     baudrate: VALID_BAUDRATES = 115200
     out: Literal["chann1", "chann2"] = "chann2"
     unit: Literal["pos", "volt", "force"]
@@ -24,7 +51,11 @@ class KSG101():
     def __init__(self, config_file="config_KSG.yaml") -> None:
         self.conf = parse_yaml_file_as(KSG101Config, config_file)
 
-        self.dev = Device(self.conf.serial_nm, self.conf.baudrate)
+        if self.conf.serial_nm.startswith("59"):
+            self.dev = Device(self.conf.serial_nm, self.conf.baudrate)
+        else:
+            from .discovery import DeviceRegistry
+            self.dev = DeviceRegistry(self.conf.instruments).device(self.conf.serial_nm, self.conf.baudrate, "KSG101")
 
     def __enter__(self) -> KSG101:
         print("test")
@@ -44,7 +75,7 @@ class KSG101():
 
         self.dev.write_with_data(0x07da, 14, data)
 
-    def get_io(self) -> None:
+    def get_io(self) -> tuple[int, int]:
         buffer = self.dev.read_data(0x07db, 20)
 
         data = unpack("HHHHHHHHHH", buffer)
@@ -52,6 +83,7 @@ class KSG101():
         out = data[4]
 
         print(f"{unit=}, {out=}")
+        return unit, out
 
 
     def get_reading(self) -> float:
@@ -61,10 +93,33 @@ class KSG101():
 
         return read
     
-    def get_max_travel(self) -> None:
+    def read_many(self, n: int) -> np.ndarray:
+        """n lectures demandées d'un bloc (coût proche d'une seule lecture), en counts"""
+        buffer = self.dev.read_data_many(0x07dd, READING.itemsize, n)
+
+        replies = np.frombuffer(buffer, dtype=READING, count=len(buffer) // READING.itemsize)
+        replies = replies[replies["func"] == 0x07de]
+        if len(replies) == 0:
+            raise IOError(f"No reading received from KSG101 {self.conf.serial_nm}")
+        return replies["reading"].astype(float)
+
+    def read_stats(self, n: int, reject: Optional[float] = 3.0) -> ReadingStats:
+        """
+        Statistiques de n lectures. Avec `reject`, les lectures à plus de `reject` écarts-types
+        robustes (1.4826 * écart absolu médian) de la médiane sont écartées.
+        """
+        return reading_stats(self.read_many(n), reject)
+
+    def read_mean(self, n: int, reject: Optional[float] = 3.0) -> float:
+        """Moyenne de n lectures sans les valeurs aberrantes (voir read_stats)"""
+        return self.read_stats(n, reject).mean
+
+    def get_max_travel(self) -> int:
         buffer = self.dev.read_data(0x0650, 10)
 
-        print(unpack("HHHHH", buffer)[4])
+        travel = unpack("HHHHH", buffer)[4]
+        print(travel)
+        return travel
     
     def zeroing(self) -> None:
         self.dev.write(0x0658, 0, 0)
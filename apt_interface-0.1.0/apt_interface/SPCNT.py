@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Acquisition des fréquences du compteur de photons Thorlabs SPCNT (VISA/SCPI).
+
+Les lectures sont faites par blocs de `block_size` échantillons, renvoyés sous forme
+de tableaux numpy avec un horodatage (time.monotonic) par bloc :
+  - mode "query" : une requête `MEAS:FREQ?` par échantillon, sans pause entre elles
+  - mode "bulk"  : le compteur est configuré pour mesurer `block_size` échantillons
+    puis le bloc est rapatrié en une seule requête (ASCII ou bloc binaire IEEE 488.2).
+    Les commandes dépendent du firmware et sont donc réglables dans le fichier yaml.
+
+Une ressource `SIM::SPCNT::...` ouvre un compteur simulé (voir spcnt_sim.py).
+"""
+
+import time
+from typing import Literal, NamedTuple, Optional
+
+import numpy as np
+from pydantic import BaseModel
+from pydantic_yaml import parse_yaml_file_as
+
+try:
+    import pyvisa
+except ImportError:  # compteur simulé ou scan sans compteur sur ce poste
+    pyvisa = None
+
+
+class SPCNTConfig(BaseModel):
+    """Description du fichier yaml"""
+
+    name: str = "SPCNT"
+    # ressource VISA, ou nom logique / numéro de série résolu par discovery
+    resource: str = "USB0::0x1313::0x8091::M01103986::INSTR"
+    instruments: Optional[str] = None  # fichier yaml des noms logiques
+    timeout_ms: int = 5000
+    block_size: int = 100
+    mode: Literal["query", "bulk"] = "query"
+
+    query: str = "MEAS:FREQ?"
+    # mode bulk ({n} est remplacé par block_size)
+    configure: list[str] = ["CONF:ARR:FREQ {n}"]
+    start: str = "INIT"
+    # requête qui ne répond qu'une fois le bloc acquis (None : attendre en rapatriant le bloc)
+    complete: Optional[str] = "*OPC?"
+    fetch: str = "FETC:ARR?"
+    binary: bool = False
+    datatype: str = "f"  # type des valeurs d'un bloc binaire (module struct)
+
+
+class FrequencyBlock(NamedTuple):
+    timestamp: float         # time.monotonic() à la fin de la lecture du bloc
+    duration: float          # durée d'acquisition + transfert du bloc (s)
+    frequencies: np.ndarray  # Hz
+
+
+def open_instrument(resource: str, timeout_ms: int = 5000):
+    """Ouvre une ressource VISA (ou le compteur simulé pour `SIM::...`)"""
+    if resource.startswith("SIM::"):
+        from .spcnt_sim import SimulatedCounter
+        return SimulatedCounter.from_resource(resource, timeout_ms)
+
+    if pyvisa is None:
+        raise ImportError(f"pyvisa is required to open {resource}")
+    rm = pyvisa.ResourceManager()
+    instr = rm.open_resource(resource)
+    instr.timeout = timeout_ms
+    return instr
+
+
+class SPCNT():
+    pass
+
+class SPCNT():
+
+    def __init__(self, config_file="config_SPCNT.yaml", conf: Optional[SPCNTConfig] = None) -> None:
+        self.conf = conf if conf is not None else parse_yaml_file_as(SPCNTConfig, config_file)
+        self.instr = None
+
+    def __enter__(self) -> SPCNT:
+        resource = self.conf.resource
+        if "::" in resource:
+            self.instr = open_instrument(resource, self.conf.timeout_ms)
+        else:
+            from .discovery import DeviceRegistry
+            self.instr = DeviceRegistry(self.conf.instruments).open(
+                resource, lambda found: open_instrument(found.url, self.conf.timeout_ms))
+        if self.conf.mode == "bulk":
+            for command in self.conf.configure:
+                self.instr.write(command.format(n=self.conf.block_size))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.instr.close()
+
+    def measure(self) -> float:
+        """Une seule mesure de fréquence (Hz)"""
+        return float(self.instr.query(self.conf.query))
+
+    def trigger(self) -> None:
+        """Lance l'acquisition d'un bloc (mode bulk), sans attendre le résultat"""
+        self.instr.write(self.conf.start)
+
+    def wait_complete(self) -> None:
+        """Attend la fin de l'acquisition lancée par trigger() (mode bulk), sans rapatrier le bloc"""
+        if self.conf.complete is not None:
+            self.instr.query(self.conf.complete)
+
+    def fetch_block(self) -> np.ndarray:
+        """Récupère le bloc lancé par trigger() (mode bulk)"""
+        if self.conf.binary:
+            frequencies = self.instr.query_binary_values(self.conf.fetch, datatype=self.conf.datatype,
+                                                         container=np.array)
+        else:
+            frequencies = self.instr.query_ascii_values(self.conf.fetch, container=np.array)
+        return np.asarray(frequencies, dtype=float)
+
+    def read_block(self) -> FrequencyBlock:
+        t0 = time.monotonic()
+
+        if self.conf.mode == "bulk":
+            self.trigger()
+            frequencies = self.fetch_block()
+        else:
+            frequencies = np.empty(self.conf.block_size)
+            for k in range(self.conf.block_size):
+                frequencies[k] = float(self.instr.query(self.conf.query))
+
+        t1 = time.monotonic()
+        return FrequencyBlock(t1, t1 - t0, np.asarray(frequencies, dtype=float))
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Commande `apt-interface` (sans interface graphique).
+
+    apt-interface scan conf/scan2d.yaml [autre_recette.yaml ...] [--trace trace.json]
+    apt-interface serve conf/stage_server.yaml
+    apt-interface multiscan platine1.yaml platine2.yaml [-o cartes.npz]
+    apt-interface latency conf/config_KSG_X.yaml [-n 200] [--latency-timer 2]
+
+Les recettes sont exécutées l'une après l'autre ; Ctrl+C arrête le scan en cours
+proprement (sortie des contrôleurs désactivée) et annule les suivants.
+"""
+
+import argparse
+import os
+import sys
+
+from pydantic_yaml import parse_yaml_file_as
+
+from .scan2d import Scan2DConfig, Scan2DRunner
+
+
+def scan(args: argparse.Namespace) -> int:
+    # validation de toutes les recettes avant de toucher au matériel
+    recipes = [(path, parse_yaml_file_as(Scan2DConfig, path)) for path in args.recipes]
+
+    for k, (path, config) in enumerate(recipes):
+        print(f"=== {path} -> {config.output}")
+        if args.trace is not None:
+            # une trace par recette : trace.json, trace_1.json, ...
+            root, ext = os.path.splitext(args.trace)
+            config.trace = args.trace if k == 0 else f"{root}_{k}{ext}"
+        runner = Scan2DRunner(config, progress_interval=args.progress)
+        try:
+            runner.run()
+        except KeyboardInterrupt:
+            print("\nInterruption clavier, scans suivants annulés.")
+            return 1
+    return 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    from .stage_server import serve as serve_stages
+
+    serve_stages(args.config)
+    return 0
+
+
+def multiscan(args: argparse.Namespace) -> int:
+    from .multistage import MultiStageScan, stage_names
+
+    recipes = {name: parse_yaml_file_as(Scan2DConfig, path)
+               for name, path in zip(stage_names(args.recipes), args.recipes)}
+    scan = MultiStageScan(recipes, progress_interval=args.progress)
+    jobs = scan.run()
+    if args.output is not None:
+        scan.save(args.output)
+        print(f"Cartes enregistrées dans {args.output}")
+    return 0 if all(job.status == "finished" for job in jobs.values()) else 1
+
+
+def latency(args: argparse.Namespace) -> int:
+    from .KSG101 import KSG101
+    from .latency import LatencyProfile, characterize
+
+    for path in args.configs:
+        with KSG101(path) as ksg:
+            profile = characterize(ksg.dev, args.n, latency_timer=args.latency_timer)
+        print(profile.summary_text())
+        print(f"  -> {LatencyProfile.path(profile.serial)}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="apt-interface")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = subparsers.add_parser("scan", help="scan 2D en boucle fermée à partir de recettes yaml")
+    scan_parser.add_argument("recipes", nargs="+", help="recettes yaml (paramètres de Scan2DConfig)")
+    scan_parser.add_argument("--progress", type=float, default=1.0,
+                             help="intervalle minimal entre deux affichages d'avancement (s)")
+    scan_parser.add_argument("--trace", help="enregistre la durée des phases de chaque point (Chrome trace JSON)")
+    scan_parser.set_defaults(func=scan)
+
+    serve_parser = subparsers.add_parser("serve", help="serveur partageant les platines entre plusieurs clients")
+    serve_parser.add_argument("config", help="fichier yaml (StageServerConfig)")
+    serve_parser.set_defaults(func=serve)
+
+    multiscan_parser = subparsers.add_parser("multiscan", help="scans simultanés, une recette et un processus par platine")
+    multiscan_parser.add_argument("recipes", nargs="+", help="une recette yaml (Scan2DConfig) par platine")
+    multiscan_parser.add_argument("--progress", type=float, default=5.0,
+                                  help="intervalle entre deux affichages d'avancement (s)")
+    multiscan_parser.add_argument("-o", "--output", help="enregistre les cartes de toutes les platines (.npz)")
+    multiscan_parser.set_defaults(func=multiscan)
+
+    latency_parser = subparsers.add_parser("latency", help="mesure la latence des requêtes de KSG101 (profil par numéro de série)")
+    latency_parser.add_argument("configs", nargs="+", help="fichiers yaml des KSG101")
+    latency_parser.add_argument("-n", type=int, default=200, help="allers-retours par requête")
+    latency_parser.add_argument("--latency-timer", type=int, help="règle d'abord le latency timer du FTDI (ms)")
+    latency_parser.set_defaults(func=latency)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Boucle fermée logicielle KPZ101 + KSG101 (sans dépendance Qt).
+
+Le KPZ101 est piloté en open_loop (tension) et la position est lue sur le KSG101.
+Ce module est partagé entre l'interface graphique (`prime.py`) et les scans
+sans affichage.
+"""
+
+import time
+from . import tracing
+from .KPZ101 import KPZ101
+from .KSG101 import KSG101
+
+# --- Paramètres "matériels" fixes ---
+MAX_TRAVEL_UM = 20.0     # Plage ~20 µm du piézo
+MAX_COUNTS = 32767       # Valeur max du KSG
+# COUNTS_PER_UM reste constant (utilisé pour la conversion)
+COUNTS_PER_UM = MAX_COUNTS / MAX_TRAVEL_UM  # ~1638
+
+
+# --- Fonctions de conversion ---
+def um_to_counts(um: float) -> float:
+    return um * COUNTS_PER_UM
+
+def counts_to_um(counts: float) -> float:
+    return counts / COUNTS_PER_UM
+
+
+# --- Fonction de déplacement avec boucle fermée ---
+def move_axis_to_um_closed_loop(kpz: KPZ101, ksg: KSG101, target_um: float,
+                                  gain: float, tol_um: float, sleep: float, max_iter: int,
+                                  update_callback=None, trace: str = "closed_loop",
+                                  n_avg: int = 1, reject: float = 3.0):
+    """
+    Déplace l'axe en boucle fermée jusqu'à atteindre target_um.
+
+    - gain       : facteur de correction.
+    - tol_um     : tolérance en µm.
+    - sleep      : délai entre itérations (en secondes).
+    - max_iter   : nombre maximum d'itérations.
+    - update_callback : fonction (ou None) appelée à chaque itération avec (lecture, iteration)
+    - trace      : nom de la phase enregistrée (avec le nombre d'itérations) si le traçage est actif
+    - n_avg      : si > 1, chaque lecture est la moyenne de n_avg lectures demandées d'un bloc
+                   (KSG101.read_mean, valeurs aberrantes écartées au-delà de `reject` écarts-types)
+    """
+    if n_avg > 1:
+        read = lambda: ksg.read_mean(n_avg, reject)
+    else:
+        read = ksg.get_reading
+    tracer = tracing.tracer
+    t_start = tracer.now()
+    target_counts = um_to_counts(target_um)
+    current_voltage = 0.0
+    kpz.set_output_voltage(current_voltage)
+    iteration = 0
+    tol_counts = tol_um * COUNTS_PER_UM
+    converged = False
+    while iteration < max_iter:
+        reading = read()
+        if update_callback is not None:
+            update_callback(reading, iteration)
+        error = target_counts - reading
+        if abs(error) < tol_counts:
+            converged = True
+            break
+        correction = gain * error
+        new_voltage = current_voltage + correction
+        new_voltage = max(0, min(75, new_voltage))
+        kpz.set_output_voltage(new_voltage)
+        current_voltage = new_voltage
+        time.sleep(sleep)
+        iteration += 1
+    if not converged:
+        # une seule lecture après la dernière correction, pour le rappel et le retour
+        reading = read()
+        if update_callback is not None:
+            update_callback(reading, iteration)
+    tracer.record(trace, t_start, arg=iteration)
+    return reading
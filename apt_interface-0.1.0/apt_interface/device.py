@@ -1,9 +1,19 @@
-from pyftdi.ftdi import Ftdi
-from struct import pack
-from time import sleep
+from pyftdi.ftdi import Ftdi, FtdiError
+from struct import pack, unpack_from
+from time import perf_counter, sleep
+from usb.core import USBError
+from typing import Optional
 import logging
 import sys
 
+from .latency import AdaptiveTiming, LatencyProfile
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceError(IOError):
+    pass
+
 class Device:
     pass
 
@@ -11,8 +21,8 @@ class Device:
     dest = 0x50
     src = 0x01
 
-    def __init__(self, sn: str, baud: int) -> None:
-        """Initialize the device"""
+    def __init__(self, sn: str, baud: int, registry=None, name: Optional[str] = None) -> None:
+        """Initialize the device (registry : discovery.DeviceRegistry qui a résolu le nom logique `name`)"""
         
         try:
             Ftdi.add_custom_product(Ftdi.DEFAULT_VENDOR, pid=0xfaf0) # watch udev rules !!!!
@@ -22,22 +32,149 @@ class Device:
         self.ftdi = Ftdi()
         self.sn = sn
         self.baud = baud
+        self.registry = registry
+        self.name = name
+        self.timing = AdaptiveTiming()
+        # nombre de reprises sur erreur de lecture, par méthode (voir recover)
+        self.recovery = {"resync": 0, "purge": 0, "retry": 0, "reopen": 0, "failed": 0}
 
     def begin_connection(self) -> None:
         """Begin connection with the device with the serial number sn"""
+        if self.registry is not None:
+            self.registry.open(self.name, self._connect)
+        else:
+            self._connect()
+
+    def _connect(self, found=None) -> None:
+        if found is not None:  # appareil trouvé par discovery
+            self.sn = found.serial
         self.url = "".join(["ftdi://ftdi:0xfaf0:", self.sn, "/1"])
         self.ftdi.open_from_url(url=self.url)
         self.ftdi.set_baudrate(self.baud)
 
+        profile = LatencyProfile.load(self.sn) # see latency.py (apt-interface latency)
+        if profile is not None:
+            self.timing.seed(profile)
+
     def __enter__(self) -> Device:
         self.begin_connection()
         return self
 
-    def read_data(self, func: bytes, size: int) -> bytes:
-        self.write(func, 0x00, 0x00) # request value
+    def read_data(self, func: bytes, size: int, retries: int = 2) -> bytes:
+        data = self._request(func, size)
+        if self.valid_reply(data, func, size):
+            return data
+        return self.recover(func, size, data, retries)
+
+    def _request(self, func: bytes, size: int) -> bytes:
+        try:
+            self.write(func, 0x00, 0x00) # request value
+            return self.receive(func, size) # get value
+        except (FtdiError, USBError) as e:
+            logger.warning("%s: USB error on request %#06x: %r", self.sn, func, e)
+            return b""
+
+    def valid_reply(self, data: bytes, func: bytes, size: int) -> bool:
+        """True si `data` est la réponse complète à la requête `func` (réponse = func + 1)"""
+        if len(data) != size:
+            return False
+        reply, length, dest, src = unpack_from("<HHBB", data)
+        if reply != func + 1 or src != self.dest:
+            return False
+        return size == 6 or (dest & 0x80 and length == size - 6)
+
+    def recover(self, func: bytes, size: int, data: bytes, retries: int = 2) -> bytes:
+        """
+        Reprise après une réponse absente, tronquée ou décalée, de la moins à la plus
+        coûteuse : recalage sur un en-tête valide dans ce qui a été reçu, vidage des
+        tampons et nouvelle requête (les requêtes de lecture sont sans effet sur
+        l'appareil), puis réouverture de la liaison USB. DeviceError si rien ne marche.
+        """
+        # 1. octets parasites devant la réponse : recalage sur l'en-tête
+        header = pack("<H", func + 1)
+        k = data.find(header, 1)
+        while k > 0:
+            frame = data[k:] + self.receive(func, size - (len(data) - k))
+            if self.valid_reply(frame, func, size):
+                self.recovery["resync"] += 1
+                logger.warning("%s: reply to %#06x resynchronized (%d bytes skipped)", self.sn, func, k)
+                return frame
+            k = data.find(header, k + 1)
 
-        sleep(.01) # if you encounter reception problem, please increase the duration 
-        return bytes(self.ftdi.read_data_bytes(size, attempt=3)) # get value
+        # 2. vidage des tampons (réponse tardive ou partielle) et nouvelle requête
+        for _ in range(retries):
+            self.purge()
+            self.recovery["retry"] += 1
+            data = self._request(func, size)
+            if self.valid_reply(data, func, size):
+                logger.warning("%s: request %#06x succeeded after purge and retry", self.sn, func)
+                return data
+
+        # 3. en dernier recours : réouverture de la liaison
+        self.reopen()
+        data = self._request(func, size)
+        if self.valid_reply(data, func, size):
+            return data
+        self.recovery["failed"] += 1
+        raise DeviceError(f"{self.sn}: no valid reply to request {func:#06x} ({len(data)}/{size} bytes)")
+
+    def purge(self) -> None:
+        """Vide les tampons RX/TX du FTDI"""
+        self.recovery["purge"] += 1
+        try:
+            self.ftdi.purge_buffers()
+        except (FtdiError, USBError) as e:
+            logger.warning("%s: purge failed: %r", self.sn, e)
+
+    def reopen(self) -> None:
+        """Ferme et rouvre la liaison USB (mêmes url et débit)"""
+        self.recovery["reopen"] += 1
+        logger.warning("%s: reopening USB link", self.sn)
+        try:
+            self.ftdi.close()
+        except (FtdiError, USBError):
+            pass
+        try:
+            self.ftdi.open_from_url(url=self.url)
+            self.ftdi.set_baudrate(self.baud)
+        except (FtdiError, USBError) as e:
+            logger.warning("%s: reopen failed: %r", self.sn, e)
+
+    def read_data_many(self, func: bytes, size: int, n: int) -> bytes:
+        """n requêtes envoyées d'un bloc, puis lecture des n réponses (n * size octets)"""
+        request = pack("<HBBBB", func, 0x00, 0x00, self.dest, self.src)
+        self.ftdi.write_data(request * n)
+        data = self.receive(func, size * n, n)
+        if len(data) == size * n and all(self.valid_reply(data[k:k + size], func, size)
+                                         for k in range(0, len(data), size)):
+            return data
+
+        # réponses manquantes ou décalées : vidage puis lectures une à une (avec reprise)
+        self.purge()
+        return b"".join(self.read_data(func, size) for _ in range(n))
+
+    def receive(self, func: bytes, size: int, n: int = 1) -> bytes:
+        """
+        Scrute la liaison jusqu'à recevoir `size` octets, avec délai et intervalle adaptés
+        aux latences mesurées pour `func` (voir latency.py). Renvoie ce qui a été reçu à
+        l'expiration du délai.
+        """
+        timing = self.timing
+        t0 = perf_counter()
+        deadline = t0 + n * timing.timeout(func)
+        sleep(timing.first_poll(func))
+        data = bytearray()
+        while True:
+            data += self.ftdi.read_data_bytes(size - len(data), attempt=1)
+            now = perf_counter()
+            if len(data) >= size:
+                if n == 1:
+                    timing.record(func, now - t0)
+                return bytes(data)
+            if now > deadline:
+                timing.record_timeout(func)
+                return bytes(data)
+            sleep(timing.poll(func))
     
     def write(self, func: bytes, param1: bytes, param2: bytes) -> bool:
         bytes_array = pack("<HBBBB", func, param1, param2, self.dest, self.src)
@@ -48,6 +185,10 @@ class Device:
 
         return self.ftdi.write_data(bytes_array) == (6 + data_length)
 
+    def send_raw(self, frame) -> int:
+        """Envoie une trame déjà construite (voir trajectory.py), sans aucune vérification"""
+        return self.ftdi.write_data(frame)
+
     def end_connection(self) -> None:
         """Close connection with the device"""
         self.ftdi.close()
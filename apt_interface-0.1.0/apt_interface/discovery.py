@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Découverte des instruments (APT via FTDI et VISA) avec cache.
+
+Les deux bus sont énumérés en parallèle et chaque appareil est classé d'après son
+numéro de série ou sa ressource VISA :
+  - 29xxxxxx          -> KPZ101
+  - 59xxxxxx          -> KSG101
+  - USB0::0x1313::... -> SPCNT (compteur Thorlabs)
+
+Le résultat est gardé dans un fichier JSON. Un nom logique (fichier yaml
+`nom: numéro de série`) est résolu depuis le cache sans parcourir les bus ; si le
+cache est trop ancien il est renvoyé quand même et rafraîchi en arrière-plan, et
+un appareil absent du cache déclenche une énumération complète. Si l'ouverture
+d'un appareil trouvé dans le cache échoue, son entrée est oubliée et les bus sont
+énumérés une fois de plus avant de réessayer (`DeviceRegistry.open`).
+
+KPZ101, KSG101 et SPCNT acceptent un nom logique à la place du numéro de série ou
+de la ressource VISA (`instruments:` donne le fichier des noms).
+
+    python -m apt_interface.discovery [--refresh]
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar, Union
+
+from pydantic import BaseModel
+from pydantic_yaml import parse_yaml_file_as
+from pyftdi.ftdi import Ftdi
+
+from .device import Device
+
+try:
+    import pyvisa
+except ImportError:  # pas de compteur VISA sur ce poste
+    pyvisa = None
+
+APT_PID = 0xfaf0
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "apt_interface", "devices.json")
+CACHE_TTL = 24 * 3600  # s
+
+T = TypeVar("T")
+
+
+class DiscoveredDevice(BaseModel):
+    serial: str
+    kind: str   # KPZ101, KSG101, SPCNT ou unknown
+    bus: str    # ftdi ou visa
+    url: str    # url pyftdi ou ressource VISA
+    description: str = ""
+
+
+def classify(serial: str, url: str = "") -> str:
+    if url.startswith("USB0::0x1313::"):
+        return "SPCNT"
+    if serial.startswith("29"):
+        return "KPZ101"
+    if serial.startswith("59"):
+        return "KSG101"
+    return "unknown"
+
+
+def enumerate_ftdi() -> list[DiscoveredDevice]:
+    try:
+        Ftdi.add_custom_product(Ftdi.DEFAULT_VENDOR, pid=APT_PID)
+    except ValueError:
+        pass  # déjà enregistré
+
+    devices = []
+    for desc, _ in Ftdi.list_devices():
+        if desc.sn is None:
+            continue
+        url = f"ftdi://ftdi:{desc.pid:#x}:{desc.sn}/1"
+        devices.append(DiscoveredDevice(serial=desc.sn, kind=classify(desc.sn), bus="ftdi", url=url,
+                                        description=desc.description or ""))
+    return devices
+
+
+def enumerate_visa() -> list[DiscoveredDevice]:
+    if pyvisa is None:
+        return []
+
+    devices = []
+    for resource in pyvisa.ResourceManager().list_resources():
+        # USB0::<vendor>::<product>::<numéro de série>::INSTR
+        fields = resource.split("::")
+        serial = fields[3] if resource.startswith("USB") and len(fields) > 3 else resource
+        devices.append(DiscoveredDevice(serial=serial, kind=classify(serial, resource), bus="visa",
+                                        url=resource))
+    return devices
+
+
+def scan_all() -> list[DiscoveredDevice]:
+    """Énumère les bus FTDI et VISA en parallèle"""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        ftdi = pool.submit(enumerate_ftdi)
+        visa = pool.submit(enumerate_visa)
+        return ftdi.result() + visa.result()
+
+
+class DeviceRegistry():
+
+    def __init__(self, names_file: Optional[str] = None, cache_file: str = CACHE_FILE,
+                 ttl: float = CACHE_TTL) -> None:
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.names = {}
+        if names_file is not None:
+            names = parse_yaml_file_as(dict[str, Union[str, int]], names_file)
+            self.names = {name: str(serial) for name, serial in names.items()}
+
+        self.devices: dict[str, DiscoveredDevice] = {}
+        self.scanned_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.scanned_at = cache.get("scanned_at", 0.0)
+        self.devices = {d["serial"]: DiscoveredDevice(**d) for d in cache.get("devices", [])}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        cache = {"scanned_at": self.scanned_at, "devices": [d.model_dump() for d in self.devices.values()]}
+        tmp = self.cache_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, self.cache_file)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.scanned_at < self.ttl
+
+    def refresh(self) -> list[DiscoveredDevice]:
+        """Énumération complète des bus et mise à jour du cache"""
+        devices = scan_all()
+        with self._lock:
+            self.devices = {d.serial: d for d in devices}
+            self.scanned_at = time.time()
+            self._save()
+        return devices
+
+    def _refresh_in_background(self) -> None:
+        if self._refreshing is None or not self._refreshing.is_alive():
+            self._refreshing = threading.Thread(target=self.refresh, daemon=True)
+            self._refreshing.start()
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        À appeler si l'ouverture d'un appareil du cache échoue : le cache est marqué
+        périmé et l'entrée de `name` oubliée (le prochain lookup énumère les bus)
+        """
+        with self._lock:
+            self.scanned_at = 0.0
+            if name is not None:
+                self.devices.pop(self.names.get(name, name), None)
+
+    def lookup(self, name: str) -> DiscoveredDevice:
+        """Résout un nom logique (ou directement un numéro de série)"""
+        serial = self.names.get(name, name)
+
+        with self._lock:
+            device = self.devices.get(serial)
+        if device is not None:
+            if not self.fresh:
+                self._refresh_in_background()
+            return device
+
+        self.refresh()
+        if serial not in self.devices:
+            raise KeyError(f"No connected device for {name!r} (serial {serial})")
+        return self.devices[serial]
+
+    def serial(self, name: str) -> str:
+        return self.lookup(name).serial
+
+    def resource(self, name: str) -> str:
+        """Ressource VISA (ou url pyftdi) de l'appareil"""
+        return self.lookup(name).url
+
+    def open(self, name: str, opener: Callable[[DiscoveredDevice], T]) -> T:
+        """
+        opener(appareil) ; si l'appareil venait du cache et que l'ouverture échoue
+        (débranché, autre port, autre ressource VISA), une nouvelle énumération est
+        faite et l'ouverture réessayée une fois
+        """
+        with self._lock:
+            cached = self.names.get(name, name) in self.devices
+        device = self.lookup(name)
+        try:
+            return opener(device)
+        except Exception as e:  # FtdiError, USBError, VisaIOError...
+            if not cached:
+                raise
+            print(f"Ouverture de {name!r} impossible ({e!r}), nouvelle recherche des appareils")
+            self.invalidate(name)
+            return opener(self.lookup(name))  # KeyError si l'appareil a disparu
+
+    def device(self, name: str, baud: int = 115200, kind: Optional[str] = None) -> Device:
+        """
+        Device APT (non connecté) correspondant au nom logique ; sa connexion passe
+        par `open` (nouvelle énumération si l'entrée du cache est périmée)
+        """
+        serial = self.names.get(name, name)
+        if kind is not None and classify(serial) != kind:
+            raise ValueError(f"{name!r} (serial {serial}) is not a {kind}")
+        return Device(serial, baud, registry=self, name=name)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Liste des appareils APT et VISA connectés")
+    parser.add_argument("--refresh", action="store_true", help="ignore le cache")
+    args = parser.parse_args()
+
+    registry = DeviceRegistry()
+    if args.refresh or not registry.devices:
+        registry.refresh()
+    for device in registry.devices.values():
+        print(f"{device.kind:8s} {device.serial:12s} {device.url}")
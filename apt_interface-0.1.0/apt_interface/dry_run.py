@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Exécution "à blanc" d'un scan : rejoue la trajectoire d'un `Scan` sur un modèle
+temporel paramétrable, sans matériel, pour estimer la durée avant de réserver
+la platine.
+
+Le coût d'un point est décomposé en phases :
+  - usb     : trames APT envoyées (une par axe) et lectures KSG101 (boucle fermée logicielle)
+  - move    : attente entre itérations de boucle fermée, ou déplacement en boucle fermée matérielle
+              (la boucle logicielle, `move_axis_to_um_closed_loop`, repart de 0 V à chaque
+              déplacement : chaque point est modélisé de l'origine jusqu'à sa consigne)
+  - settle  : temps de stabilisation après déplacement
+  - acquisition : mesure au point
+
+Exemple :
+
+    python -m apt_interface.dry_run conf/scan.yaml conf/scan_hilbert.yaml --feedback software
+"""
+
+import argparse
+from typing import Literal, Optional, get_args, get_origin
+
+import numpy as np
+from pydantic import BaseModel
+
+from .scan import Scan
+
+
+class TimingModel(BaseModel):
+    """Modèle temporel (durées en secondes, distances dans l'unité des coordonnées du scan)"""
+
+    message_latency: float = 0.001  # écriture d'une trame sur l'USB
+    read_latency: float = 0.012     # aller-retour d'une lecture (p50 mesuré par `apt-interface latency`)
+    settle_time: float = 0.0
+    acquisition_time: Optional[float] = None  # None => acquisition_time du scan
+
+    # "none" : open_loop, "hardware" : KPZ101 en closed_loop, "software" : boucle KPZ101 + KSG101
+    feedback: Literal["none", "hardware", "software"] = "none"
+
+    # boucle fermée matérielle : vitesse de déplacement (unités/s)
+    hardware_speed: float = 1000.0
+
+    # boucle fermée logicielle : fraction de l'erreur corrigée à chaque itération
+    convergence: float = 0.5
+    tol: float = 1.0
+    sleep: float = 0.01
+    max_iter: int = 200
+
+
+class TimingReport(BaseModel):
+    n_points: int
+    n_messages: int
+    n_reads: int
+    iterations: int
+    phases: dict[str, float]
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def __str__(self) -> str:
+        phases = ", ".join(f"{k}={v:.2f}s" for k, v in self.phases.items())
+        return (f"{self.n_points} points, {self.n_messages} trames, {self.n_reads} lectures, "
+                f"{self.iterations} itérations -> {self.total:.2f}s ({phases})")
+
+
+class DryRunExecutor():
+
+    def __init__(self, model: TimingModel = TimingModel()) -> None:
+        self.model = model
+
+    def iterations(self, step: np.ndarray) -> np.ndarray:
+        """Itérations de boucle fermée logicielle pour des pas donnés (erreur divisée
+        par 1/(1-convergence) à chaque itération jusqu'à passer sous la tolérance)"""
+        m = self.model
+        step = np.abs(step)
+        ratio = np.maximum(step, m.tol) / m.tol
+        n = np.ceil(np.log(ratio) / -np.log1p(-m.convergence))
+
+        return np.clip(n, 0, m.max_iter).astype(np.int64)
+
+    def run(self, scan: Scan) -> TimingReport:
+        m = self.model
+        coords = np.asarray(scan.coords, dtype=float).reshape(-1, 3)
+        used = ~np.isnan(coords).all(axis=0)
+        coords = coords[:, used]
+        n_points, n_axis = coords.shape
+
+        # pas par axe entre points successifs, le premier déplacement part de l'origine
+        steps = np.abs(np.diff(coords, axis=0, prepend=np.zeros((1, n_axis))))
+
+        n_messages = n_points * n_axis  # Scan.scan envoie une consigne par axe et par point
+        n_reads = 0
+        iterations = 0
+        move = 0.0
+
+        match m.feedback:
+            case "hardware":
+                # les axes se déplacent en même temps : on attend le plus lent
+                move = float(steps.max(axis=1, initial=0).sum()) / m.hardware_speed
+            case "software":
+                # les axes sont asservis l'un après l'autre, une lecture + une trame par itération ;
+                # chaque déplacement remet d'abord la sortie à 0 V et converge depuis l'origine
+                it = self.iterations(np.abs(coords))
+                iterations = int(it.sum())
+                n_messages += iterations
+                n_reads = iterations + n_points * n_axis  # une lecture de plus que d'itérations par déplacement
+                move = iterations * m.sleep
+
+        acquisition_time = scan.conf.acquisition_time if m.acquisition_time is None else m.acquisition_time
+
+        phases = {
+            "usb": n_messages * m.message_latency + n_reads * m.read_latency,
+            "move": move,
+            "settle": n_points * m.settle_time,
+            "acquisition": n_points * acquisition_time,
+        }
+
+        return TimingReport(n_points=n_points, n_messages=n_messages, n_reads=n_reads,
+                            iterations=iterations, phases=phases)
+
+    def compare(self, scans: dict[str, Scan]) -> dict[str, TimingReport]:
+        """Rapports triés du scan le plus rapide au plus lent"""
+        reports = {name: self.run(scan) for name, scan in scans.items()}
+        return dict(sorted(reports.items(), key=lambda item: item[1].total))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimation de la durée de scans sans matériel")
+    parser.add_argument("config_files", nargs="+", help="fichiers yaml de scan")
+    for name, field in TimingModel.model_fields.items():
+        if get_origin(field.annotation) is Literal:
+            options = {"choices": get_args(field.annotation)}
+        else:
+            options = {"type": float if field.default is None else type(field.default)}
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, default=field.default, **options)
+    args = parser.parse_args()
+
+    model = TimingModel(**{name: getattr(args, name) for name in TimingModel.model_fields})
+    scans = {config_file: Scan((None, None, None), config_file=config_file)
+             for config_file in args.config_files}
+
+    for name, report in DryRunExecutor(model).compare(scans).items():
+        print(f"{name}: {report}")
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Émulation d'un axe KPZ101 + KSG101 pour travailler sans matériel.
+
+`EmulatedFtdi` remplace l'objet pyftdi d'un `Device` : les trames APT écrites sont
+décodées et les requêtes (lecture de jauge, IO, course max) reçoivent une réponse
+au format du KSG101. Les deux contrôleurs d'un axe partagent une `EmulatedStage`
+(réponse du premier ordre à la tension, bruit de mesure).
+
+    stage = EmulatedStage()
+    kpz, ksg = emulated_axis("conf/config_KPZ_X.yaml", "conf/config_KSG_X.yaml", stage)
+    with ksg, kpz:
+        move_axis_to_um_closed_loop(kpz, ksg, 5.0, ...)
+"""
+
+import time
+from struct import pack, unpack_from
+from typing import Optional
+
+import numpy as np
+
+from .KPZ101 import KPZ101
+from .KSG101 import KSG101
+from .closed_loop import MAX_COUNTS
+
+
+class EmulatedStage():
+
+    def __init__(self, voltage_limit: float = 75.0, time_constant: float = 0.002,
+                 noise_counts: float = 2.0, gain: float = 1.0, seed=None) -> None:
+        self.voltage_limit = voltage_limit
+        self.time_constant = time_constant  # s
+        self.noise_counts = noise_counts
+        self.gain = gain                    # course réelle / course nominale
+        self.rng = np.random.default_rng(seed)
+
+        self.voltage = 0.0
+        self.position = 0.0   # counts
+        self.offset = 0.0     # zéro de la jauge
+        self.t = time.monotonic()
+
+    def _advance(self) -> None:
+        now = time.monotonic()
+        target = self.gain * MAX_COUNTS * self.voltage / self.voltage_limit
+        if self.time_constant > 0:
+            self.position = target + (self.position - target) * np.exp(-(now - self.t) / self.time_constant)
+        else:
+            self.position = target
+        self.t = now
+
+    def set_voltage(self, voltage: float) -> None:
+        self._advance()
+        self.voltage = voltage
+
+    def zero(self) -> None:
+        self._advance()
+        self.offset = self.position
+
+    def reading(self) -> int:
+        self._advance()
+        value = self.position - self.offset + self.rng.normal(0.0, self.noise_counts)
+        return int(max(-32768, min(32767, round(value))))
+
+
+class EmulatedFtdi():
+    """Mêmes méthodes que pyftdi.ftdi.Ftdi pour ce qu'utilise Device"""
+
+    dest = 0x01
+    src = 0x50
+
+    def __init__(self, stage: Optional[EmulatedStage] = None, voltage_limit: float = 75.0) -> None:
+        self.stage = stage if stage is not None else EmulatedStage(voltage_limit)
+        self.voltage_limit = voltage_limit
+        self.rx = bytearray()   # octets en attente de lecture par l'hôte
+        self.frames = 0
+        self.latency_timer = 16  # ms, valeur par défaut des FTDI
+        # défauts injectés dans les réponses suivantes : "drop" (perdue), "garbage"
+        # (octets parasites devant), "truncate" (fin manquante)
+        self.faults: list[str] = []
+
+    def open_from_url(self, url: str) -> None:
+        self.url = url
+
+    def set_baudrate(self, baudrate: int) -> None:
+        self.baudrate = baudrate
+
+    def close(self) -> None:
+        pass
+
+    def get_latency_timer(self) -> int:
+        return self.latency_timer
+
+    def set_latency_timer(self, latency: int) -> None:
+        self.latency_timer = latency
+
+    def purge_buffers(self) -> None:
+        self.rx.clear()
+
+    def _reply(self, func: int, data: bytes) -> None:
+        frame = pack("<HHBB", func, len(data), self.dest | 0x80, self.src) + data
+        fault = self.faults.pop(0) if self.faults else None
+        if fault == "drop":
+            return
+        if fault == "garbage":
+            frame = b"\x13\x37\x00" + frame
+        elif fault == "truncate":
+            frame = frame[:-4]
+        self.rx += frame
+
+    def write_data(self, data: bytes) -> int:
+        data = bytes(data)
+        k = 0
+        while k + 6 <= len(data):
+            func, length = unpack_from("<HH", data, k)
+            if data[k + 4] & 0x80:  # trame longue : 6 octets d'en-tête + length octets
+                self._handle(func, data[k + 6:k + 6 + length])
+                k += 6 + length
+            else:
+                self._handle(func, b"")
+                k += 6
+            self.frames += 1
+        return len(data)
+
+    def _handle(self, func: int, payload: bytes) -> None:
+        match func:
+            case 0x0643:  # PZ_SET_OUTPUTVOLTS
+                _, value = unpack_from("<Hh", payload)
+                self.stage.set_voltage(value * self.voltage_limit / 32767)
+            case 0x0658:  # zéro de la jauge
+                self.stage.zero()
+            case 0x07dd:  # lecture de la jauge
+                self._reply(0x07de, pack("<HhH", 0x0001, self.stage.reading(), 0))
+            case 0x07db:  # IO du KSG101
+                self._reply(0x07dc, pack("<7H", 0x0001, 0x02, 0x01, 0, 0x7530, 0, 0))
+            case 0x0650:  # course maximale
+                self._reply(0x0651, pack("<HH", 0x0001, 200))
+
+    def read_data_bytes(self, size: int, attempt: int = 1) -> bytearray:
+        data = self.rx[:size]
+        del self.rx[:size]
+        return data
+
+
+def emulated_axis(kpz_config: str, ksg_config: str,
+                  stage: Optional[EmulatedStage] = None) -> tuple[KPZ101, KSG101]:
+    """KPZ101 et KSG101 (non connectés) branchés sur la même platine émulée"""
+    kpz = KPZ101(kpz_config)
+    ksg = KSG101(ksg_config)
+    stage = stage if stage is not None else EmulatedStage(kpz.conf.voltage_limit)
+    kpz.dev.ftdi = EmulatedFtdi(stage, kpz.conf.voltage_limit)
+    ksg.dev.ftdi = EmulatedFtdi(stage)
+    return kpz, ksg
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Histogramme à classes fixes pour les fréquences lues sur le SPCNT.
+
+Les classes couvrent une fenêtre fixe ([-50, 1050] Hz par défaut) par pas de
+`bin_size` ; chaque échantillon coûte un seul incrément dans un tableau numpy
+préalloué. Les valeurs hors fenêtre (et les NaN, mesures manquées) sont seulement
+comptées.
+"""
+
+import numpy as np
+
+
+class FixedBinHistogram():
+
+    def __init__(self, low: float = -50, high: float = 1050, bin_size: float = 10) -> None:
+        # classes alignées sur les multiples de bin_size (comme `frequency // bin_size`)
+        self.bin_size = bin_size
+        self.low = np.floor(low / bin_size) * bin_size
+        n_bins = int(np.ceil((high - self.low) / bin_size))
+        self.bins = self.low + bin_size * np.arange(n_bins)
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.total = 0
+        self.out_of_range = 0
+
+    def add(self, frequency: float) -> None:
+        with np.errstate(invalid="ignore"):  # NaN et ±inf donnent NaN : hors fenêtre
+            index = np.floor_divide(frequency - self.low, self.bin_size)
+        if 0 <= index < len(self.counts):
+            self.counts[int(index)] += 1
+        else:
+            self.out_of_range += 1
+        self.total += 1
+
+    def add_many(self, frequencies: np.ndarray) -> None:
+        with np.errstate(invalid="ignore"):
+            index = np.floor_divide(np.asarray(frequencies, dtype=float) - self.low, self.bin_size)
+        inside = (index >= 0) & (index < len(self.counts))
+        self.counts += np.bincount(index[inside].astype(np.int64), minlength=len(self.counts))
+        self.out_of_range += int(len(index) - inside.sum())
+        self.total += len(index)
+
+    def proportions(self) -> np.ndarray:
+        """Proportion (%) de chaque classe parmi tous les échantillons (hors fenêtre inclus)"""
+        counts = self.counts.copy()  # lecture pendant que le thread d'acquisition écrit
+        total = max(self.total, counts.sum())
+        if total == 0:
+            return np.zeros(len(counts))
+        return counts / total * 100
+
+    def clear(self) -> None:
+        self.counts[:] = 0
+        self.total = 0
+        self.out_of_range = 0
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Scan 2D dans un processus séparé de l'interface graphique.
+
+Tout le trafic Device/KPZ101/KSG101 et la boucle de scan tournent dans un processus
+dédié : le rendu pyqtgraph ne dispute plus le GIL à la boucle fermée (SLEEP,
+SETTLE_TIME). Les résultats passent par des anneaux en mémoire partagée
+(`multiprocessing.shared_memory`) que l'interface lit avec la même interface que
+`BlockChannel` (append / drain / len) ; pause et arrêt passent par un pipe.
+
+    process = ScanProcess(Scan2DConfig(...))
+    process.start()
+    ... process.channel.points.drain() sur le timer de l'interface ...
+    status, detail = process.wait()
+    process.close()
+"""
+
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from .scan2d import Scan2DConfig, Scan2DRunner
+
+HEADER = 16  # nombre de lignes écrites et capacité (int64)
+
+
+class SharedRing():
+    """
+    Anneau de lignes float64 en mémoire partagée, un seul écrivain et un seul lecteur.
+
+    L'écrivain copie la ligne puis incrémente le compteur ; le lecteur ne lit que les
+    lignes déjà comptées. Si le lecteur a plus de `capacity` lignes de retard, les plus
+    anciennes sont perdues (comptées dans `lost`).
+    """
+
+    def __init__(self, width: int, capacity: int = 0, name: Optional[str] = None) -> None:
+        """Crée le segment, ou s'attache au segment `name` (la capacité est lue dans l'en-tête)"""
+        self.width = width
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER + 8 * width * capacity)
+        else:
+            # le processus lancé en spawn partage le resource_tracker du créateur,
+            # seul responsable de la suppression du segment (close -> unlink)
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.owner = name is None
+
+        self._header = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self._header[:] = (0, capacity)
+        self.capacity = int(self._header[1])
+        self._written = self._header[:1]
+        self._rows = np.ndarray((self.capacity, width), dtype=np.float64, buffer=self.shm.buf, offset=HEADER)
+        self.read = 0
+        self.lost = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def readonly(self) -> None:
+        """Côté lecteur : interdit toute écriture dans le segment"""
+        self._header.flags.writeable = False
+        self._written = self._header[:1]
+        self._rows.flags.writeable = False
+
+    def append(self, *row: float) -> None:
+        k = int(self._written[0])
+        self._rows[k % self.capacity] = row
+        self._written[0] = k + 1
+
+    def drain(self) -> np.ndarray:
+        written = int(self._written[0])
+        n = written - self.read
+        if n > self.capacity:
+            self.lost += n - self.capacity
+            self.read = written - self.capacity
+        block = self._rows[np.arange(self.read, written) % self.capacity]
+        self.read = written
+        return block
+
+    def __len__(self) -> int:
+        return int(self._written[0]) - self.read
+
+    def close(self) -> None:
+        # les tableaux numpy doivent être libérés avant de fermer le segment
+        del self._header, self._written, self._rows
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedScanChannel():
+    """Équivalent de ScanChannel en mémoire partagée"""
+
+    def __init__(self, n_points: int = 0, convergence_capacity: int = 65536,
+                 names: Optional[tuple[str, str]] = None) -> None:
+        """Crée les anneaux, ou s'y attache si `names` est donné"""
+        names = names if names is not None else (None, None)
+        # un emplacement par point : la carte n'est jamais tronquée
+        self.points = SharedRing(3, max(n_points, 1), names[0])
+        self.convergence = SharedRing(2, convergence_capacity, names[1])
+
+    @property
+    def names(self) -> tuple[str, str]:
+        return self.points.name, self.convergence.name
+
+    def readonly(self) -> None:
+        self.points.readonly()
+        self.convergence.readonly()
+
+    def close(self) -> None:
+        self.points.close()
+        self.convergence.close()
+
+
+def _io_main(config: dict, names: tuple[str, str], conn, progress_interval: float = 1.0) -> None:
+    """Processus d'acquisition"""
+    channel = SharedScanChannel(names=names)
+    runner = Scan2DRunner(Scan2DConfig(**config),
+                          on_point=channel.points.append,
+                          on_convergence=channel.convergence.append,
+                          progress_interval=progress_interval)
+
+    def listen() -> None:
+        while True:
+            try:
+                command = conn.recv()
+            except EOFError:  # l'interface a disparu
+                runner.stop()
+                return
+            if command == "pause":
+                runner.toggle_pause()
+            elif command == "stop":
+                runner.stop()
+                return
+
+    threading.Thread(target=listen, daemon=True).start()
+    try:
+        runner.run()
+        conn.send(("finished", None))
+    except Exception as e:
+        conn.send(("error", repr(e)))
+    finally:
+        channel.close()
+
+
+class ScanProcess():
+
+    def __init__(self, config: Scan2DConfig, convergence_capacity: int = 65536,
+                 progress_interval: float = 1.0) -> None:
+        self.config = config
+        self.nx = config.nx
+        self.ny = config.ny
+        self.channel = SharedScanChannel(self.nx * self.ny, convergence_capacity)
+        self._paused = False
+
+        # spawn : pas de fork d'un processus qui a déjà des threads Qt
+        context = multiprocessing.get_context("spawn")
+        self._conn, child = context.Pipe()
+        self.process = context.Process(target=_io_main,
+                                       args=(config.model_dump(), self.channel.names, child, progress_interval),
+                                       daemon=True)
+
+    def start(self) -> None:
+        self.process.start()
+
+    def _send(self, command: str) -> None:
+        try:
+            self._conn.send(command)
+        except (BrokenPipeError, OSError):
+            pass  # processus déjà terminé
+
+    def toggle_pause(self) -> None:
+        self._paused = not self._paused
+        self._send("pause")
+
+    def stop(self) -> None:
+        self._send("stop")
+
+    def poll(self, timeout: float = 0.0) -> Optional[tuple[str, Optional[str]]]:
+        """Statut final si le scan est terminé ("finished", None) ou ("error", détail), sinon None"""
+        try:
+            if self._conn.poll(timeout):
+                status = self._conn.recv()
+                self.process.join()
+                return status
+        except EOFError:
+            pass  # processus terminé sans réponse
+        if not self.process.is_alive():
+            self.process.join()
+            try:
+                if self._conn.poll():  # statut envoyé juste avant la fin du processus
+                    return self._conn.recv()
+            except EOFError:
+                pass
+            return "error", f"acquisition process exited with code {self.process.exitcode}"
+        return None
+
+    def wait(self) -> tuple[str, Optional[str]]:
+        """Attend la fin du scan, renvoie ("finished", None) ou ("error", détail)"""
+        while True:
+            status = self.poll(0.1)
+            if status is not None:
+                return status
+
+    def close(self) -> None:
+        self.process.join(timeout=1)
+        self.channel.close()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Latence des échanges requête/réponse avec les contrôleurs APT.
+
+`characterize` mesure, pour un appareil, la distribution des allers-retours de
+chaque type de requête (0x07dd, 0x07db, 0x0650 par défaut) ainsi que le
+« latency timer » du FTDI, et l'enregistre par numéro de série dans
+~/.cache/apt_interface/latency/<série>.json :
+
+    apt-interface latency conf/config_KSG_X.yaml [-n 500] [--latency-timer 2]
+
+`AdaptiveTiming` remplace l'attente fixe de `Device.read_data` : le délai
+d'expiration et l'intervalle de scrutation de chaque requête sont calculés à partir
+des centiles des dernières latences observées (profil enregistré au démarrage, puis
+mesures faites pendant l'utilisation), et s'allongent d'eux-mêmes après une
+expiration.
+"""
+
+import json
+import os
+import time
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "apt_interface", "latency")
+
+# requête -> taille de la réponse (octets)
+REQUESTS = {0x07dd: 12, 0x07db: 20, 0x0650: 10}
+
+
+class LatencyStats(BaseModel):
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    timeouts: int = 0
+    samples: list[float]  # s, gardées pour réamorcer AdaptiveTiming
+
+
+class LatencyProfile(BaseModel):
+    serial: str
+    measured_at: float
+    latency_timer_ms: Optional[int] = None
+    requests: dict[int, LatencyStats]
+
+    @staticmethod
+    def path(serial: str, cache_dir: str = CACHE_DIR) -> str:
+        return os.path.join(cache_dir, f"{serial}.json")
+
+    @classmethod
+    def load(cls, serial: str, cache_dir: str = CACHE_DIR) -> Optional["LatencyProfile"]:
+        try:
+            with open(cls.path(serial, cache_dir)) as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, cache_dir: str = CACHE_DIR) -> str:
+        path = self.path(self.serial, cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.model_dump(), f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+    def summary_text(self) -> str:
+        lines = [f"{self.serial} (latency timer {self.latency_timer_ms} ms)"]
+        for func, s in self.requests.items():
+            lines.append(f"  {func:#06x}  p50 {1e3 * s.p50:7.3f} ms  p90 {1e3 * s.p90:7.3f} ms  "
+                         f"p99 {1e3 * s.p99:7.3f} ms  max {1e3 * s.max:7.3f} ms  "
+                         f"({len(s.samples)} mesures, {s.timeouts} expirations)")
+        return "\n".join(lines)
+
+
+class Window():
+    """Dernières latences d'une requête (anneau numpy), centiles recalculés à la demande"""
+
+    def __init__(self, size: int) -> None:
+        self.values = np.zeros(size)
+        self.count = 0
+        self._quantiles = None
+
+    def add(self, value: float) -> None:
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+        self._quantiles = None
+
+    def quantiles(self) -> Optional[np.ndarray]:
+        """(p5, p50, p90, p99) ou None si aucune mesure"""
+        if self.count == 0:
+            return None
+        if self._quantiles is None:
+            self._quantiles = np.quantile(self.values[:min(self.count, len(self.values))], (.05, .5, .9, .99))
+        return self._quantiles
+
+
+class AdaptiveTiming():
+    """
+    Délai d'expiration et scrutation des réponses, par requête :
+      - première scrutation après `first_fraction` du p5 (rien à lire avant)
+      - puis une scrutation toutes les `poll_fraction` * p50, bornée à [min_poll, max_poll]
+      - expiration à `margin` * p99, bornée à [min_timeout, max_timeout]
+    Sans mesure, `default_timeout` et `max_poll`. Chaque expiration double le délai
+    de la requête (jusqu'à `max_scale` fois), chaque réponse reçue le ramène de 1 %
+    vers sa valeur nominale : une réponse perdue isolée ne coûte qu'un délai court,
+    une liaison durablement plus lente allonge vite le délai.
+    """
+
+    def __init__(self, window: int = 256, margin: float = 3.0, first_fraction: float = 0.8,
+                 poll_fraction: float = 0.1, min_poll: float = 1e-4, max_poll: float = 2e-3,
+                 min_timeout: float = 5e-3, max_timeout: float = 0.5, default_timeout: float = 0.1,
+                 max_scale: float = 16.0) -> None:
+        self.window = window
+        self.margin = margin
+        self.first_fraction = first_fraction
+        self.poll_fraction = poll_fraction
+        self.min_poll, self.max_poll = min_poll, max_poll
+        self.min_timeout, self.max_timeout = min_timeout, max_timeout
+        self.default_timeout = default_timeout
+        self.max_scale = max_scale
+        self.latencies: dict[int, Window] = {}
+        self.timeouts: dict[int, int] = {}
+        self.scales: dict[int, float] = {}
+
+    def _window(self, func: int) -> Window:
+        if func not in self.latencies:
+            self.latencies[func] = Window(self.window)
+        return self.latencies[func]
+
+    def seed(self, profile: LatencyProfile) -> None:
+        """Amorce les fenêtres avec les mesures d'un profil enregistré"""
+        for func, stats in profile.requests.items():
+            window = self._window(int(func))
+            for value in stats.samples[-self.window:]:
+                window.add(value)
+
+    def record(self, func: int, latency: float) -> None:
+        self._window(func).add(latency)
+        if func in self.scales:
+            self.scales[func] = max(1.0, 0.99 * self.scales[func])
+
+    def record_timeout(self, func: int) -> None:
+        self.timeouts[func] = self.timeouts.get(func, 0) + 1
+        self.scales[func] = min(self.max_scale, 2 * self.scales.get(func, 1.0))
+
+    def first_poll(self, func: int) -> float:
+        q = self._window(func).quantiles()
+        return 0.0 if q is None else self.first_fraction * q[0]
+
+    def poll(self, func: int) -> float:
+        q = self._window(func).quantiles()
+        if q is None:
+            return self.max_poll
+        return min(self.max_poll, max(self.min_poll, self.poll_fraction * q[1]))
+
+    def timeout(self, func: int) -> float:
+        q = self._window(func).quantiles()
+        nominal = self.default_timeout if q is None else max(self.min_timeout, self.margin * q[3])
+        return min(self.max_timeout, nominal * self.scales.get(func, 1.0))
+
+
+def characterize(device, n: int = 200, requests: dict[int, int] = REQUESTS,
+                 latency_timer: Optional[int] = None, timeout: float = 1.0) -> LatencyProfile:
+    """
+    Mesure `n` allers-retours par requête sur un Device connecté (scrutation continue,
+    sans attente fixe), enregistre le profil et l'applique à `device.timing`.
+    """
+    ftdi = device.ftdi
+    if latency_timer is not None:
+        ftdi.set_latency_timer(latency_timer)
+    ftdi.read_data_bytes(4096, attempt=1)  # octets en attente d'un échange précédent
+
+    stats = {}
+    for func, size in requests.items():
+        samples = []
+        timeouts = 0
+        for _ in range(n):
+            data = bytearray()
+            t0 = time.perf_counter()
+            device.write(func, 0x00, 0x00)
+            while len(data) < size and time.perf_counter() - t0 < timeout:
+                data += ftdi.read_data_bytes(size - len(data), attempt=1)
+            if len(data) < size:
+                timeouts += 1
+                ftdi.read_data_bytes(4096, attempt=1)
+            else:
+                samples.append(time.perf_counter() - t0)
+        if not samples:
+            raise TimeoutError(f"No answer from {device.sn} to request {func:#06x}")
+        p50, p90, p99 = np.quantile(samples, (.5, .9, .99))
+        stats[func] = LatencyStats(p50=p50, p90=p90, p99=p99, max=max(samples), timeouts=timeouts,
+                                   samples=[round(s, 7) for s in samples])
+
+    profile = LatencyProfile(serial=device.sn, measured_at=time.time(),
+                             latency_timer_ms=ftdi.get_latency_timer(), requests=stats)
+    profile.save()
+    device.timing.seed(profile)
+    return profile
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Structures à coût constant pour l'affichage en direct d'un scan :
+  - RingBuffer   : historique de taille fixe (courbe de convergence)
+  - RunningStats : moyenne, écart-type (Welford), min/max et moyennes par ligne
+"""
+
+import numpy as np
+
+
+class RingBuffer():
+
+    def __init__(self, capacity: int) -> None:
+        self._data = np.zeros(capacity)
+        self._start = 0
+        self._count = 0
+        self.total = 0  # nombre de valeurs ajoutées depuis clear()
+
+    def clear(self) -> None:
+        self._start = 0
+        self._count = 0
+        self.total = 0
+
+    def append(self, value: float) -> None:
+        capacity = len(self._data)
+        self._data[(self._start + self._count) % capacity] = value
+        if self._count < capacity:
+            self._count += 1
+        else:
+            self._start = (self._start + 1) % capacity
+        self.total += 1
+
+    def extend(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=float)
+        self.total += len(values)
+        values = values[-len(self._data):]
+        capacity = len(self._data)
+        index = (self._start + self._count + np.arange(len(values))) % capacity
+        self._data[index] = values
+
+        overflow = max(0, self._count + len(values) - capacity)
+        self._count = min(capacity, self._count + len(values))
+        self._start = (self._start + overflow) % capacity
+
+    def values(self) -> np.ndarray:
+        """Valeurs de la plus ancienne à la plus récente"""
+        end = self._start + self._count
+        if end <= len(self._data):
+            return self._data[self._start:end]
+        return np.concatenate([self._data[self._start:], self._data[:end - len(self._data)]])
+
+    def indices(self) -> np.ndarray:
+        """Rang de chaque valeur depuis clear() (abscisse de la courbe)"""
+        return np.arange(self.total - self._count, self.total)
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class RunningStats():
+
+    def __init__(self, n_rows: int) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.row_count = np.zeros(n_rows, dtype=np.int64)
+        self.row_sum = np.zeros(n_rows)
+
+    def update(self, rows: np.ndarray, values: np.ndarray) -> None:
+        """Ajoute un bloc de mesures (indice de ligne, valeur)"""
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if n == 0:
+            return
+
+        # fusion de Welford (Chan et al.) du bloc avec les statistiques courantes
+        block_mean = values.mean()
+        block_m2 = ((values - block_mean) ** 2).sum()
+        delta = block_mean - self.mean
+        total = self.count + n
+        self.mean += delta * n / total
+        self._m2 += block_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        rows = np.asarray(rows, dtype=np.int64)
+        np.add.at(self.row_count, rows, 1)
+        np.add.at(self.row_sum, rows, values)
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def row_means(self) -> np.ndarray:
+        """Moyenne de chaque ligne (NaN pour les lignes pas encore mesurées)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.row_sum / self.row_count
+
+    def __str__(self) -> str:
+        if self.count == 0:
+            return "Aucune mesure"
+        return (f"N={self.count}  moyenne={self.mean:.3f}  écart-type={self.std:.3f}  "
+                f"min={self.min:.3f}  max={self.max:.3f}")
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Mesures effectuées à chaque point d'un scan.
+
+Une mesure se déroule en trois temps :
+  - start() : début de la fenêtre de mesure (platine immobile)
+  - wait()  : bloque jusqu'à la fin de la fenêtre ; les KSG101 attachés sont lus
+              pendant la fenêtre
+  - fetch() : renvoie le résultat (MeasurementSample) ; cette étape peut se faire
+              pendant le déplacement vers le point suivant (voir MeasurementPipeline)
+
+Implémentations : CallableMeasurement (fonction quelconque, ancien Scan.scan(function))
+et SPCNTMeasurement (fréquence du compteur SPCNT intégrée sur `gate_time`).
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, NamedTuple, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:  # SPCNT (et pyvisa) ne sont chargés que si un compteur est utilisé
+    from .SPCNT import SPCNT
+
+
+class MeasurementSample(NamedTuple):
+    value: float
+    t_start: float      # time.monotonic() au début de la fenêtre
+    t_end: float        # time.monotonic() à la fin de la fenêtre
+    readbacks: tuple    # lectures des KSG101 attachés (counts), prises dans la fenêtre
+
+
+class Measurement():
+
+    def __init__(self, gate_time: float = 0.0) -> None:
+        self.gate_time = gate_time
+        self.gauges = ()
+
+    def attach(self, gauges) -> None:
+        """KSG101 à lire pendant chaque fenêtre de mesure"""
+        self.gauges = tuple(gauges)
+
+    def start(self) -> None:
+        self._t_start = time.monotonic()
+        self._begin()
+
+    def wait(self) -> None:
+        self._readbacks = tuple(gauge.get_reading() for gauge in self.gauges)
+        self._integrate()
+        remaining = self._t_start + self.gate_time - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        self._t_end = time.monotonic()
+
+    def fetch(self) -> MeasurementSample:
+        return MeasurementSample(self._result(), self._t_start, self._t_end, self._readbacks)
+
+    def measure(self) -> MeasurementSample:
+        self.start()
+        self.wait()
+        return self.fetch()
+
+    # --- à redéfinir ---
+    def _begin(self) -> None:
+        pass
+
+    def _integrate(self) -> None:
+        pass
+
+    def _result(self) -> float:
+        raise NotImplementedError
+
+
+class CallableMeasurement(Measurement):
+    """Appelle `function(*args, **kwargs)` pendant la fenêtre (platine immobile)"""
+
+    def __init__(self, function: Callable, *args, gate_time: float = 0.0, **kwargs) -> None:
+        super().__init__(gate_time)
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def _integrate(self) -> None:
+        self._value = self.function(*self.args, **self.kwargs)
+
+    def _result(self) -> float:
+        return self._value
+
+
+class SPCNTMeasurement(Measurement):
+    """
+    Fréquence moyenne du SPCNT sur la fenêtre `gate_time`.
+
+    En mode bulk, le bloc est lancé au début de la fenêtre et wait() ne rend la main
+    qu'une fois son acquisition terminée (requête `complete`, ou rapatriement du bloc
+    si elle n'est pas définie) : la platine ne bouge pas pendant l'acquisition, et la
+    fenêtre s'allonge si le bloc dure plus que `gate_time` (t_end est la vraie fin).
+    Seul le transfert du bloc par fetch() chevauche le déplacement suivant. En mode
+    query, les échantillons sont lus en continu pendant la fenêtre.
+    """
+
+    def __init__(self, counter: "SPCNT", gate_time: float = 0.1) -> None:
+        super().__init__(gate_time)
+        self.counter = counter
+
+    def _begin(self) -> None:
+        self._block = None
+        if self.counter.conf.mode == "bulk":
+            self.counter.trigger()
+
+    def _integrate(self) -> None:
+        if self.counter.conf.mode == "bulk":
+            if self.counter.conf.complete is not None:
+                self.counter.wait_complete()
+            else:
+                self._block = self.counter.fetch_block()
+            return
+        samples = [self.counter.measure()]
+        while time.monotonic() < self._t_start + self.gate_time:
+            samples.append(self.counter.measure())
+        self._value = float(np.mean(samples))
+
+    def _result(self) -> float:
+        if self.counter.conf.mode == "bulk":
+            block = self._block if self._block is not None else self.counter.fetch_block()
+            return float(block.mean())
+        return self._value
+
+
+class MeasurementPipeline():
+    """
+    Enchaîne les mesures d'un scan : la récupération du résultat d'un point se fait en
+    arrière-plan pendant le déplacement vers le point suivant.
+
+        for key in points:
+            move(key)
+            done = pipeline.acquire(key)   # (clé, échantillon) du point précédent ou None
+        done = pipeline.collect()          # dernier point
+    """
+
+    def __init__(self, measurement: Measurement) -> None:
+        self.measurement = measurement
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    def acquire(self, key) -> Optional[tuple]:
+        done = self.collect()
+        self.measurement.start()
+        self.measurement.wait()
+        self._pending = (key, self._executor.submit(self.measurement.fetch))
+        return done
+
+    def collect(self) -> Optional[tuple]:
+        if self._pending is None:
+            return None
+        key, future = self._pending
+        self._pending = None
+        return key, future.result()
+
+    def close(self) -> None:
+        self._executor.shutdown()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Scans simultanés sur plusieurs platines (un jeu NanoMax + KPZ101/KSG101 chacune).
+
+Chaque platine a sa recette (Scan2DConfig) et son processus d'acquisition
+(`io_process.ScanProcess`) : ses propres liaisons FTDI, sa boucle fermée, son CSV.
+Le coordinateur lit les points de tous les processus en mémoire partagée, affiche
+l'avancement et le débit cumulé, et garde les cartes de chaque platine. L'échec
+d'une platine (appareil absent, erreur de communication) n'arrête pas les autres.
+
+    apt-interface multiscan platine1.yaml platine2.yaml [-o cartes.npz]
+"""
+
+import os
+import time
+from typing import Optional, Union
+
+import numpy as np
+from pydantic_yaml import parse_yaml_file_as
+
+from .KPZ101 import KPZ101Config
+from .KSG101 import KSG101Config
+from .io_process import ScanProcess
+from .scan2d import Scan2DConfig
+
+
+def serial_of(conf: Union[KPZ101Config, KSG101Config]) -> str:
+    """Numéro de série d'un contrôleur, nom logique résolu par le fichier des noms (sans énumération)"""
+    if conf.instruments is None:
+        return conf.serial_nm
+    names = parse_yaml_file_as(dict[str, Union[str, int]], conf.instruments)
+    return str(names.get(conf.serial_nm, conf.serial_nm))
+
+
+def check_recipes(recipes: dict[str, Scan2DConfig]) -> None:
+    """ValueError si deux platines partagent un contrôleur (numéro de série) ou un fichier de sortie"""
+    outputs = [os.path.abspath(c.output) for c in recipes.values()]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Each stage needs its own output file")
+
+    owners = {}
+    for name, c in recipes.items():
+        if c.emulate:
+            continue
+        serials = [serial_of(parse_yaml_file_as(KPZ101Config, path)) for path in (c.kpz_x, c.kpz_y)]
+        serials += [serial_of(parse_yaml_file_as(KSG101Config, path)) for path in (c.ksg_x, c.ksg_y)]
+        for serial in serials:
+            if serial in owners and owners[serial] != name:
+                raise ValueError(f"Device {serial} is used by stages {owners[serial]!r} and {name!r}")
+            owners[serial] = name
+
+
+class StageJob():
+    """Scan d'une platine dans son processus, points reçus gardés par le coordinateur"""
+
+    def __init__(self, name: str, config: Scan2DConfig) -> None:
+        self.name = name
+        self.config = config
+        self.total = config.nx * config.ny
+        self.process = ScanProcess(config, progress_interval=float("inf"))
+        self.map = np.full((config.ny, config.nx), np.nan)
+        self.done = 0
+        self.status: Optional[str] = None
+        self.detail: Optional[str] = None
+        self.t_start = 0.0
+        self.t_end: Optional[float] = None
+
+    def start(self) -> None:
+        self.t_start = time.monotonic()
+        self.process.start()
+
+    def poll(self) -> bool:
+        """Récupère les nouveaux points, renvoie True quand le scan est terminé"""
+        status = self.process.poll() if self.status is None else None
+        block = self.process.channel.points.drain()  # après poll : aucun point du processus terminé n'est perdu
+        if len(block):
+            self.map[block[:, 1].astype(int), block[:, 0].astype(int)] = block[:, 2]
+            self.done += len(block)
+        if status is not None:
+            self.status, self.detail = status
+            self.t_end = time.monotonic()
+        return self.status is not None
+
+    @property
+    def rate(self) -> float:
+        """Points par seconde depuis le début du scan"""
+        end = self.t_end if self.t_end is not None else time.monotonic()
+        return self.done / max(end - self.t_start, 1e-9)
+
+    def close(self) -> None:
+        self.process.close()
+
+
+class MultiStageScan():
+
+    def __init__(self, recipes: dict[str, Scan2DConfig], progress_interval: float = 5.0) -> None:
+        check_recipes(recipes)
+        self.jobs = [StageJob(name, config) for name, config in recipes.items()]
+        self.progress_interval = progress_interval
+        self.t_start = 0.0
+
+    def stop(self) -> None:
+        for job in self.jobs:
+            job.process.stop()
+
+    def print_progress(self) -> None:
+        elapsed = time.monotonic() - self.t_start
+        for job in self.jobs:
+            state = job.status if job.status is not None else "en cours"
+            print(f"  {job.name:<12} {job.done}/{job.total} points ({100 * job.done / job.total:5.1f} %), "
+                  f"{job.rate:.2f} points/s [{state}]")
+        done = sum(job.done for job in self.jobs)
+        rate = done / max(elapsed, 1e-9)
+        print(f"  total        {done} points en {elapsed:.0f} s, {rate:.2f} points/s "
+              f"({3600 * rate:.0f} points/h)")
+
+    def run(self) -> dict[str, StageJob]:
+        """Lance toutes les platines et attend la fin de chacune ; Ctrl+C les arrête toutes"""
+        self.t_start = time.monotonic()
+        for job in self.jobs:
+            job.start()
+        print(f"Scans lancés sur {len(self.jobs)} platines : {', '.join(job.name for job in self.jobs)}")
+
+        next_print = self.t_start + self.progress_interval
+        running = list(self.jobs)
+        try:
+            while running:
+                for job in list(running):
+                    if job.poll():
+                        running.remove(job)
+                        if job.status == "error":
+                            print(f"Platine {job.name} en échec, les autres continuent : {job.detail}")
+                if time.monotonic() >= next_print:
+                    self.print_progress()
+                    next_print += self.progress_interval
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print("\nInterruption clavier, arrêt de toutes les platines.")
+            self.stop()
+            while not all([job.poll() for job in self.jobs]):
+                time.sleep(0.1)
+        finally:
+            for job in self.jobs:
+                job.close()
+
+        print("Scans terminés :")
+        self.print_progress()
+        for job in self.jobs:
+            if job.status == "error":
+                print(f"  {job.name} : {job.detail}")
+        return {job.name: job for job in self.jobs}
+
+    def save(self, path: str) -> None:
+        """Cartes (ny, nx) de toutes les platines, une entrée par nom de platine"""
+        np.savez(path, **{job.name: job.map for job in self.jobs})
+
+
+def stage_names(paths: list[str]) -> list[str]:
+    """Nom de chaque platine : nom du fichier de recette, numéroté s'il se répète"""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    return [stem if stems.count(stem) == 1 else f"{stem}_{k}" for k, stem in enumerate(stems)]
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Orchestrateur de scan à N axes piloté par une recette YAML.
+
+Chaque axe nommé est lié à un KPZ101, éventuellement associé à un KSG101 pour
+la boucle fermée logicielle (cible en µm). Sans KSG101, la consigne est envoyée
+directement au KPZ101 : tension (V) en open_loop, position (0..32767) en closed_loop.
+
+Les axes sont regroupés dans `order`, de la boucle externe à la boucle interne.
+Les axes d'un même groupe sont entrelacés (déplacés ensemble, point par point),
+ce qui permet par exemple de piloter deux platines en parallèle.
+
+Exemple de recette :
+
+    axes:
+      Z: {kpz: conf/config_KPZ_Z.yaml, start: 0, stop: 20, step: 2}
+      Y: {kpz: conf/config_KPZ_Y.yaml, ksg: conf/config_KSG_Y.yaml, start: 0, stop: 5, step: 0.1}
+      X: {kpz: conf/config_KPZ_X.yaml, ksg: conf/config_KSG_X.yaml, start: 0, stop: 10, step: 0.2}
+    order: [Z, Y, X]
+    serpentine: true
+"""
+
+import csv
+import time
+import itertools
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Union
+
+import numpy as np
+from pydantic import BaseModel, model_validator
+from pydantic_yaml import parse_yaml_file_as
+
+from .KPZ101 import KPZ101
+from .KSG101 import KSG101
+from .closed_loop import move_axis_to_um_closed_loop
+
+
+class AxisConfig(BaseModel):
+    """Un axe : un KPZ101 et, optionnellement, le KSG101 qui le mesure"""
+
+    kpz: str
+    ksg: Optional[str] = None
+    start: float
+    stop: float
+    step: float
+
+    @model_validator(mode="after")
+    def check_step(self):
+        if self.step <= 0:
+            raise ValueError("step must be strictly positive")
+        if self.stop < self.start:
+            raise ValueError("stop must be greater than or equal to start")
+        return self
+
+    def targets(self) -> np.ndarray:
+        n = int(round((self.stop - self.start) / self.step)) + 1
+        return self.start + self.step * np.arange(n)
+
+
+class ClosedLoopConfig(BaseModel):
+    """Paramètres de `move_axis_to_um_closed_loop` (axes avec KSG101)"""
+
+    gain: float = 0.002
+    tol_um: float = 0.5
+    sleep: float = 0.01
+    max_iter: int = 200
+    n_avg: int = 1  # lectures KSG101 moyennées par itération
+
+
+class RecipeConfig(BaseModel):
+    """Description du fichier yaml"""
+
+    name: str = "scan"
+    axes: dict[str, AxisConfig]
+    # De la boucle externe à la boucle interne, une liste = axes entrelacés
+    order: list[Union[str, list[str]]]
+    serpentine: bool = True
+    settle_time: float = 0.0
+    closed_loop: ClosedLoopConfig = ClosedLoopConfig()
+    output: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_order(self):
+        groups = [[g] if isinstance(g, str) else g for g in self.order]
+        names = [name for group in groups for name in group]
+        if sorted(names) != sorted(self.axes):
+            raise ValueError("order must reference every axis exactly once")
+        for group in groups:
+            sizes = {len(self.axes[name].targets()) for name in group}
+            if len(sizes) != 1:
+                raise ValueError(f"interleaved axes {group} must have the same number of points")
+        return self
+
+    def groups(self) -> list[list[str]]:
+        return [[g] if isinstance(g, str) else list(g) for g in self.order]
+
+
+class Orchestrator():
+    pass
+
+class Orchestrator():
+
+    def __init__(self, config_file="recipe.yaml") -> None:
+        self.conf = parse_yaml_file_as(RecipeConfig, config_file)
+        self.groups = self.conf.groups()
+        self.targets = {name: axis.targets() for name, axis in self.conf.axes.items()}
+        self.shape = tuple(len(self.targets[group[0]]) for group in self.groups)
+
+        self.kpz: dict[str, KPZ101] = {}
+        self.ksg: dict[str, KSG101] = {}
+        self._stack = ExitStack()
+        self._isRunning = True
+
+    def __enter__(self) -> Orchestrator:
+        # Ouverture et configuration de tous les contrôleurs en parallèle
+        devices = [(name, KPZ101, axis.kpz) for name, axis in self.conf.axes.items()]
+        devices += [(name, KSG101, axis.ksg) for name, axis in self.conf.axes.items()
+                    if axis.ksg is not None]
+
+        self._pool = ThreadPoolExecutor(max_workers=len(devices))
+        self._stack.callback(self._pool.shutdown)
+
+        opened = self._parallel(lambda d: d[1](d[2]).__enter__(), devices, raise_errors=False)
+        for (name, cls, _), dev in zip(devices, opened):
+            if isinstance(dev, BaseException):
+                continue
+            self._stack.push(dev.__exit__)
+            if cls is KPZ101:
+                self.kpz[name] = dev
+            else:
+                self.ksg[name] = dev
+
+        errors = [dev for dev in opened if isinstance(dev, BaseException)]
+        if errors:
+            self.__exit__()
+            raise errors[0]
+
+        try:
+            self._parallel(lambda kpz: kpz.enable_output(), list(self.kpz.values()))
+            self._parallel(lambda ksg: ksg.zeroing(), list(self.ksg.values()))
+        except BaseException:
+            # __exit__ n'est pas appelé après un échec de __enter__
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stack.close()
+        self.kpz.clear()
+        self.ksg.clear()
+
+    def _parallel(self, func: Callable, items: list, raise_errors: bool = True) -> list:
+        """Applique func sur chaque élément dans un thread, renvoie résultats (ou exceptions)"""
+        futures = [self._pool.submit(func, item) for item in items]
+
+        results = [f.exception() if f.exception() is not None else f.result() for f in futures]
+        if raise_errors:
+            for res in results:
+                if isinstance(res, BaseException):
+                    raise res
+        return results
+
+    def points(self):
+        """Génère (indices, consignes) dans l'ordre de parcours de la recette"""
+        for index in itertools.product(*map(range, self.shape)):
+            if self.conf.serpentine:
+                # Une boucle change de sens à chaque passage des boucles externes
+                raw, index, passes = index, [], 0
+                for k, i in enumerate(raw):
+                    index.append(self.shape[k] - 1 - i if passes % 2 else i)
+                    passes = passes * self.shape[k] + i
+                index = tuple(index)
+
+            setpoints = {name: self.targets[name][index[k]]
+                         for k, group in enumerate(self.groups) for name in group}
+            yield index, setpoints
+
+    def move(self, name: str, target: float) -> float:
+        kpz = self.kpz[name]
+
+        if name in self.ksg:
+            cl = self.conf.closed_loop
+            return move_axis_to_um_closed_loop(kpz, self.ksg[name], target,
+                                               cl.gain, cl.tol_um, cl.sleep, cl.max_iter, n_avg=cl.n_avg)
+
+        if kpz.conf.mode == "closed_loop":
+            kpz.set_position(int(target))
+        else:
+            kpz.set_output_voltage(target)
+        return target
+
+    def stop(self) -> None:
+        self._isRunning = False
+
+    def run(self, function: Callable, *args, **kwargs) -> np.ndarray:
+        """Parcourt la grille et renvoie les mesures avec la forme des groupes de `order`"""
+        res = np.full(self.shape, np.nan)
+        current = {}
+        names = list(self.conf.axes)
+
+        f = open(self.conf.output, "w", newline="") if self.conf.output else None
+        try:
+            if f is not None:
+                writer = csv.writer(f, delimiter=';')
+                writer.writerow([f"i{k}" for k in range(len(self.shape))] + names + ["value"])
+
+            for index, setpoints in self.points():
+                if not self._isRunning:
+                    break
+
+                # Seuls les axes dont la consigne change sont déplacés, en parallèle
+                moving = [name for name in names if current.get(name) != setpoints[name]]
+                self._parallel(lambda name: self.move(name, setpoints[name]), moving)
+                current.update({name: setpoints[name] for name in moving})
+                time.sleep(self.conf.settle_time)
+
+                res[index] = function(*args, **kwargs)
+                if f is not None:
+                    writer.writerow(list(index) + [setpoints[name] for name in names] + [res[index]])
+        finally:
+            if f is not None:
+                f.close()
+
+        return res
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Prévisualisation rapide d'une trajectoire de scan (pyqtgraph).
+
+La trajectoire complète est tracée une seule fois (une seule ligne, sous-échantillonnée
+au-delà de `max_points`) et seul le curseur est déplacé à chaque image. La lecture
+se fait à la vitesse réelle (`acquisition_time` par point) multipliée par `speed`.
+Les trajectoires qui utilisent l'axe Z sont affichées en 3D si pyqtgraph.opengl est
+disponible, sinon en projection XY.
+"""
+
+import sys
+import time
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtCore, QtWidgets
+
+try:
+    import pyqtgraph.opengl as gl
+except ImportError:  # PyOpenGL absent
+    gl = None
+
+FRAME_RATE = 30  # images par seconde
+
+
+def downsample(coords: np.ndarray, max_points: int) -> np.ndarray:
+    """Garde au plus max_points points régulièrement espacés (extrémités incluses)"""
+    if len(coords) <= max_points:
+        return coords
+    index = np.linspace(0, len(coords) - 1, max_points).round().astype(np.int64)
+    return coords[index]
+
+
+class TrajectoryPreview():
+
+    def __init__(self, coords: np.ndarray, acquisition_time: float, speed: float = 1.0,
+                 max_points: int = 20000) -> None:
+        coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        # axes non utilisés (NaN) ramenés à 0
+        self.coords = np.where(np.isnan(coords), 0.0, coords)
+        self.use_3d = gl is not None and not np.isnan(coords[:, 2]).all()
+
+        self.acquisition_time = acquisition_time
+        self.speed = speed
+        self.index = 0
+
+        path = downsample(self.coords, max_points)
+        if self.use_3d:
+            self.widget = gl.GLViewWidget()
+            self.widget.addItem(gl.GLGridItem())
+            self.widget.addItem(gl.GLLinePlotItem(pos=path, color=(0.3, 0.6, 1, 1), antialias=False))
+            self.cursor = gl.GLScatterPlotItem(pos=self.coords[:1], color=(1, 0, 0, 1), size=10)
+            self.widget.addItem(self.cursor)
+        else:
+            self.widget = pg.PlotWidget()
+            self.widget.getViewBox().setAspectLocked(True)
+            self.widget.setLabel('bottom', 'X')
+            self.widget.setLabel('left', 'Y')
+            self.widget.plot(path[:, 0], path[:, 1], pen='c', skipFiniteCheck=True)
+            self.cursor = pg.ScatterPlotItem(size=10, brush='r')
+            self.widget.addItem(self.cursor)
+        self.widget.setWindowTitle(f"Trajectoire ({len(self.coords)} points, x{speed})")
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.step)
+
+    def step(self) -> None:
+        # avance selon le temps écoulé (indépendant de la cadence d'affichage)
+        elapsed = time.perf_counter() - self.t0
+        if self.acquisition_time > 0:
+            self.index = int(elapsed * self.speed / self.acquisition_time)
+        else:
+            self.index = len(self.coords) - 1
+        if self.index >= len(self.coords) - 1:
+            self.index = len(self.coords) - 1
+            self.timer.stop()
+
+        point = self.coords[self.index:self.index + 1]
+        if self.use_3d:
+            self.cursor.setData(pos=point)
+        else:
+            self.cursor.setData(pos=point[:, :2])
+
+    def play(self) -> None:
+        self.t0 = time.perf_counter()
+        self.timer.start(int(1000 / FRAME_RATE))
+
+    def show(self) -> None:
+        """Affiche la fenêtre, lance la lecture et bloque jusqu'à sa fermeture"""
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+        self.widget.show()
+        self.play()
+        app.exec_()
@@ -7,72 +7,79 @@ La fenêtre est divisée en deux parties :
   - À droite : le panneau de contrôle du scan (affichage de la carte 2D, 
        courbe de convergence, boutons Pause/Reprendre et Arrêt).
 
-Le scan s'exécute dans un thread séparé afin de maintenir l'interface réactive.
+Le scan s'exécute dans un thread séparé afin de maintenir l'interface réactive, ou
+dans un processus séparé (case à cocher, voir io_process.py) pour que l'affichage ne
+perturbe pas la boucle fermée.
 Les mesures et déplacements sont ici simulés (remplacez-les par vos appels réels).
 """
 
-import time
-import csv
-import random  # Pour simuler des mesures
 import sys
 import numpy as np
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtGui, QtWidgets
-from apt_interface.KSG101 import KSG101
-from apt_interface.KPZ101 import KPZ101
+from apt_interface.transport import ScanChannel
+from apt_interface.live_stats import RingBuffer, RunningStats
+from apt_interface.scan2d import Scan2DConfig, Scan2DRunner
+from apt_interface.io_process import ScanProcess
+from apt_interface.tiles import TiledMap
 
-# --- Paramètres "matériels" fixes ---
-MAX_TRAVEL_UM = 20.0     # Plage ~20 µm du piézo
-MAX_COUNTS = 32767       # Valeur max du KSG
-# COUNTS_PER_UM reste constant (utilisé pour la conversion)
-COUNTS_PER_UM = MAX_COUNTS / MAX_TRAVEL_UM  # ~1638
+FRAME_RATE = 30          # Rafraîchissement max de la carte (images/s)
+CONVERGENCE_HISTORY = 1000  # Itérations affichées sur la courbe de convergence
 
-CSV_FILENAME = "scan2D_closed_loop.csv"
 
-
-# --- Fonctions de conversion ---
-def um_to_counts(um: float) -> float:
-    return um * COUNTS_PER_UM
-
-def counts_to_um(counts: float) -> float:
-    return counts / COUNTS_PER_UM
-
-
-# --- Fonction de déplacement avec boucle fermée ---
-def move_axis_to_um_closed_loop(kpz: KPZ101, ksg: KSG101, target_um: float,
-                                  gain: float, tol_um: float, sleep: float, max_iter: int,
-                                  update_callback=None):
+# --- Affichage d'une carte par tuiles ---
+class TiledMapView:
     """
-    Déplace l'axe en boucle fermée jusqu'à atteindre target_um.
-    
-    - gain       : facteur de correction.
-    - tol_um     : tolérance en µm.
-    - sleep      : délai entre itérations (en secondes).
-    - max_iter   : nombre maximum d'itérations.
-    - update_callback : fonction (ou None) appelée à chaque itération avec (lecture, iteration)
+    Une ImageItem par tuile visible de `tiled_map`, prise au niveau de la pyramide où un
+    pixel de tuile fait au moins un pixel d'écran. Seules les tuiles visibles qui ont
+    changé depuis le dernier affichage sont renvoyées à l'écran.
     """
-    target_counts = um_to_counts(target_um)
-    current_voltage = 0.0
-    kpz.set_output_voltage(current_voltage)
-    iteration = 0
-    tol_counts = tol_um * COUNTS_PER_UM
-    while iteration < max_iter:
-        reading = ksg.get_reading()
-        if update_callback is not None:
-            update_callback(reading, iteration)
-        error = target_counts - reading
-        if abs(error) < tol_counts:
-            break
-        correction = gain * error
-        new_voltage = current_voltage + correction
-        new_voltage = max(0, min(75, new_voltage))
-        kpz.set_output_voltage(new_voltage)
-        current_voltage = new_voltage
-        time.sleep(sleep)
-        iteration += 1
-    if update_callback is not None:
-        update_callback(ksg.get_reading(), iteration)
-    return ksg.get_reading()
+    def __init__(self, plot, tiled_map, lut):
+        self.plot = plot
+        self.map = tiled_map
+        self.lut = lut
+        self.levels = None
+        self.items = {}  # (niveau, ty, tx) -> [ImageItem, version affichée]
+        self.plot.getViewBox().sigRangeChanged.connect(self.redraw)
+
+    def level(self):
+        """Niveau de la pyramide adapté au zoom courant"""
+        px = self.plot.getViewBox().viewPixelSize()[0]  # indices de la carte par pixel d'écran
+        if not px > 1:
+            return 0
+        return min(int(np.log2(px)), self.map.n_levels - 1)
+
+    def set_levels(self, levels):
+        self.levels = levels
+        for item, _ in self.items.values():
+            item.setLevels(levels)
+
+    def redraw(self, *args):
+        if self.levels is None:
+            return
+        level = self.level()
+        (x0, x1), (y0, y1) = self.plot.getViewBox().viewRange()
+        wanted = {(level, ty, tx) for ty, tx in self.map.visible(level, x0, x1, y0, y1)}
+
+        for key in list(self.items):
+            if key not in wanted:
+                self.plot.removeItem(self.items.pop(key)[0])
+
+        span = self.map.span(level)
+        for key in wanted:
+            _, ty, tx = key
+            version = self.map.versions[level][(ty, tx)]
+            if key not in self.items:
+                item = pg.ImageItem(axisOrder='row-major')
+                item.setLookupTable(self.lut)
+                item.setZValue(-1)  # sous le texte d'information
+                self.plot.addItem(item)
+                self.items[key] = [item, None]
+            entry = self.items[key]
+            if entry[1] != version:
+                entry[0].setImage(self.map.tiles[level][(ty, tx)], autoLevels=False, levels=self.levels)
+                entry[0].setRect(QtCore.QRectF(tx * span, ty * span, span, span))
+                entry[1] = version
 
 
 # --- Widget d'affichage de la carte 2D ---
@@ -83,16 +90,24 @@ class RealTimePlot:
     et la valeur mesurée.
     
     La vue est configurée avec une échelle identique en x et en y et affiche une grille orthogonale.
+
+    Les points reçus (par `update` ou par le canal `channel`) sont mis en attente et appliqués
+    par paquets à FRAME_RATE images/s au maximum : le coût d'affichage ne dépend pas de la
+    cadence des mesures.
+
+    La carte est stockée par tuiles (tiles.py) : mémoire et redessin suivent ce qui est
+    scanné et ce qui est à l'écran, pas la taille de la zone.
     """
-    def __init__(self, config):
+    def __init__(self, config, channel=None):
         self.config = config
+        self.channel = channel
         self.LX = config["LX"]
         self.LY = config["LY"]
         self.DX = config["DX"]
         self.DY = config["DY"]
         self.nx = int(self.LX / self.DX) + 1
         self.ny = int(self.LY / self.DY) + 1
-        self.data = np.zeros((self.ny, self.nx))
+        self.map = TiledMap(self.ny, self.nx)
 
         self.widget = pg.GraphicsLayoutWidget()
         self.plot = self.widget.addPlot()
@@ -101,29 +116,61 @@ class RealTimePlot:
         # Affichage d'une grille orthogonale
         self.plot.showGrid(x=True, y=True, alpha=0.3)
 
-        self.img = pg.ImageItem()
-        self.plot.addItem(self.img)
+        self.view = TiledMapView(self.plot, self.map, pg.colormap.get("viridis").getLookupTable())
+        self.plot.setRange(xRange=(0, self.nx), yRange=(0, self.ny))
         self.plot.setLabel('left', 'Y (Index)')
         self.plot.setLabel('bottom', 'X (Index)')
         self.plot.setTitle("Carte des mesures en temps réel")
-        self.img.setLookupTable(pg.colormap.get("viridis").getLookupTable())
 
         self.info_text = pg.TextItem("", color="w", anchor=(0, 1))
         self.info_text.setPos(0, self.ny)
         self.plot.addItem(self.info_text)
-        self.img.mousePressEvent = self.mouse_clicked
+        self.plot.scene().sigMouseClicked.connect(self.mouse_clicked)
+
+        # Points en attente d'affichage et niveaux (min, max) mis à jour au fil de l'eau
+        self.pending = []
+        self.levels = None
+        self.stats = RunningStats(self.ny)
+        self.timer = QtCore.QTimer(self.widget)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(int(1000 / FRAME_RATE))
 
     def update(self, i, j, value):
-        self.data[j, i] = value
-        self.img.setImage(self.data, autoLevels=True)
-        QtWidgets.QApplication.processEvents()
+        self.pending.append((i, j, value))
+
+    def refresh(self):
+        """Applique les points en attente et redessine la carte (appelé par le timer)"""
+        blocks = []
+        if self.pending:
+            blocks.append(np.array(self.pending))
+            self.pending = []
+        if self.channel is not None and len(self.channel):
+            blocks.append(self.channel.drain())
+        if not blocks:
+            return
+        block = np.concatenate(blocks)
+
+        i = block[:, 0].astype(int)
+        j = block[:, 1].astype(int)
+        values = block[:, 2]
+        self.map.set(j, i, values)
+        self.stats.update(j, values)
+
+        low, high = values.min(), values.max()
+        if self.levels is not None:
+            low, high = min(low, self.levels[0]), max(high, self.levels[1])
+        if self.levels != (low, high):
+            # niveaux égaux refusés par ImageItem (une seule valeur mesurée)
+            self.view.set_levels((low, max(high, low + 1e-12)))
+        self.levels = (low, high)
+        self.view.redraw()
 
     def mouse_clicked(self, event):
-        pos = self.img.mapFromScene(event.scenePos())
-        x = int(pos.x())
-        y = int(pos.y())
+        pos = self.plot.getViewBox().mapSceneToView(event.scenePos())
+        x = int(np.floor(pos.x()))
+        y = int(np.floor(pos.y()))
         if 0 <= x < self.nx and 0 <= y < self.ny:
-            value = self.data[y, x]
+            value = self.map.get(y, x)
             posX_um = x * self.DX
             posY_um = y * self.DY
             msg = (f"Clic sur la cellule (X_index={x}, Y_index={y}) -> "
@@ -136,88 +183,66 @@ class RealTimePlot:
 
 # --- Worker du scan (exécuté dans un thread séparé) ---
 class ScanWorker(QtCore.QObject):
-    # Signaux pour mise à jour de l'affichage
-    updatePlot = QtCore.pyqtSignal(int, int, float)
-    convergenceUpdate = QtCore.pyqtSignal(float, int)
+    # Les résultats passent par self.channel (lus par l'interface sur son timer)
     finished = QtCore.pyqtSignal()
     
     def __init__(self, config, parent=None):
         super().__init__(parent)
         self.config = config
-        self.LX = config["LX"]
-        self.LY = config["LY"]
-        self.DX = config["DX"]
-        self.DY = config["DY"]
-        self.SETTLE_TIME = config["SETTLE_TIME"]
-        self.nx = int(self.LX / self.DX) + 1
-        self.ny = int(self.LY / self.DY) + 1
-        self._isRunning = True
-        self._paused = False
+        self.channel = ScanChannel()
+        # La boucle de scan elle-même est sans Qt (partagée avec `apt-interface scan`)
+        self.runner = Scan2DRunner(Scan2DConfig(**config),
+                                   on_point=self.channel.points.append,
+                                   on_convergence=self.channel.convergence.append)
+        self.nx = self.runner.nx
+        self.ny = self.runner.ny
+
+    @property
+    def _paused(self):
+        return self.runner._paused
 
     def stop(self):
-        self._isRunning = False
-        print("Arrêt du scan demandé.")
+        self.runner.stop()
 
     def toggle_pause(self):
-        self._paused = not self._paused
-        if self._paused:
-            print("Scan pausé.")
-        else:
-            print("Scan repris.")
+        self.runner.toggle_pause()
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        self.runner.run()
+        self.finished.emit()
+
+
+class ProcessScanWorker(QtCore.QObject):
+    """Même interface que ScanWorker, le scan tournant dans un processus dédié"""
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.process = ScanProcess(Scan2DConfig(**config))
+        # canaux en mémoire partagée, lus (seulement) par l'interface
+        self.channel = self.process.channel
+        self.channel.readonly()
+        self.nx = self.process.nx
+        self.ny = self.process.ny
+
+    @property
+    def _paused(self):
+        return self.process._paused
+
+    def stop(self):
+        self.process.stop()
+
+    def toggle_pause(self):
+        self.process.toggle_pause()
 
     @QtCore.pyqtSlot()
     def run(self):
-        print(f"Début du scan 2D (nx={self.nx}, ny={self.ny})...")
-        # Récupération des paramètres utilisateur pour le déplacement
-        gain = self.config["GAIN"]
-        tol_um = self.config["TOL_UM"]
-        sleep_time = self.config["SLEEP"]
-        max_iter = self.config["MAX_ITER"]
-
-        with KSG101("conf/config_KSG_X.yaml") as ksgX, \
-             KPZ101("conf/config_KPZ_X.yaml") as kpzX, \
-             KSG101("conf/config_KSG_Y.yaml") as ksgY, \
-             KPZ101("conf/config_KPZ_Y.yaml") as kpzY:
-
-            kpzX.enable_output()
-            kpzY.enable_output()
-            ksgX.zeroing()
-            ksgY.zeroing()
-
-            with open(CSV_FILENAME, "w", newline="") as f:
-                writer = csv.writer(f, delimiter=';')
-                writer.writerow(["iX", "iY", "targetX_um", "targetY_um", "value"])
-
-                for j in range(self.ny):
-                    while self._paused and self._isRunning:
-                        time.sleep(0.1)
-                    if not self._isRunning:
-                        break
-                    setY_um = j * self.DY
-                    move_axis_to_um_closed_loop(kpzY, ksgY, setY_um,
-                                                 gain, tol_um, sleep_time, max_iter)
-                    time.sleep(self.SETTLE_TIME)
-
-                    for i in range(self.nx):
-                        while self._paused and self._isRunning:
-                            time.sleep(0.1)
-                        if not self._isRunning:
-                            break
-                        setX_um = i * self.DX
-                        # Callback pour la courbe de convergence
-                        def update_cb(reading, iteration):
-                            self.convergenceUpdate.emit(reading, iteration)
-                        move_axis_to_um_closed_loop(kpzX, ksgX, setX_um,
-                                                     gain, tol_um, sleep_time, max_iter,
-                                                     update_callback=update_cb)
-                        time.sleep(self.SETTLE_TIME)
-
-                        # Mesure simulée (à remplacer par la mesure réelle)
-                        value = random.uniform(0, 100)
-                        self.updatePlot.emit(i, j, value)
-                        writer.writerow([i, j, setX_um, j * self.DY, value])
-                        print(f"[i={i}, j={j}] X=~{setX_um:.2f} µm / Y=~{j * self.DY:.2f} µm, Mesure=~{value:.2f}")
-        print("Scan terminé.")
+        self.process.start()
+        status, detail = self.process.wait()
+        if status == "error":
+            print("Erreur du processus d'acquisition :", detail)
         self.finished.emit()
 
 
@@ -264,6 +289,10 @@ class ParameterPanel(QtWidgets.QWidget):
         self.max_iter_spin = QtWidgets.QSpinBox()
         self.max_iter_spin.setRange(1, 1000)
         self.max_iter_spin.setValue(200)
+        self.n_avg_spin = QtWidgets.QSpinBox()
+        self.n_avg_spin.setRange(1, 100)
+        self.n_avg_spin.setValue(1)
+        self.process_check = QtWidgets.QCheckBox("Acquisition dans un processus séparé")
 
         # Organisation dans un formulaire
         form_layout = QtWidgets.QFormLayout()
@@ -276,6 +305,8 @@ class ParameterPanel(QtWidgets.QWidget):
         form_layout.addRow("Sleep (s):", self.sleep_spin)
         form_layout.addRow("Tol (µm):", self.tol_spin)
         form_layout.addRow("Max Iterations:", self.max_iter_spin)
+        form_layout.addRow("Moyennage KSG:", self.n_avg_spin)
+        form_layout.addRow(self.process_check)
 
         self.start_button = QtWidgets.QPushButton("Début")
         self.start_button.clicked.connect(self.emit_start)
@@ -296,7 +327,9 @@ class ParameterPanel(QtWidgets.QWidget):
             "GAIN": self.gain_spin.value(),
             "SLEEP": self.sleep_spin.value(),
             "TOL_UM": self.tol_spin.value(),
-            "MAX_ITER": self.max_iter_spin.value()
+            "MAX_ITER": self.max_iter_spin.value(),
+            "N_AVG": self.n_avg_spin.value(),
+            "separate_process": self.process_check.isChecked()
         }
         self.startScan.emit(config)
         # Désactivation du panneau pendant l'exécution du scan
@@ -319,13 +352,27 @@ class ScanPanel(QtWidgets.QWidget):
         self.setWindowTitle("Scan 2D - Contrôle")
 
         # Carte 2D
-        self.plot = RealTimePlot(config)
+        self.plot = RealTimePlot(config, worker.channel.points)
         # Courbe de convergence
         self.convergencePlot = pg.PlotWidget(title="Convergence du déplacement (axe X)")
         self.convergencePlot.setLabel('left', "Lecture (counts)")
         self.convergencePlot.setLabel('bottom', "Itération")
         self.convergence_curve = self.convergencePlot.plot(pen='y')
-        self.convergence_data = []
+        self.convergence_data = RingBuffer(CONVERGENCE_HISTORY)
+
+        # Statistiques en direct : valeurs globales et moyenne de chaque ligne
+        self.statsLabel = QtWidgets.QLabel(str(self.plot.stats))
+        self.rowMeansPlot = pg.PlotWidget(title="Moyenne par ligne")
+        self.rowMeansPlot.setLabel('left', "Y (Index)")
+        self.rowMeansPlot.setLabel('bottom', "Moyenne")
+        self.rowMeansPlot.setMaximumWidth(250)
+        self.row_means_curve = self.rowMeansPlot.plot(pen='c')
+        self.stats_count = 0
+
+        self.channel = worker.channel
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(int(1000 / FRAME_RATE))
 
         # Boutons de contrôle
         self.pauseButton = QtWidgets.QPushButton("Pause")
@@ -333,8 +380,13 @@ class ScanPanel(QtWidgets.QWidget):
         self.pauseButton.clicked.connect(self.toggle_pause)
         self.stopButton.clicked.connect(self.stop_scan)
 
+        map_layout = QtWidgets.QHBoxLayout()
+        map_layout.addWidget(self.plot.widget)
+        map_layout.addWidget(self.rowMeansPlot)
+
         layout = QtWidgets.QVBoxLayout()
-        layout.addWidget(self.plot.widget)
+        layout.addLayout(map_layout)
+        layout.addWidget(self.statsLabel)
         layout.addWidget(self.convergencePlot)
         button_layout = QtWidgets.QHBoxLayout()
         button_layout.addWidget(self.pauseButton)
@@ -354,11 +406,25 @@ class ScanPanel(QtWidgets.QWidget):
         self.pauseButton.setEnabled(False)
         self.stopButton.setEnabled(False)
 
-    def update_convergence(self, reading, iteration):
-        if iteration == 0:
-            self.convergence_data = []
-        self.convergence_data.append(reading)
-        self.convergence_curve.setData(np.arange(len(self.convergence_data)), self.convergence_data)
+    def refresh(self):
+        """Met à jour convergence et statistiques (appelé par le timer)"""
+        stats = self.plot.stats
+        if stats.count != self.stats_count:
+            self.stats_count = stats.count
+            self.statsLabel.setText(str(stats))
+            row_means = stats.row_means()
+            self.row_means_curve.setData(row_means, np.arange(len(row_means)), connect="finite")
+
+        if not len(self.channel.convergence):
+            return
+        block = self.channel.convergence.drain()
+        # on ne garde que le dernier déplacement commencé (itération 0)
+        starts = np.flatnonzero(block[:, 1] == 0)
+        if len(starts):
+            self.convergence_data.clear()
+            block = block[starts[-1]:]
+        self.convergence_data.extend(block[:, 0])
+        self.convergence_curve.setData(self.convergence_data.indices(), self.convergence_data.values())
 
 
 # --- Fenêtre globale ---
@@ -370,6 +436,7 @@ class GlobalWindow(QtWidgets.QWidget):
         self.worker = None
         self.thread = None
         self.scanPanel = None
+        self.process = None
 
         self.paramPanel = ParameterPanel()
         self.paramPanel.startScan.connect(self.start_scan)
@@ -391,17 +458,23 @@ class GlobalWindow(QtWidgets.QWidget):
     def start_scan(self, config):
         # Si un scan précédent existe, on le supprime pour repartir sur une page vierge.
         if self.scanPanel is not None:
+            self.scanPanel.timer.stop()
+            self.scanPanel.plot.timer.stop()
             self.scanLayout.removeWidget(self.scanPanel)
             self.scanPanel.deleteLater()
             self.scanPanel = None
+        self.close_process()
 
         # Création du worker et du thread pour le scan
+        separate_process = config.pop("separate_process", False)
         self.thread = QtCore.QThread()
-        self.worker = ScanWorker(config)
+        if separate_process:
+            self.worker = ProcessScanWorker(config)
+            self.process = self.worker.process
+        else:
+            self.worker = ScanWorker(config)
         self.worker.moveToThread(self.thread)
         self.thread.started.connect(self.worker.run)
-        self.worker.updatePlot.connect(self.handle_update_plot)
-        self.worker.convergenceUpdate.connect(self.handle_convergence_update)
         # Lorsqu'un scan est terminé, on récupère le signal pour réactiver le panneau de paramètres.
         self.worker.finished.connect(self.scan_finished)
         self.worker.finished.connect(self.thread.quit)
@@ -413,13 +486,19 @@ class GlobalWindow(QtWidgets.QWidget):
         self.scanPanel = ScanPanel(config, self.worker)
         self.scanLayout.addWidget(self.scanPanel)
 
-    def handle_update_plot(self, i, j, value):
-        if self.scanPanel:
-            self.scanPanel.plot.update(i, j, value)
-
-    def handle_convergence_update(self, reading, iteration):
-        if self.scanPanel:
-            self.scanPanel.update_convergence(reading, iteration)
+    def close_process(self):
+        """Libère la mémoire partagée du scan précédent (mode processus séparé)"""
+        if self.process is not None:
+            self.process.close()
+            self.process = None
+
+    def closeEvent(self, event):
+        if self.process is not None:
+            self.scanPanel.timer.stop()
+            self.scanPanel.plot.timer.stop()
+            self.process.stop()
+            self.close_process()
+        event.accept()
 
     def scan_finished(self):
         """Méthode appelée lorsque le scan est terminé afin de réactiver le panneau de paramètres."""
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Enregistrement binaire horodaté des fréquences du SPCNT et relecture.
+
+Format : un en-tête de 16 octets (MAGIC + version) suivi d'enregistrements de
+12 octets (temps monotone en s : float64, fréquence en Hz : float32), ajoutés par
+paquets. Un fichier se relit par projection mémoire (numpy.memmap), ce qui permet
+d'analyser des millions d'échantillons en quelques secondes.
+"""
+
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+from .SPCNT import FrequencyBlock
+from .histogram import FixedBinHistogram
+from .stability import AllanDeviation
+
+MAGIC = b"SPCNTREC"
+VERSION = 1
+HEADER_SIZE = 16
+RECORD = np.dtype([("t", "<f8"), ("f", "<f4")])
+
+
+def block_times(block: FrequencyBlock) -> np.ndarray:
+    """Horodatage de chaque échantillon, réparti régulièrement sur la durée du bloc"""
+    n = len(block.frequencies)
+    return block.timestamp - block.duration + block.duration * np.arange(1, n + 1) / n
+
+
+class FrequencyRecorder():
+    pass
+
+class FrequencyRecorder():
+
+    def __init__(self, path: str, chunk_size: int = 65536) -> None:
+        self.path = path
+        self.chunk = np.empty(chunk_size, dtype=RECORD)
+        self.count = 0
+        self.written = 0
+        self.f = None
+
+    def __enter__(self) -> FrequencyRecorder:
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self.f = open(self.path, "ab")
+        if new:
+            self.f.write(MAGIC + VERSION.to_bytes(8, "little"))
+        return self
+
+    def write_block(self, block: FrequencyBlock) -> None:
+        times = block_times(block)
+        k = 0
+        while k < len(times):
+            n = min(len(times) - k, len(self.chunk) - self.count)
+            self.chunk["t"][self.count:self.count + n] = times[k:k + n]
+            self.chunk["f"][self.count:self.count + n] = block.frequencies[k:k + n]
+            self.count += n
+            k += n
+            if self.count == len(self.chunk):
+                self.flush()
+
+    def flush(self) -> None:
+        self.f.write(self.chunk[:self.count].tobytes())
+        self.f.flush()
+        self.written += self.count
+        self.count = 0
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+        self.f.close()
+
+
+def load(path: str) -> np.memmap:
+    """Projection mémoire (lecture seule) des enregistrements d'un fichier"""
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a SPCNT recording")
+
+    n = (os.path.getsize(path) - HEADER_SIZE) // RECORD.itemsize
+    return np.memmap(path, dtype=RECORD, mode="r", offset=HEADER_SIZE, shape=(n,))
+
+
+class ReplaySource():
+    pass
+
+class ReplaySource():
+    """Relit un enregistrement avec la même interface que SPCNT (read_block)"""
+
+    def __init__(self, path: str, block_size: int = 100, realtime: bool = True) -> None:
+        self.path = path
+        self.block_size = block_size
+        self.realtime = realtime
+        self.position = 0
+
+    def __enter__(self) -> ReplaySource:
+        self.records = load(self.path)
+        self.t_start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.records = None
+
+    def read_block(self) -> FrequencyBlock:
+        if self.position >= len(self.records):
+            raise EOFError("end of recording")
+
+        chunk = self.records[self.position:self.position + self.block_size]
+        first = self.records["t"][0]
+        previous = self.records["t"][self.position - 1] if self.position else chunk["t"][0]
+        self.position += len(chunk)
+
+        if self.realtime:
+            # attente jusqu'à l'instant d'origine du dernier échantillon du bloc
+            delay = (chunk["t"][-1] - first) - (time.monotonic() - self.t_start)
+            if delay > 0:
+                time.sleep(delay)
+
+        return FrequencyBlock(float(chunk["t"][-1]), float(chunk["t"][-1] - previous),
+                              chunk["f"].astype(float))
+
+
+def analyse(path: str, chunk_size: int = 1_000_000, histogram: Optional[FixedBinHistogram] = None,
+            allan: Optional[AllanDeviation] = None) -> tuple[FixedBinHistogram, AllanDeviation]:
+    """Histogramme et écart-type d'Allan d'un enregistrement complet (hors ligne)"""
+    histogram = FixedBinHistogram() if histogram is None else histogram
+    allan = AllanDeviation() if allan is None else allan
+    records = load(path)
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        previous = records["t"][start - 1] if start else chunk["t"][0]
+        frequencies = chunk["f"].astype(float)
+        histogram.add_many(frequencies)
+        allan.update(frequencies, float(chunk["t"][-1] - previous))
+
+    return histogram, allan
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyse hors ligne d'un enregistrement SPCNT")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    histogram, allan = analyse(args.path)
+    print(f"{histogram.total} échantillons, tau0 = {allan.tau0 * 1e3:.3f} ms, "
+          f"{histogram.out_of_range} hors fenêtre")
+    for tau, adev in zip(*allan.deviation()):
+        print(f"tau = {tau:10.4f} s   écart-type d'Allan = {adev:.4f} Hz")
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Reconstruction d'une carte sur une grille régulière à partir des positions mesurées.
+
+Les points (x, y, valeur) d'un scan ne tombent pas exactement sur la grille des
+consignes (tolérance de la boucle fermée, scans à la volée). Deux méthodes, en numpy
+seul et par paquets de `chunk` points pour tenir en mémoire avec des millions de points :
+  - "bin" : moyenne des points tombant dans chaque case de la grille
+  - "idw" : interpolation par inverse de la distance sur les points à moins de
+    `radius` de chaque nœud ; les voisins sont trouvés grâce à un index par cases
+    (points triés par case), sans recherche quadratique
+
+    python -m apt_interface.regrid scan2D_closed_loop.csv --dx 0.2 --method idw -o carte.npy
+"""
+
+from typing import Literal, NamedTuple, Optional
+
+import numpy as np
+
+
+class Grid(NamedTuple):
+    x0: float
+    y0: float
+    dx: float
+    dy: float
+    nx: int
+    ny: int
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.x0 + self.dx * np.arange(self.nx)
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.y0 + self.dy * np.arange(self.ny)
+
+
+def make_grid(x: np.ndarray, y: np.ndarray, dx: float, dy: Optional[float] = None) -> Grid:
+    """Grille couvrant tous les points, nœuds à x0 + i * dx"""
+    dy = dx if dy is None else dy
+    x0, y0 = float(np.min(x)), float(np.min(y))
+    nx = int(np.floor((np.max(x) - x0) / dx + 0.5)) + 1
+    ny = int(np.floor((np.max(y) - y0) / dy + 0.5)) + 1
+    return Grid(x0, y0, dx, dy, nx, ny)
+
+
+def bin_points(x: np.ndarray, y: np.ndarray, values: np.ndarray, grid: Grid,
+               chunk: int = 1_000_000) -> np.ndarray:
+    """Moyenne des points de chaque case centrée sur un nœud (NaN si case vide)"""
+    size = grid.nx * grid.ny
+    sums = np.zeros(size)
+    counts = np.zeros(size)
+    for start in range(0, len(x), chunk):
+        stop = start + chunk
+        i = np.floor((x[start:stop] - grid.x0) / grid.dx + 0.5).astype(np.int64)
+        j = np.floor((y[start:stop] - grid.y0) / grid.dy + 0.5).astype(np.int64)
+        inside = (i >= 0) & (i < grid.nx) & (j >= 0) & (j < grid.ny)
+        cells = j[inside] * grid.nx + i[inside]
+        sums += np.bincount(cells, weights=values[start:stop][inside], minlength=size)
+        counts += np.bincount(cells, minlength=size)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums / counts).reshape(grid.ny, grid.nx)
+
+
+class CellIndex():
+    """Points triés par case carrée de côté `cell` : les points d'une case sont contigus"""
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, cell: float) -> None:
+        self.cell = cell
+        self.x0, self.y0 = float(np.min(x)), float(np.min(y))
+        self.nx = int((np.max(x) - self.x0) // cell) + 1
+        self.ny = int((np.max(y) - self.y0) // cell) + 1
+
+        cells = self.cell_of(x, y)
+        self.order = np.argsort(cells, kind="stable")
+        self.counts = np.bincount(cells, minlength=self.nx * self.ny)
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]])
+
+    def cell_of(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        i = ((x - self.x0) // self.cell).astype(np.int64)
+        j = ((y - self.y0) // self.cell).astype(np.int64)
+        return j * self.nx + i
+
+    def neighbours(self, qx: np.ndarray, qy: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Paires (requête, point) pour tous les points des 3x3 cases autour de chaque requête
+        (donc au moins tous les points à moins de `cell`).
+        """
+        qi = np.floor((qx - self.x0) / self.cell).astype(np.int64)
+        qj = np.floor((qy - self.y0) / self.cell).astype(np.int64)
+        queries = []
+        points = []
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                i, j = qi + di, qj + dj
+                valid = np.flatnonzero((i >= 0) & (i < self.nx) & (j >= 0) & (j < self.ny))
+                cells = j[valid] * self.nx + i[valid]
+                counts = self.counts[cells]
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                # indices consécutifs starts[c] .. starts[c] + counts[c] - 1 pour chaque requête
+                first = np.repeat(self.starts[cells], counts)
+                offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                queries.append(np.repeat(valid, counts))
+                points.append(self.order[first + offset])
+        if not queries:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(queries), np.concatenate(points)
+
+
+def interpolate_idw(x: np.ndarray, y: np.ndarray, values: np.ndarray, grid: Grid,
+                    radius: Optional[float] = None, power: float = 2.0,
+                    chunk: int = 1_000_000) -> np.ndarray:
+    """Inverse de la distance à la puissance `power`, sur les points à moins de `radius`"""
+    radius = 1.5 * max(grid.dx, grid.dy) if radius is None else radius
+    index = CellIndex(x, y, radius)
+
+    gx, gy = np.meshgrid(grid.x, grid.y)
+    gx, gy = gx.ravel(), gy.ravel()
+    result = np.full(len(gx), np.nan)
+
+    # paquets de nœuds dont le voisinage contient environ `chunk` points
+    density = len(x) / max(index.nx * index.ny, 1)
+    nodes = max(1, int(chunk / max(9 * density, 1)))
+    for start in range(0, len(gx), nodes):
+        qx, qy = gx[start:start + nodes], gy[start:start + nodes]
+        q, p = index.neighbours(qx, qy)
+        d2 = (x[p] - qx[q]) ** 2 + (y[p] - qy[q]) ** 2
+        near = d2 <= radius ** 2
+        q, p, d2 = q[near], p[near], d2[near]
+
+        weights = 1.0 / np.maximum(d2, 1e-24) ** (power / 2)
+        num = np.bincount(q, weights=weights * values[p], minlength=len(qx))
+        den = np.bincount(q, weights=weights, minlength=len(qx))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[start:start + nodes] = num / den
+
+    return result.reshape(grid.ny, grid.nx)
+
+
+def regrid(x: np.ndarray, y: np.ndarray, values: np.ndarray, dx: float, dy: Optional[float] = None,
+           method: Literal["bin", "idw"] = "bin", radius: Optional[float] = None,
+           chunk: int = 1_000_000) -> tuple[np.ndarray, Grid]:
+    """Carte (ny, nx) sur une grille régulière de pas dx, dy couvrant les points"""
+    x, y, values = (np.asarray(a, dtype=float) for a in (x, y, values))
+    finite = np.isfinite(x) & np.isfinite(y) & np.isfinite(values)
+    x, y, values = x[finite], y[finite], values[finite]
+
+    grid = make_grid(x, y, dx, dy)
+    if method == "bin":
+        return bin_points(x, y, values, grid, chunk), grid
+    return interpolate_idw(x, y, values, grid, radius, chunk=chunk), grid
+
+
+def load_scan_csv(path: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(x, y, valeur) d'un CSV de Scan2DRunner, positions mesurées si elles y sont"""
+    data = np.genfromtxt(path, delimiter=";", names=True)
+    names = data.dtype.names
+    x = data["measX_um"] if "measX_um" in names else data["targetX_um"]
+    y = data["measY_um"] if "measY_um" in names else data["targetY_um"]
+    return x, y, data["value"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Carte régulière à partir des positions mesurées d'un scan")
+    parser.add_argument("csv")
+    parser.add_argument("--dx", type=float, required=True, help="pas de la grille en X (µm)")
+    parser.add_argument("--dy", type=float, help="pas en Y (µm), dx par défaut")
+    parser.add_argument("--method", choices=["bin", "idw"], default="bin")
+    parser.add_argument("--radius", type=float, help="rayon de l'interpolation idw (µm)")
+    parser.add_argument("-o", "--output", default="carte.npy")
+    args = parser.parse_args()
+
+    x, y, values = load_scan_csv(args.csv)
+    carte, grid = regrid(x, y, values, args.dx, args.dy, args.method, args.radius)
+    np.save(args.output, carte)
+    print(f"Carte {grid.ny}x{grid.nx} (origine {grid.x0:.3f}, {grid.y0:.3f} µm) "
+          f"enregistrée dans {args.output}, {np.isnan(carte).sum()} nœuds vides")
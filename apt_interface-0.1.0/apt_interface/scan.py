@@ -1,6 +1,8 @@
-from KPZ101 import KPZ101
+from . import tracing
+from .KPZ101 import KPZ101
+from .measurement import CallableMeasurement, Measurement, MeasurementPipeline
+from .trajectory import CompiledTrajectory
 import numpy as np
-import matplotlib.pyplot as plt
 from pydantic import BaseModel, validator
 from pydantic_yaml import parse_yaml_file_as
 from typing import Literal, Optional 
@@ -31,13 +33,17 @@ class SpiraleConfig(BaseModel):
     n: int
     w: float
 
+class HilbertConfig(BaseModel):
+    order: int
+
 class ScanConfig(BaseModel):
     """Description du fichier yaml"""
 
     zoi: ZoiConfig
-    scan_type: Literal["balayage", "spirale"]
+    scan_type: Literal["balayage", "spirale", "hilbert"]
     balayage: Optional[BalayageConfig] = None
     spirale: Optional[SpiraleConfig] = None
+    hilbert: Optional[HilbertConfig] = None
     mode: Literal["open_loop", "closed_loop"]
     acquisition_time: float
 
@@ -69,55 +75,78 @@ class Scan():
             case "spirale":
                 # TODO: load conf
                 self.coords = self.spiral(10000)
+            case "hilbert":
+                self.coords = self.hilbert(self.conf.hilbert.order)
 
 
-    def scan(self, function, *args, **kwargs) -> np.ndarray:
-        res = np.zeros(self.coords.shape[0])
-        print(res.shape)
-
-        for i, coord in enumerate(self.coords):
-            print(f"{i=}, {coord=}")
-            for j, axis_coord in enumerate(coord):
-                if axis_coord is not None:
-                    if self.mode == "closed_loop":
-                        self.axis[j].set_position(int(axis_coord))
-                    else:
-                        self.axis[j].set_output_voltage(int(axis_coord))
-
-            res[i] = function(args, kwargs)
-
-        return res
-    
-    def visualize(self) -> None:
-        plt.ion()
-        fig = plt.figure()
-        ax = fig.add_subplot(111, projection='3d')
+    def compile(self) -> CompiledTrajectory:
+        """Trames de toute la trajectoire, limites vérifiées une fois (voir trajectory.py)"""
+        return CompiledTrajectory(self.coords[:, :len(self.axis)], self.axis, self.mode)
 
-        X, Y, Z = zip(*self.coords)
-        default = np.zeros(len(X))
-        X, Y, Z = map((lambda l: default if np.isnan(l[0]).any() else l), [X, Y, Z])
+    def scan(self, function, *args, compiled: bool = False, **kwargs) -> np.ndarray:
+        """
+        `function` est une Measurement (voir measurement.py) ou une fonction appelée
+        `function(args, kwargs)` à chaque point. Les échantillons complets (horodatage,
+        lectures KSG101) sont gardés dans `self.samples`.
 
-        ax.plot(X, Y, Z)
+        Avec `compiled=True`, la trajectoire est d'abord compilée (ValueError avant tout
+        mouvement si un point est hors limites, RuntimeError si le mode d'un KPZ101
+        n'est pas `self.mode`) puis rejouée trame par trame.
+        """
+        trajectory = self.compile() if compiled else None
 
-        plt.draw()
-        plt.pause(1)
+        if isinstance(function, Measurement):
+            measurement = function
+        else:
+            measurement = CallableMeasurement(function, args, kwargs)
 
-        for coord in self.coords:
-            x, y, z = map((lambda l: 0 if np.isnan(l) else l), coord)
-            print(x, y, z)
-            ax.plot(X, Y, Z)
-            ax.scatter(x, y, z, c='red', marker='o', s=50)
-
-            ax.set_xlabel('X')
-            ax.set_ylabel('Y')
-            ax.set_zlabel('Z')
+        res = np.zeros(self.coords.shape[0])
+        self.samples = [None] * len(res)
+        print(res.shape)
 
-            plt.draw()
-            plt.pause(self.conf.acquisition_time)
+        tracer = tracing.tracer
+
+        def store(done) -> None:
+            if done is not None:
+                t0 = tracer.now()
+                k, sample = done
+                res[k] = sample.value
+                self.samples[k] = sample
+                tracer.record("store", t0, point=k)
+
+        pipeline = MeasurementPipeline(measurement)
+        try:
+            for i, coord in enumerate(self.coords):
+                print(f"{i=}, {coord=}")
+                tracer.point = i
+                t0 = tracer.now()
+                if trajectory is not None:
+                    trajectory.send(i)
+                else:
+                    for j, axis_coord in enumerate(coord):
+                        if axis_coord is not None:
+                            if self.mode == "closed_loop":
+                                self.axis[j].set_position(int(axis_coord))
+                            else:
+                                self.axis[j].set_output_voltage(int(axis_coord))
+                tracer.record("move", t0)
+
+                # la lecture du point précédent se termine pendant ce déplacement
+                t0 = tracer.now()
+                result = pipeline.acquire(i)
+                tracer.record("measure", t0)
+                store(result)
+            store(pipeline.collect())
+        finally:
+            pipeline.close()
 
-            ax.cla()
+        return res
+    
+    def visualize(self, speed: float = 1.0, max_points: int = 20000) -> None:
+        """Affiche la trajectoire et la parcourt à `speed` fois la vitesse réelle"""
+        from .preview import TrajectoryPreview
 
-        plt.show()
+        TrajectoryPreview(self.coords, self.conf.acquisition_time, speed, max_points).show()
 
     def switch_axis(self, axis: str, n: list[int]) -> enumerate:
         def manage_void_axis(arg1: int, arg2: int, arg3: int) -> enumerate:
@@ -143,7 +172,8 @@ class Scan():
         print(n)
 
         coords = np.zeros(n[0]*n[1]*n[2], dtype=(float, 3))
-        estimated_time = coords.size * self.conf.acquisition_time
+        # une ligne de coords par point (coords.size compte les 3 axes)
+        estimated_time = coords.shape[0] * self.conf.acquisition_time
         print(f"Temps estimé: {estimated_time}")
 
         index = 0
@@ -180,28 +210,32 @@ class Scan():
         return coords
 
 
-    """
-    def hilbert_curve_coordinates(order, t):
-        if order == 0:
-            return [(0.5, 0.5)]
+    def hilbert(self, order: int) -> np.ndarray[tuple]:
+        """Courbe de Hilbert d'ordre `order` (4**order points) dans le plan XY de la zoi"""
+        n = 2 ** order
+        t = np.arange(n * n)
+        x = np.zeros_like(t)
+        y = np.zeros_like(t)
+
+        s = 1
+        while s < n:
+            rx = 1 & (t // 2)
+            ry = 1 & (t ^ rx)
 
-        # Define the four corners of the unit square
-        corners = [(0, 0), (0, 1), (1, 1), (1, 0)]
+            # rotation du quadrant
+            flip = (ry == 0) & (rx == 1)
+            x[flip] = s - 1 - x[flip]
+            y[flip] = s - 1 - y[flip]
+            swap = ry == 0
+            x[swap], y[swap] = y[swap], x[swap]
 
-        # Map t to the appropriate quadrant
-        index = (t >> (2 * (order - 1))) & 0b11
+            x += s * rx
+            y += s * ry
+            t //= 4
+            s *= 2
 
-        # Calculate the midpoint of the current quadrant
-        mid_x = (corners[0][0] + corners[2][0]) / 2
-        mid_y = (corners[0][1] + corners[2][1]) / 2
+        coords = np.full(n * n, np.nan, dtype=(float, 3))
+        coords[:, 0] = self.X + self.deltaX * x / max(n - 1, 1)
+        coords[:, 1] = self.Y + self.deltaY * y / max(n - 1, 1)
 
-        # Rotate and translate the coordinates
-        if index == 0:
-            return [(mid_y, mid_x)] + hilbert_curve_coordinates(order - 1, t)
-        elif index == 1:
-            return hilbert_curve_coordinates(order - 1, t) + [(mid_x, mid_y)]
-        elif index == 2:
-            return hilbert_curve_coordinates(order - 1, t) + [(mid_x, mid_y)]
-        elif index == 3:
-            return [(mid_y, mid_x)] + hilbert_curve_coordinates(order - 1, t)
-    """
+        return coords
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Scan 2D en boucle fermée (KPZ101 + KSG101 sur X et Y) avec écriture CSV.
+
+Aucune dépendance Qt : la boucle est utilisée par le `ScanWorker` de l'interface
+(`prime.py`) et par la commande `apt-interface scan` sur un poste sans affichage.
+Les résultats sont transmis par callbacks (`on_point(i, j, valeur)` et
+`on_convergence(lecture, itération)`).
+
+La mesure est une `Measurement` (measurement.py) : le compteur SPCNT si `spcnt` est
+renseigné, sinon une valeur simulée. Sa lecture se termine pendant le déplacement
+vers le point suivant ; le CSV garde les horodatages et les lectures KSG101 de la
+fenêtre de mesure.
+
+Le CSV contient aussi la position atteinte en fin de boucle fermée (measX_um,
+measY_um), à utiliser plutôt que la consigne pour reconstruire la carte (regrid.py).
+"""
+
+import csv
+import time
+import random  # Pour simuler des mesures
+from contextlib import ExitStack
+from typing import Callable, Optional
+
+from pydantic import BaseModel
+
+from .KPZ101 import KPZ101
+from .KSG101 import KSG101
+from . import tracing
+from .closed_loop import counts_to_um, move_axis_to_um_closed_loop
+from .measurement import CallableMeasurement, Measurement, MeasurementPipeline, SPCNTMeasurement
+
+CSV_FILENAME = "scan2D_closed_loop.csv"
+
+
+class Scan2DConfig(BaseModel):
+    """Description du fichier yaml (mêmes paramètres que le panneau de l'interface)"""
+
+    LX: float = 10.0          # µm
+    LY: float = 5.0           # µm
+    DX: float = 0.2           # µm
+    DY: float = 0.1           # µm
+    SETTLE_TIME: float = 0.5  # s
+    GAIN: float = 0.002
+    SLEEP: float = 0.01       # s
+    TOL_UM: float = 0.5       # µm
+    MAX_ITER: int = 200
+    N_AVG: int = 1            # lectures KSG101 moyennées à chaque itération de la boucle fermée
+    GATE_TIME: float = 0.1    # s, fenêtre de mesure du SPCNT à chaque point
+
+    kpz_x: str = "conf/config_KPZ_X.yaml"
+    ksg_x: str = "conf/config_KSG_X.yaml"
+    kpz_y: str = "conf/config_KPZ_Y.yaml"
+    ksg_y: str = "conf/config_KSG_Y.yaml"
+    spcnt: Optional[str] = None  # yaml du SPCNT ; None -> mesure simulée
+    trace: Optional[str] = None  # fichier Chrome trace des phases de chaque point (voir tracing.py)
+    output: str = CSV_FILENAME
+    emulate: bool = False        # platines émulées (emulator.py), pour essayer sans matériel
+
+    @property
+    def nx(self) -> int:
+        return int(self.LX / self.DX) + 1
+
+    @property
+    def ny(self) -> int:
+        return int(self.LY / self.DY) + 1
+
+
+class Progress():
+    """Affiche l'avancement au plus toutes les `interval` secondes"""
+
+    def __init__(self, total: int, interval: float = 1.0) -> None:
+        self.total = total
+        self.interval = interval
+        self.t0 = time.monotonic()
+        self.next = self.t0 + interval
+
+    def update(self, done: int) -> None:
+        now = time.monotonic()
+        if now < self.next and done < self.total:
+            return
+        self.next = now + self.interval
+
+        rate = done / (now - self.t0) if now > self.t0 else 0.0
+        remaining = (self.total - done) / rate if rate > 0 else float("inf")
+        print(f"{done}/{self.total} points ({100 * done / self.total:.1f} %), "
+              f"{rate:.1f} points/s, reste ~{remaining:.0f} s")
+
+
+class Scan2DRunner():
+
+    def __init__(self, config: Scan2DConfig,
+                 on_point: Optional[Callable] = None,
+                 on_convergence: Optional[Callable] = None,
+                 progress_interval: float = 1.0,
+                 measurement: Optional[Measurement] = None) -> None:
+        self.conf = config
+        self.measurement = measurement
+        self.on_point = on_point
+        self.on_convergence = on_convergence
+        self.progress_interval = progress_interval
+        self.nx = config.nx
+        self.ny = config.ny
+        self._isRunning = True
+        self._paused = False
+
+    def stop(self) -> None:
+        self._isRunning = False
+        print("Arrêt du scan demandé.")
+
+    def toggle_pause(self) -> None:
+        self._paused = not self._paused
+        if self._paused:
+            print("Scan pausé.")
+        else:
+            print("Scan repris.")
+
+    def _wait_if_paused(self) -> bool:
+        """Bloque tant que le scan est en pause, renvoie False si le scan doit s'arrêter"""
+        while self._paused and self._isRunning:
+            time.sleep(0.1)
+        return self._isRunning
+
+    def _export_trace(self) -> None:
+        tracer = tracing.tracer
+        tracing.disable()
+        tracer.export_chrome(self.conf.trace)
+        print(f"Trace enregistrée dans {self.conf.trace}")
+        print(tracer.summary_text())
+
+    def run(self) -> None:
+        c = self.conf
+        print(f"Début du scan 2D (nx={self.nx}, ny={self.ny})...")
+        progress = Progress(self.nx * self.ny, self.progress_interval)
+        done = 0
+
+        with ExitStack() as stack:
+            if c.emulate:
+                from .emulator import emulated_axis
+                (kpzX, ksgX), (kpzY, ksgY) = emulated_axis(c.kpz_x, c.ksg_x), emulated_axis(c.kpz_y, c.ksg_y)
+            else:
+                kpzX, ksgX = KPZ101(c.kpz_x), KSG101(c.ksg_x)
+                kpzY, ksgY = KPZ101(c.kpz_y), KSG101(c.ksg_y)
+            ksgX = stack.enter_context(ksgX)
+            kpzX = stack.enter_context(kpzX)
+            ksgY = stack.enter_context(ksgY)
+            kpzY = stack.enter_context(kpzY)
+
+            measurement = self.measurement
+            if measurement is None and c.spcnt is not None:
+                from .SPCNT import SPCNT
+                counter = stack.enter_context(SPCNT(c.spcnt))
+                measurement = SPCNTMeasurement(counter, c.GATE_TIME)
+            elif measurement is None:
+                # Mesure simulée, sans fenêtre d'attente (GATE_TIME ne concerne que le compteur)
+                measurement = CallableMeasurement(random.uniform, 0, 100)
+            measurement.attach((ksgX, ksgY))
+
+            kpzX.enable_output()
+            kpzY.enable_output()
+            ksgX.zeroing()
+            ksgY.zeroing()
+
+            f = stack.enter_context(open(c.output, "w", newline=""))
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(["iX", "iY", "targetX_um", "targetY_um", "measX_um", "measY_um", "value",
+                             "readX_um", "readY_um", "t_start", "t_end"])
+
+            if c.trace is not None:
+                tracing.enable(8 * self.nx * self.ny + 4 * self.ny)
+                stack.callback(self._export_trace)
+            tracer = tracing.tracer
+
+            def store(result) -> None:
+                nonlocal done
+                if result is None:
+                    return
+                t0 = tracer.now()
+                (i, j, setX_um, setY_um, measX_um, measY_um), sample = result
+                if self.on_point is not None:
+                    self.on_point(i, j, sample.value)
+                readX, readY = sample.readbacks
+                writer.writerow([i, j, setX_um, setY_um, measX_um, measY_um, sample.value,
+                                 counts_to_um(readX), counts_to_um(readY),
+                                 sample.t_start, sample.t_end])
+                done += 1
+                progress.update(done)
+                tracer.record("store", t0, point=j * self.nx + i)
+
+            pipeline = MeasurementPipeline(measurement)
+            stack.callback(pipeline.close)
+
+            for j in range(self.ny):
+                if not self._wait_if_paused():
+                    break
+                setY_um = j * c.DY
+                tracer.point = j * self.nx
+                measY_um = counts_to_um(move_axis_to_um_closed_loop(kpzY, ksgY, setY_um,
+                                                                    c.GAIN, c.TOL_UM, c.SLEEP, c.MAX_ITER,
+                                                                    trace="move_y", n_avg=c.N_AVG))
+                t0 = tracer.now()
+                time.sleep(c.SETTLE_TIME)
+                tracer.record("settle", t0)
+
+                for i in range(self.nx):
+                    if not self._wait_if_paused():
+                        break
+                    setX_um = i * c.DX
+                    tracer.point = j * self.nx + i
+                    measX_um = counts_to_um(move_axis_to_um_closed_loop(kpzX, ksgX, setX_um,
+                                                                        c.GAIN, c.TOL_UM, c.SLEEP, c.MAX_ITER,
+                                                                        update_callback=self.on_convergence,
+                                                                        trace="move_x", n_avg=c.N_AVG))
+                    t0 = tracer.now()
+                    time.sleep(c.SETTLE_TIME)
+                    tracer.record("settle", t0)
+
+                    t0 = tracer.now()
+                    result = pipeline.acquire((i, j, setX_um, setY_um, measX_um, measY_um))
+                    tracer.record("measure", t0)
+                    store(result)
+            store(pipeline.collect())
+
+            for name, ksg in (("X", ksgX), ("Y", ksgY)):
+                if any(ksg.dev.recovery.values()):
+                    print(f"Reprises sur erreur de lecture du KSG101 {name} : {ksg.dev.recovery}")
+        print("Scan terminé.")
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Compteur SPCNT simulé, pour travailler sans l'instrument (tests, benchmarks, portable).
+
+Il se choisit par la ressource VISA, par exemple dans config_SPCNT.yaml :
+
+    resource: "SIM::SPCNT::dist=normal;mean=500;std=50;latency=0.001;drift=0.5"
+
+Paramètres (tous optionnels) :
+  - dist        : normal, poisson, uniform ou constant
+  - mean, std   : Hz (uniform : mean +/- std * sqrt(3))
+  - drift       : Hz/s, dérive linéaire de la moyenne depuis l'ouverture
+  - latency     : s, durée d'un aller-retour (chaque query)
+  - sample_time : s, durée d'acquisition d'un échantillon en mode bulk
+  - seed        : graine du générateur
+
+Commandes reconnues : MEAS:FREQ?, CONF:ARR:FREQ <n>, INIT, *OPC?, FETC:ARR?, *IDN?, *RST.
+"""
+
+import time
+
+import numpy as np
+
+DEFAULTS = {"dist": "normal", "mean": 500.0, "std": 50.0, "drift": 0.0,
+            "latency": 0.0, "sample_time": 0.0, "seed": None}
+
+
+def parse_resource(resource: str) -> dict:
+    """`SIM::SPCNT::a=1;b=2` -> paramètres du compteur simulé"""
+    params = dict(DEFAULTS)
+    fields = resource.split("::")
+    options = fields[2] if len(fields) > 2 else ""
+    for option in filter(None, options.split(";")):
+        key, value = option.split("=", 1)
+        if key not in params:
+            raise ValueError(f"Unknown simulated counter parameter {key!r}")
+        params[key] = value if key == "dist" else (int(value) if key == "seed" else float(value))
+    return params
+
+
+class SimulatedCounter():
+    """Mêmes méthodes que la ressource pyvisa utilisée par SPCNT"""
+
+    def __init__(self, dist: str = "normal", mean: float = 500.0, std: float = 50.0,
+                 drift: float = 0.0, latency: float = 0.0, sample_time: float = 0.0,
+                 seed=None, timeout_ms: int = 5000) -> None:
+        if dist not in ("normal", "poisson", "uniform", "constant"):
+            raise ValueError(f"Unknown distribution {dist!r}")
+        self.dist = dist
+        self.mean = mean
+        self.std = std
+        self.drift = drift
+        self.latency = latency
+        self.sample_time = sample_time
+        self.timeout = timeout_ms
+        self.rng = np.random.default_rng(seed)
+
+        self.array_size = 1
+        self.t0 = time.monotonic()
+        self.t_init = None
+
+    @classmethod
+    def from_resource(cls, resource: str, timeout_ms: int = 5000):
+        return cls(**parse_resource(resource), timeout_ms=timeout_ms)
+
+    def samples(self, n: int) -> np.ndarray:
+        center = self.mean + self.drift * (time.monotonic() - self.t0)
+        match self.dist:
+            case "normal":
+                return self.rng.normal(center, self.std, n)
+            case "poisson":
+                return self.rng.poisson(max(center, 0.0), n).astype(float)
+            case "uniform":
+                half = self.std * np.sqrt(3)
+                return self.rng.uniform(center - half, center + half, n)
+            case "constant":
+                return np.full(n, center)
+
+    def _roundtrip(self) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _wait_acquisition(self) -> None:
+        # le bloc n'est disponible qu'après array_size * sample_time
+        remaining = self.t_init + self.array_size * self.sample_time - time.monotonic()
+        if remaining * 1000 > self.timeout:
+            raise TimeoutError("simulated counter: acquisition longer than timeout")
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def _fetch(self) -> np.ndarray:
+        if self.t_init is None:
+            raise RuntimeError("FETC:ARR? without INIT")
+        self._wait_acquisition()
+        self.t_init = None
+        self._roundtrip()
+        return self.samples(self.array_size)
+
+    def write(self, command: str) -> None:
+        command = command.strip().upper()
+        if command.startswith("CONF:ARR:FREQ"):
+            self.array_size = int(command.split()[-1])
+        elif command == "INIT":
+            self.t_init = time.monotonic()
+        elif command == "*RST":
+            self.array_size = 1
+            self.t_init = None
+        else:
+            raise ValueError(f"simulated counter: unknown command {command!r}")
+
+    def query(self, command: str) -> str:
+        command = command.strip().upper()
+        if command == "*IDN?":
+            return "Thorlabs,SPCNT (simulated),SIM,0.1"
+        if command == "MEAS:FREQ?":
+            self._roundtrip()
+            return f"{self.samples(1)[0]:.6e}"
+        if command == "*OPC?":
+            if self.t_init is not None:
+                self._wait_acquisition()
+            self._roundtrip()
+            return "1"
+        if command == "FETC:ARR?":
+            return ",".join(f"{f:.6e}" for f in self._fetch())
+        raise ValueError(f"simulated counter: unknown query {command!r}")
+
+    def query_ascii_values(self, command: str, container=list):
+        values = np.array(self.query(command).split(","), dtype=float)
+        return container(values)
+
+    def query_binary_values(self, command: str, datatype: str = "f", container=list):
+        if command.strip().upper() != "FETC:ARR?":
+            raise ValueError(f"simulated counter: unknown query {command!r}")
+        return container(self._fetch().astype(datatype))
+
+    def close(self) -> None:
+        pass
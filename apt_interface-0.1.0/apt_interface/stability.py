@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Statistiques de stabilité en continu pour les fréquences du SPCNT.
+
+  - SlidingStats   : moyenne et écart-type sur les `window` derniers échantillons
+  - AllanDeviation : écart-type d'Allan recouvrant pour des tau espacés logarithmiquement
+
+Mémoire et temps de calcul par échantillon sont bornés (indépendants de la durée
+de l'acquisition) : l'historique conservé pour Allan se limite à 2 * m_max échantillons.
+"""
+
+import numpy as np
+
+from .live_stats import RingBuffer
+
+
+class SlidingStats():
+
+    def __init__(self, window: int = 1000) -> None:
+        self.buffer = RingBuffer(window)
+
+    def update(self, frequencies: np.ndarray) -> None:
+        self.buffer.extend(frequencies)
+
+    @property
+    def mean(self) -> float:
+        return float(self.buffer.values().mean()) if len(self.buffer) else np.nan
+
+    @property
+    def std(self) -> float:
+        return float(self.buffer.values().std(ddof=1)) if len(self.buffer) > 1 else np.nan
+
+
+class AllanDeviation():
+
+    def __init__(self, max_m: int = 4096, points_per_decade: int = 5) -> None:
+        # tailles de moyennage m (tau = m * tau0), espacées logarithmiquement
+        n = int(np.log10(max_m) * points_per_decade) + 1
+        self.m = np.unique(np.round(np.logspace(0, np.log10(max_m), n)).astype(np.int64))
+
+        self._history = np.zeros(0)  # dernières valeurs de phase (somme cumulée)
+        self._reference = None
+        self._sum = np.zeros(len(self.m))
+        self._count = np.zeros(len(self.m), dtype=np.int64)
+        self.n_samples = 0
+        self.duration = 0.0
+
+    def update(self, frequencies: np.ndarray, duration: float) -> None:
+        """Ajoute un bloc d'échantillons consécutifs acquis en `duration` secondes"""
+        frequencies = np.asarray(frequencies, dtype=float)
+        if len(frequencies) == 0:
+            return
+        if self._reference is None:
+            # une fréquence constante retranchée disparaît des différences secondes
+            self._reference = frequencies[0]
+        self.n_samples += len(frequencies)
+        self.duration += duration
+
+        last = self._history[-1] if len(self._history) else 0.0
+        h = len(self._history)
+        phase = np.concatenate([self._history, last + np.cumsum(frequencies - self._reference)])
+
+        # seuls les termes qui font intervenir un nouvel échantillon sont ajoutés
+        for k, m in enumerate(self.m):
+            start = max(0, h - 2 * m)
+            stop = len(phase) - 2 * m
+            if stop <= start:
+                continue
+            d = phase[start + 2 * m:] - 2 * phase[start + m:stop + m] + phase[start:stop]
+            self._sum[k] += d @ d
+            self._count[k] += len(d)
+
+        history = phase[-2 * int(self.m[-1]):]
+        self._history = history - history[0]
+
+    @property
+    def tau0(self) -> float:
+        """Période d'échantillonnage moyenne (s)"""
+        return self.duration / self.n_samples if self.n_samples else np.nan
+
+    def deviation(self) -> tuple[np.ndarray, np.ndarray]:
+        """Renvoie (tau en s, écart-type d'Allan en Hz) pour les tau déjà calculables"""
+        valid = self._count > 0
+        m = self.m[valid]
+        adev = np.sqrt(self._sum[valid] / (2 * m ** 2 * self._count[valid]))
+        return m * self.tau0, adev
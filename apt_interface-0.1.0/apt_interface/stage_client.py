@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Client du serveur de platines (stage_server.py).
+
+`RemoteKPZ101` et `RemoteKSG101` ont les mêmes méthodes que `KPZ101` et `KSG101`
+(lectures multiples et moyennées comprises), un script existant ou
+`move_axis_to_um_closed_loop` peut donc les utiliser sans ouvrir lui-même les
+liaisons FTDI :
+
+    with StageClient() as client:
+        kpz = client.kpz("kpz_x")
+        ksg = client.ksg("ksg_x")
+        kpz.set_output_voltage(10)
+        print(ksg.get_reading())
+
+        # plusieurs commandes en un seul aller-retour
+        with client.batch() as batch:
+            x = batch.move_um("x", 5.0)
+            y = batch.move_um("y", 2.0)
+        print(x.value, y.value)
+"""
+
+import itertools
+import json
+import socket
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .KSG101 import ReadingStats, reading_stats
+from .stage_server import (AXIS_MOVE_UM, AXIS_READ_UM, COMMAND, KPZ_DISABLE, KPZ_ENABLE, KPZ_SET_IO, KPZ_SET_MODE,
+                           KPZ_SET_POSITION, KPZ_SET_VOLTAGE, KSG_GET_IO, KSG_IDENTIFY, KSG_MAX_TRAVEL, KSG_READ,
+                           KSG_READ_MANY, KSG_SET_IO, KSG_ZERO, MAX_READ_MANY, OK, PING, REQUEST, RESULT,
+                           SOCKET_PATH, TABLE, recv_exact, result_count)
+
+
+class StageError(RuntimeError):
+    pass
+
+
+class Result():
+    """Résultat d'une commande d'un lot, disponible à la sortie du `with client.batch()`"""
+
+    def __init__(self) -> None:
+        self.status = None
+        self.value = None
+
+
+class StageClient():
+    pass
+
+class StageClient():
+
+    def __init__(self, path: str = SOCKET_PATH) -> None:
+        self.path = path
+        self.sock = None
+        self.devices: dict[str, tuple[int, str]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> StageClient:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+        size, = TABLE.unpack(recv_exact(self.sock, TABLE.size))
+        table = json.loads(recv_exact(self.sock, size))
+        self.devices = {d["name"]: (index, d["kind"]) for index, d in enumerate(table["devices"])}
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.sock.close()
+
+    def index(self, name: str, kind: Optional[str] = None) -> int:
+        if name not in self.devices:
+            raise KeyError(f"Unknown device {name!r}, server has {list(self.devices)}")
+        index, device_kind = self.devices[name]
+        if kind is not None and device_kind != kind:
+            raise TypeError(f"{name!r} is a {device_kind}, not a {kind}")
+        return index
+
+    def call(self, commands: list[tuple[int, int, float]]) -> list[tuple[int, float]]:
+        """
+        Envoie des commandes (opcode, index, argument) et renvoie leurs (statut, valeur),
+        à la suite (`result_count` résultats par commande)
+        """
+        if sum(result_count(opcode, argument) for opcode, _, argument in commands) > 0xffff:
+            raise ValueError("Too many results for one request, split the batch")
+        request_id = next(self._ids) & 0xffffffff
+        payload = REQUEST.pack(len(commands), request_id) + b"".join(COMMAND.pack(*c) for c in commands)
+        with self._lock:
+            self.sock.sendall(payload)
+            count, answer_id = REQUEST.unpack(recv_exact(self.sock, REQUEST.size))
+            results = list(RESULT.iter_unpack(recv_exact(self.sock, count * RESULT.size)))
+        if answer_id != request_id:
+            raise StageError(f"Response {answer_id} does not match request {request_id}")
+        return results
+
+    def command(self, opcode: int, name: str, argument: float = 0.0, kind: Optional[str] = None) -> float:
+        return self.command_many(opcode, name, argument, kind)[0]
+
+    def command_many(self, opcode: int, name: str, argument: float = 0.0,
+                     kind: Optional[str] = None) -> list[float]:
+        """Commande à plusieurs résultats (KSG_READ_MANY, KSG_GET_IO)"""
+        results = self.call([(opcode, self.index(name, kind), argument)])
+        failed = [status for status, _ in results if status != OK]
+        if failed:
+            raise StageError(f"Command {opcode:#x} on {name!r} failed with status {failed[0]}")
+        return [value for _, value in results]
+
+    def ping(self, name: str) -> float:
+        return self.command(PING, name)
+
+    def kpz(self, name: str) -> "RemoteKPZ101":
+        return RemoteKPZ101(self, name)
+
+    def ksg(self, name: str) -> "RemoteKSG101":
+        return RemoteKSG101(self, name)
+
+    def move_um(self, axis: str, target_um: float) -> float:
+        """Déplacement en boucle fermée exécuté par le serveur, renvoie la position lue (µm)"""
+        return self.command(AXIS_MOVE_UM, axis, target_um, "axis")
+
+    def read_um(self, axis: str) -> float:
+        return self.command(AXIS_READ_UM, axis, kind="axis")
+
+    def batch(self) -> "Batch":
+        return Batch(self)
+
+
+class Batch():
+    """Commandes accumulées puis envoyées en une seule requête"""
+
+    def __init__(self, client: StageClient) -> None:
+        self.client = client
+        self.commands = []
+        self.results = []
+
+    def add(self, opcode: int, name: str, argument: float = 0.0, kind: Optional[str] = None) -> Result:
+        self.commands.append((opcode, self.client.index(name, kind), argument))
+        self.results.append(Result())
+        return self.results[-1]
+
+    def set_output_voltage(self, name: str, tension: float) -> Result:
+        return self.add(KPZ_SET_VOLTAGE, name, tension, "KPZ101")
+
+    def set_position(self, name: str, pos: int) -> Result:
+        return self.add(KPZ_SET_POSITION, name, pos, "KPZ101")
+
+    def get_reading(self, name: str) -> Result:
+        return self.add(KSG_READ, name, kind="KSG101")
+
+    def read_many(self, name: str, n: int) -> Result:
+        """Result.value : tableau des n lectures (n <= MAX_READ_MANY)"""
+        if not 1 <= n <= MAX_READ_MANY:
+            raise ValueError(f"n must be in 1..{MAX_READ_MANY}")
+        return self.add(KSG_READ_MANY, name, n, "KSG101")
+
+    def move_um(self, axis: str, target_um: float) -> Result:
+        return self.add(AXIS_MOVE_UM, axis, target_um, "axis")
+
+    def read_um(self, axis: str) -> Result:
+        return self.add(AXIS_READ_UM, axis, kind="axis")
+
+    def __enter__(self) -> "Batch":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is not None or not self.commands:
+            return
+        results = iter(self.client.call(self.commands))
+        for result, (opcode, _, argument) in zip(self.results, self.commands):
+            values = [next(results) for _ in range(result_count(opcode, argument))]
+            result.status = next((status for status, _ in values if status != OK), OK)
+            if opcode == KSG_READ_MANY:
+                result.value = np.array([value for _, value in values])
+            else:
+                result.value = values[0][1]
+        failed = [k for k, r in enumerate(self.results) if r.status != OK]
+        if failed:
+            raise StageError(f"Commands {failed} of the batch failed")
+
+
+class RemoteKPZ101():
+    """Mêmes méthodes que KPZ101 ; le contrôleur reste ouvert par le serveur"""
+
+    def __init__(self, client: StageClient, name: str) -> None:
+        self.client = client
+        self.name = name
+        client.index(name, "KPZ101")
+
+    def __enter__(self) -> "RemoteKPZ101":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass  # la sortie reste sous le contrôle du serveur (d'autres clients peuvent l'utiliser)
+
+    def enable_output(self) -> None:
+        self.client.command(KPZ_ENABLE, self.name)
+
+    def disable_output(self) -> None:
+        self.client.command(KPZ_DISABLE, self.name)
+
+    def set_output_voltage(self, tension: float) -> None:
+        self.client.command(KPZ_SET_VOLTAGE, self.name, tension)
+
+    def set_position(self, pos: int) -> None:
+        self.client.command(KPZ_SET_POSITION, self.name, pos)
+
+    def set_mode(self) -> None:
+        """Réapplique le mode du fichier de configuration du serveur"""
+        self.client.command(KPZ_SET_MODE, self.name)
+
+    def set_io(self) -> None:
+        """Réapplique les entrées/sorties du fichier de configuration du serveur"""
+        self.client.command(KPZ_SET_IO, self.name)
+
+
+class RemoteKSG101():
+    """Mêmes méthodes que KSG101 ; le contrôleur reste ouvert par le serveur"""
+
+    def __init__(self, client: StageClient, name: str) -> None:
+        self.client = client
+        self.name = name
+        client.index(name, "KSG101")
+
+    def __enter__(self) -> "RemoteKSG101":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def get_reading(self) -> float:
+        return int(self.client.command(KSG_READ, self.name))
+
+    def read_many(self, n: int) -> np.ndarray:
+        """n lectures, par paquets de MAX_READ_MANY dans une seule requête"""
+        index = self.client.index(self.name, "KSG101")
+        sizes = [min(MAX_READ_MANY, n - k) for k in range(0, n, MAX_READ_MANY)]
+        results = self.client.call([(KSG_READ_MANY, index, size) for size in sizes])
+        readings = np.array([value for status, value in results if status == OK])
+        if len(readings) == 0:
+            raise IOError(f"No reading received from {self.name!r}")
+        return readings
+
+    def read_stats(self, n: int, reject: Optional[float] = 3.0) -> ReadingStats:
+        return reading_stats(self.read_many(n), reject)
+
+    def read_mean(self, n: int, reject: Optional[float] = 3.0) -> float:
+        return self.read_stats(n, reject).mean
+
+    def get_io(self) -> tuple[int, int]:
+        unit, out = self.client.command_many(KSG_GET_IO, self.name)
+        return int(unit), int(out)
+
+    def set_io(self) -> None:
+        """Réapplique les entrées/sorties du fichier de configuration du serveur"""
+        self.client.command(KSG_SET_IO, self.name)
+
+    def get_max_travel(self) -> int:
+        return int(self.client.command(KSG_MAX_TRAVEL, self.name))
+
+    def identify(self) -> bool:
+        return bool(self.client.command(KSG_IDENTIFY, self.name))
+
+    def zeroing(self) -> None:
+        self.client.command(KSG_ZERO, self.name)
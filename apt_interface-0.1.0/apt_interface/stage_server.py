@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Serveur de platines : un processus unique ouvre tous les KPZ101/KSG101 et les partage
+entre plusieurs clients (interface, scripts de mesure, surveillance) via un socket Unix.
+
+    apt-interface serve conf/stage_server.yaml
+
+Protocole binaire (petit-boutiste) :
+  - à la connexion, le serveur envoie la table des appareils :
+    longueur (I) + JSON {"devices": [{"name": ..., "kind": ...}, ...]}
+  - requête : en-tête REQUEST (nombre de commandes H, identifiant I) puis les commandes
+    COMMAND (opcode B, index de l'appareil B, argument d)
+  - réponse : en-tête REQUEST (nombre de résultats, même identifiant) puis les
+    résultats RESULT (statut B, valeur d) ; une commande donne un résultat, sauf
+    KSG_READ_MANY (argument n : n lectures) et KSG_GET_IO (unité puis sortie),
+    voir `result_count`
+
+Les commandes d'une requête sont exécutées dans l'ordre et la réponse est renvoyée
+en une fois (plusieurs commandes pour un seul aller-retour). Chaque appareil a son
+verrou : les clients se partagent le matériel commande par commande, et un
+déplacement en boucle fermée (AXIS_MOVE_UM, exécuté côté serveur) garde l'axe
+pour lui jusqu'à la fin.
+
+Le socket est créé dans le répertoire d'exécution de l'utilisateur ($XDG_RUNTIME_DIR,
+sinon /tmp) avec les droits 0600 : seul l'utilisateur du serveur pilote les platines.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+from pydantic_yaml import parse_yaml_file_as
+
+from .KPZ101 import KPZ101
+from .KSG101 import KSG101
+from .closed_loop import counts_to_um, move_axis_to_um_closed_loop
+from .orchestrator import ClosedLoopConfig
+
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(),
+                           f"apt_interface-{os.getuid()}.sock")
+
+REQUEST = struct.Struct("<HI")
+COMMAND = struct.Struct("<BBd")
+RESULT = struct.Struct("<Bd")
+TABLE = struct.Struct("<I")
+
+# opcodes
+KPZ_ENABLE = 0x01
+KPZ_DISABLE = 0x02
+KPZ_SET_VOLTAGE = 0x03
+KPZ_SET_POSITION = 0x04
+KPZ_SET_MODE = 0x05
+KPZ_SET_IO = 0x06
+KSG_READ = 0x10
+KSG_ZERO = 0x11
+KSG_READ_MANY = 0x12
+KSG_GET_IO = 0x13
+KSG_SET_IO = 0x14
+KSG_MAX_TRAVEL = 0x15
+KSG_IDENTIFY = 0x16
+AXIS_MOVE_UM = 0x20
+AXIS_READ_UM = 0x21
+PING = 0x7f
+
+# statuts
+OK = 0
+UNKNOWN_DEVICE = 1
+UNKNOWN_OPCODE = 2
+DEVICE_ERROR = 3
+
+OPCODES = {
+    "KPZ101": {KPZ_ENABLE, KPZ_DISABLE, KPZ_SET_VOLTAGE, KPZ_SET_POSITION, KPZ_SET_MODE, KPZ_SET_IO, PING},
+    "KSG101": {KSG_READ, KSG_ZERO, KSG_READ_MANY, KSG_GET_IO, KSG_SET_IO, KSG_MAX_TRAVEL, KSG_IDENTIFY, PING},
+    "axis": {AXIS_MOVE_UM, AXIS_READ_UM, PING},
+}
+
+MAX_READ_MANY = 1024  # lectures par commande KSG_READ_MANY
+
+
+def result_count(opcode: int, argument: float) -> int:
+    """Nombre de résultats renvoyés pour une commande"""
+    if opcode == KSG_READ_MANY:
+        return max(1, min(int(argument), MAX_READ_MANY))
+    if opcode == KSG_GET_IO:
+        return 2
+    return 1
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+class DeviceEntry(BaseModel):
+    kind: Literal["KPZ101", "KSG101"]
+    config: str
+
+
+class AxisEntry(BaseModel):
+    kpz: str
+    ksg: str
+
+
+class StageServerConfig(BaseModel):
+    """Description du fichier yaml"""
+
+    socket: str = SOCKET_PATH
+    devices: dict[str, DeviceEntry]
+    axes: dict[str, AxisEntry] = {}
+    closed_loop: ClosedLoopConfig = ClosedLoopConfig()
+    emulate: bool = False  # platines émulées (emulator.py), pour essayer sans matériel
+
+
+class StageServer():
+    pass
+
+class StageServer():
+
+    def __init__(self, config_file: str = "stage_server.yaml") -> None:
+        self.conf = parse_yaml_file_as(StageServerConfig, config_file)
+        self.names: list[str] = []
+        self.kinds: list[str] = []
+        self.objects: list = []
+        self.locks: list[threading.Lock] = []
+        self._stack = ExitStack()
+        self._server = None
+
+    def _add(self, name: str, kind: str, obj) -> None:
+        self.names.append(name)
+        self.kinds.append(kind)
+        self.objects.append(obj)
+        self.locks.append(threading.Lock())
+
+    def __enter__(self) -> StageServer:
+        devices = {}
+        for name, entry in self.conf.devices.items():
+            devices[name] = KPZ101(entry.config) if entry.kind == "KPZ101" else KSG101(entry.config)
+
+        if self.conf.emulate:
+            from .emulator import EmulatedFtdi, EmulatedStage
+            stages = {}
+            for axis in self.conf.axes.values():
+                stages[axis.kpz] = stages[axis.ksg] = EmulatedStage()
+            for name, device in devices.items():
+                device.dev.ftdi = EmulatedFtdi(stages.get(name))
+
+        with ExitStack() as stack:
+            for name, device in devices.items():
+                self._add(name, self.conf.devices[name].kind, stack.enter_context(device))
+            for name, axis in self.conf.axes.items():
+                self._add(name, "axis", (self.names.index(axis.kpz), self.names.index(axis.ksg)))
+            self._stack = stack.pop_all()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._server is not None:
+            self._server.server_close()
+            if os.path.exists(self.conf.socket):
+                os.remove(self.conf.socket)
+        self._stack.close()
+
+    def table(self) -> bytes:
+        devices = [{"name": name, "kind": kind} for name, kind in zip(self.names, self.kinds)]
+        payload = json.dumps({"devices": devices}).encode()
+        return TABLE.pack(len(payload)) + payload
+
+    def execute(self, opcode: int, index: int, argument: float) -> list[tuple[int, float]]:
+        """Résultats (statut, valeur) d'une commande, `result_count` résultats"""
+        count = result_count(opcode, argument)
+        if index >= len(self.objects):
+            return [(UNKNOWN_DEVICE, float("nan"))] * count
+        kind = self.kinds[index]
+        if opcode not in OPCODES[kind]:
+            return [(UNKNOWN_OPCODE, float("nan"))] * count
+        if opcode == PING:
+            return [(OK, time.monotonic())]
+
+        if kind == "axis":
+            kpz_index, ksg_index = self.objects[index]
+            kpz, ksg = self.objects[kpz_index], self.objects[ksg_index]
+            # verrous toujours pris dans l'ordre des index, pour éviter les interblocages
+            first, second = sorted((kpz_index, ksg_index))
+            with self.locks[first], self.locks[second]:
+                if opcode == AXIS_MOVE_UM:
+                    c = self.conf.closed_loop
+                    reading = move_axis_to_um_closed_loop(kpz, ksg, argument, c.gain, c.tol_um,
+                                                          c.sleep, c.max_iter, n_avg=c.n_avg)
+                else:
+                    reading = ksg.get_reading()
+            return [(OK, counts_to_um(reading))]
+
+        device = self.objects[index]
+        with self.locks[index]:
+            if opcode == KPZ_ENABLE:
+                device.enable_output()
+            elif opcode == KPZ_DISABLE:
+                device.disable_output()
+            elif opcode == KPZ_SET_VOLTAGE:
+                device.set_output_voltage(argument)
+            elif opcode == KPZ_SET_POSITION:
+                device.set_position(int(argument))
+            elif opcode == KPZ_SET_MODE:
+                device.set_mode()
+            elif opcode in (KPZ_SET_IO, KSG_SET_IO):
+                device.set_io()
+            elif opcode == KSG_READ:
+                return [(OK, float(device.get_reading()))]
+            elif opcode == KSG_READ_MANY:
+                readings = device.read_many(count)
+                if len(readings) < count:  # réponses perdues : la commande garde `count` résultats
+                    return [(OK, float(r)) for r in readings] + [(DEVICE_ERROR, float("nan"))] * (count - len(readings))
+                return [(OK, float(r)) for r in readings[:count]]
+            elif opcode == KSG_GET_IO:
+                return [(OK, float(v)) for v in device.get_io()]
+            elif opcode == KSG_MAX_TRAVEL:
+                return [(OK, float(device.get_max_travel()))]
+            elif opcode == KSG_IDENTIFY:
+                return [(OK, float(device.identify()))]
+            elif opcode == KSG_ZERO:
+                device.zeroing()
+        return [(OK, 0.0)]
+
+    def handle(self, sock: socket.socket) -> None:
+        """Boucle requête/réponse d'un client"""
+        sock.sendall(self.table())
+        while True:
+            try:
+                count, request_id = REQUEST.unpack(recv_exact(sock, REQUEST.size))
+                payload = recv_exact(sock, count * COMMAND.size)
+            except ConnectionError:
+                return
+
+            results = []
+            for opcode, index, argument in COMMAND.iter_unpack(payload):
+                try:
+                    results += self.execute(opcode, index, argument)
+                except Exception as e:
+                    print(f"Erreur sur {self.names[index]} (opcode {opcode:#x}) : {e!r}")
+                    results += [(DEVICE_ERROR, float("nan"))] * result_count(opcode, argument)
+            response = REQUEST.pack(len(results), request_id) + b"".join(RESULT.pack(*r) for r in results)
+            sock.sendall(response)
+
+    def serve_forever(self) -> None:
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                server.handle(self.request)
+
+        if os.path.exists(self.conf.socket):
+            os.remove(self.conf.socket)  # socket d'un serveur précédent arrêté brutalement
+        umask = os.umask(0o177)  # socket créé directement en 0600
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.conf.socket, Handler)
+        finally:
+            os.umask(umask)
+        os.chmod(self.conf.socket, 0o600)
+        self._server.daemon_threads = True
+        print(f"Serveur de platines sur {self.conf.socket} : {', '.join(self.names)}")
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def serve(config_file: str) -> None:
+    with StageServer(config_file) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nArrêt du serveur.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serveur partageant les KPZ101/KSG101 entre plusieurs clients")
+    parser.add_argument("config", help="fichier yaml (StageServerConfig)")
+    serve(parser.parse_args().config)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Carte de scan stockée par tuiles, avec pyramide de niveaux de détail.
+
+Une carte (ny, nx) est découpée en tuiles TILE x TILE float32, allouées à la première
+écriture : la mémoire suit la partie déjà scannée, pas la taille de la zone. Le niveau
+k de la pyramide est la carte réduite d'un facteur 2^k (moyenne des points mesurés,
+NaN si aucun) ; il est tenu à jour incrémentalement : à chaque niveau, seul le
+rectangle de la tuile parente qui couvre la zone modifiée est recalculé.
+
+Chaque tuile a un numéro de version : l'affichage (prime.TiledMapView) ne renvoie à
+l'écran que les tuiles visibles qui ont changé.
+"""
+
+import math
+
+import numpy as np
+
+TILE = 256
+
+
+class TiledMap():
+
+    def __init__(self, ny: int, nx: int, tile: int = TILE) -> None:
+        self.ny, self.nx = ny, nx
+        self.tile = tile
+        self.n_levels = 1 + max(0, math.ceil(math.log2(max(ny, nx) / tile)))
+        # niveau -> {(ty, tx): tuile}, et numéro de version de chaque tuile
+        self.tiles: list[dict[tuple[int, int], np.ndarray]] = [{} for _ in range(self.n_levels)]
+        self.versions: list[dict[tuple[int, int], int]] = [{} for _ in range(self.n_levels)]
+
+    def _tile(self, level: int, ty: int, tx: int) -> np.ndarray:
+        tiles = self.tiles[level]
+        if (ty, tx) not in tiles:
+            tiles[(ty, tx)] = np.full((self.tile, self.tile), np.nan, dtype=np.float32)
+            self.versions[level][(ty, tx)] = 0
+        return tiles[(ty, tx)]
+
+    def set(self, j: np.ndarray, i: np.ndarray, values: np.ndarray) -> None:
+        """Écrit des points (indices de ligne j, de colonne i) puis met la pyramide à jour"""
+        j = np.asarray(j, dtype=np.int64)
+        i = np.asarray(i, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+        t = self.tile
+        ntx = (self.nx + t - 1) // t
+
+        keys = (j // t) * ntx + i // t
+        order = np.argsort(keys, kind="stable")  # stable : le dernier point écrit l'emporte
+        keys, j, i, values = keys[order], j[order], i[order], values[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+
+        # tuile modifiée -> rectangle modifié (r0, r1, c0, c1), bornes paires
+        dirty = {}
+        for start, stop in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(keys)]])):
+            ty, tx = divmod(int(keys[start]), ntx)
+            rows, cols = j[start:stop] % t, i[start:stop] % t
+            self._tile(0, ty, tx)[rows, cols] = values[start:stop]
+            self.versions[0][(ty, tx)] += 1
+            dirty[(ty, tx)] = (rows.min() & ~1, (rows.max() | 1) + 1, cols.min() & ~1, (cols.max() | 1) + 1)
+
+        for level in range(1, self.n_levels):
+            parents = {}
+            for (ty, tx), box in dirty.items():
+                parent, box = self._downsample(level, ty, tx, box)
+                if parent in parents:
+                    old = parents[parent]
+                    box = (min(old[0], box[0]), max(old[1], box[1]), min(old[2], box[2]), max(old[3], box[3]))
+                parents[parent] = box
+            dirty = parents
+
+    def _downsample(self, level: int, ty: int, tx: int, box: tuple) -> tuple[tuple[int, int], tuple]:
+        """
+        Recalcule, dans la tuile parente, la zone couverte par le rectangle `box` de la
+        tuile (ty, tx) du niveau inférieur ; renvoie la parente et le rectangle modifié.
+        """
+        r0, r1, c0, c1 = box
+        child = self.tiles[level - 1][(ty, tx)]
+        total = np.zeros(((r1 - r0) // 2, (c1 - c0) // 2), dtype=np.float32)
+        count = np.zeros(total.shape, dtype=np.int8)
+        for dr in (0, 1):
+            for dc in (0, 1):
+                values = child[r0 + dr:r1:2, c0 + dc:c1:2]
+                measured = ~np.isnan(values)
+                total += np.where(measured, values, 0)
+                count += measured
+
+        half = self.tile // 2
+        parent = (ty // 2, tx // 2)
+        pr0, pc0 = (ty % 2) * half + r0 // 2, (tx % 2) * half + c0 // 2
+        pr1, pc1 = pr0 + total.shape[0], pc0 + total.shape[1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self._tile(level, *parent)[pr0:pr1, pc0:pc1] = total / count
+        self.versions[level][parent] += 1
+        return parent, (pr0 & ~1, (pr1 - 1 | 1) + 1, pc0 & ~1, (pc1 - 1 | 1) + 1)
+
+    def get(self, j: int, i: int) -> float:
+        tile = self.tiles[0].get((j // self.tile, i // self.tile))
+        return float("nan") if tile is None else float(tile[j % self.tile, i % self.tile])
+
+    def span(self, level: int) -> int:
+        """Nombre de points de la carte couverts par le côté d'une tuile du niveau `level`"""
+        return self.tile << level
+
+    def visible(self, level: int, x0: float, x1: float, y0: float, y1: float) -> list[tuple[int, int]]:
+        """Tuiles allouées du niveau `level` qui recouvrent [x0, x1] x [y0, y1] (en indices)"""
+        span = self.span(level)
+        tx0, tx1 = max(0, int(x0 // span)), int(x1 // span)
+        ty0, ty1 = max(0, int(y0 // span)), int(y1 // span)
+        return [(ty, tx) for ty, tx in self.tiles[level] if ty0 <= ty <= ty1 and tx0 <= tx <= tx1]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(tile.nbytes for tiles in self.tiles for tile in tiles.values())
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Mesure de la durée des phases de chaque point d'un scan (déplacement Y, déplacement X,
+stabilisation, mesure, écriture).
+
+Les intervalles sont enregistrés dans un tableau numpy préalloué ; quand le traçage
+est désactivé (par défaut) `tracer` est un `NullTracer` dont les méthodes ne font rien,
+sans même lire l'horloge.
+
+    from apt_interface import tracing
+    tracing.enable()
+    ... scan ...
+    tracing.tracer.export_chrome("trace.json")   # chrome://tracing ou ui.perfetto.dev
+    print(tracing.tracer.summary_text())
+    tracing.disable()
+"""
+
+import json
+import time
+
+import numpy as np
+
+SPAN = np.dtype([("phase", "<u2"), ("start", "<f8"), ("duration", "<f8"),
+                 ("point", "<i8"), ("arg", "<i4")])
+
+
+class NullTracer():
+    enabled = False
+    point = -1
+
+    def now(self) -> float:
+        return 0.0
+
+    def record(self, phase: str, start: float, point: int = None, arg: int = -1) -> None:
+        pass
+
+
+class Tracer():
+    enabled = True
+
+    def __init__(self, capacity: int = 1_000_000) -> None:
+        self.spans = np.zeros(capacity, dtype=SPAN)
+        self.count = 0
+        self.dropped = 0
+        self.phases: list[str] = []
+        self._ids: dict[str, int] = {}
+        self.point = -1  # point en cours, utilisé si `record` ne le précise pas
+        self.t0 = time.perf_counter()
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def record(self, phase: str, start: float, point: int = None, arg: int = -1) -> None:
+        """Intervalle [start, maintenant] de la phase `phase` (arg : nombre d'itérations...)"""
+        end = time.perf_counter()
+        if self.count == len(self.spans):
+            self.dropped += 1
+            return
+        phase_id = self._ids.get(phase)
+        if phase_id is None:
+            phase_id = self._ids[phase] = len(self.phases)
+            self.phases.append(phase)
+        self.spans[self.count] = (phase_id, start - self.t0, end - start,
+                                  self.point if point is None else point, arg)
+        self.count += 1
+
+    def clear(self) -> None:
+        self.count = 0
+        self.dropped = 0
+        self.t0 = time.perf_counter()
+
+    def export_chrome(self, path: str) -> None:
+        """Fichier JSON au format Trace Event (événements complets, en µs)"""
+        spans = self.spans[:self.count]
+        events = []
+        for phase, start, duration, point, arg in spans.tolist():
+            args = {"point": point}
+            if arg >= 0:
+                args["iterations"] = arg
+            events.append({"name": self.phases[phase], "ph": "X", "pid": 0, "tid": phase,
+                           "ts": start * 1e6, "dur": duration * 1e6, "args": args})
+        for phase, name in enumerate(self.phases):
+            events.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": phase,
+                           "args": {"name": name}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Nombre, total et percentiles (s) des durées par phase"""
+        spans = self.spans[:self.count]
+        summary = {}
+        for phase, name in enumerate(self.phases):
+            durations = spans["duration"][spans["phase"] == phase]
+            if len(durations) == 0:
+                continue
+            p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+            summary[name] = {"count": len(durations), "total": float(durations.sum()),
+                             "p50": p50, "p90": p90, "p99": p99, "max": float(durations.max())}
+        return summary
+
+    def summary_text(self) -> str:
+        summary = self.summary()
+        grand_total = sum(s["total"] for s in summary.values()) or 1.0
+        lines = [f"{'phase':12s} {'n':>8s} {'total (s)':>10s} {'%':>6s} "
+                 f"{'p50 (ms)':>9s} {'p90 (ms)':>9s} {'p99 (ms)':>9s} {'max (ms)':>9s}"]
+        for name, s in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"{name:12s} {s['count']:8d} {s['total']:10.3f} {100 * s['total'] / grand_total:6.1f} "
+                         f"{1e3 * s['p50']:9.3f} {1e3 * s['p90']:9.3f} {1e3 * s['p99']:9.3f} "
+                         f"{1e3 * s['max']:9.3f}")
+        if self.dropped:
+            lines.append(f"{self.dropped} intervalles perdus (buffer plein)")
+        return "\n".join(lines)
+
+
+tracer = NullTracer()
+
+
+def enable(capacity: int = 1_000_000) -> Tracer:
+    global tracer
+    tracer = Tracer(capacity)
+    return tracer
+
+
+def disable() -> None:
+    global tracer
+    tracer = NullTracer()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Compilation d'une trajectoire (Scan.coords) en trames APT prêtes à envoyer.
+
+Conversion en unités du contrôleur, vérification des limites et construction des
+trames sont faites une seule fois, pour tous les points, avec numpy. Pendant le scan,
+chaque point ne coûte plus qu'une tranche de memoryview et une écriture par axe
+(`Device.send_raw`, sans vérification).
+
+Mêmes conventions que KPZ101 : en open_loop la coordonnée est une tension
+(tronquée à l'entier, comme `set_output_voltage(int(c))`), en closed_loop une
+position 0..32767. Une coordonnée NaN laisse l'axe immobile pour ce point. Le mode
+est celui de la configuration de chaque KPZ101 ; un mode demandé différent lève
+RuntimeError, comme `set_output_voltage`/`set_position`.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from .KPZ101 import KPZ101
+
+# Trame longue PZ_SET_OUTPUTVOLTS (0x0643) / PZ_SET_OUTPUTPOS (0x0646) : en-tête + canal + valeur
+FRAME = np.dtype([("func", "<u2"), ("length", "<u2"), ("dest", "u1"), ("src", "u1"),
+                  ("chann", "<u2"), ("value", "<i2")])
+
+
+def check_mode(kpz: KPZ101, mode: Optional[str]) -> str:
+    """Mode de commande du KPZ101 (kpz.conf.mode) ; RuntimeError si `mode` en diffère"""
+    if mode is not None and mode != kpz.conf.mode:
+        raise RuntimeError(f"Trajectory compiled for {mode} but {kpz.conf.name} is in {kpz.conf.mode} mode.")
+    return kpz.conf.mode
+
+
+def to_device_units(coords: np.ndarray, kpz: KPZ101, mode: Optional[str] = None) -> np.ndarray:
+    """Coordonnées d'un axe -> valeurs envoyées au KPZ101 (ValueError si hors limites)"""
+    mode = check_mode(kpz, mode)
+    active = ~np.isnan(coords)
+    values = np.trunc(coords[active])
+
+    if mode == "closed_loop":
+        low, high = 0, 32767
+        units = values
+    else:
+        low, high = 0, kpz.conf.voltage_limit
+        units = np.trunc(values * (32767 / kpz.conf.voltage_limit))
+
+    bad = (values < low) | (values > high)
+    if bad.any():
+        first = np.flatnonzero(active)[np.argmax(bad)]
+        raise ValueError(f"Point {first}: {coords[first]} out of range [{low}..{high}] for {kpz.conf.name}")
+
+    result = np.zeros(len(coords), dtype=np.int16)
+    result[active] = units.astype(np.int16)
+    return result
+
+
+class CompiledAxis():
+
+    def __init__(self, kpz: KPZ101, coords: np.ndarray, mode: Optional[str] = None) -> None:
+        mode = check_mode(kpz, mode)
+        self.device = kpz.dev
+        self.active = (~np.isnan(coords)).tolist()  # liste : accès par point plus rapide
+
+        frames = np.zeros(len(coords), dtype=FRAME)
+        frames["func"] = 0x0646 if mode == "closed_loop" else 0x0643
+        frames["length"] = 4
+        frames["dest"] = kpz.dev.dest | 0x80
+        frames["src"] = kpz.dev.src
+        frames["chann"] = 0x0001
+        frames["value"] = to_device_units(coords, kpz, mode)
+        self.buffer = frames.tobytes()
+        self.view = memoryview(self.buffer)
+
+    def frame(self, i: int) -> memoryview:
+        return self.view[i * FRAME.itemsize:(i + 1) * FRAME.itemsize]
+
+
+class CompiledTrajectory():
+
+    def __init__(self, coords: np.ndarray, axes: tuple[KPZ101], mode: Optional[str] = None) -> None:
+        coords = np.asarray(coords, dtype=float)
+        self.n_points = len(coords)
+        self.axes = [CompiledAxis(kpz, coords[:, j], mode) for j, kpz in enumerate(axes)]
+
+    def __len__(self) -> int:
+        return self.n_points
+
+    def send(self, i: int) -> None:
+        """Envoie les consignes du point i"""
+        size = FRAME.itemsize
+        for axis in self.axes:
+            if axis.active[i]:
+                axis.device.send_raw(axis.view[i * size:(i + 1) * size])
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Transport de résultats entre le thread de scan et l'interface graphique.
+
+Le worker ajoute des lignes (par exemple (i, j, valeur)) dans un tableau numpy
+protégé par un verrou ; l'interface récupère tout ce qui est arrivé depuis sa dernière
+lecture en un seul bloc, sur son propre timer. On évite ainsi un événement Qt par point.
+"""
+
+import threading
+import numpy as np
+
+
+class BlockChannel():
+
+    def __init__(self, width: int, capacity: int = 4096) -> None:
+        self.width = width
+        self._buffer = np.empty((capacity, width))
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def append(self, *row: float) -> None:
+        """Ajoute une ligne (appelé par le worker)"""
+        with self._lock:
+            if self._count == len(self._buffer):
+                # l'interface n'a pas vidé le canal à temps : on agrandit
+                self._buffer = np.concatenate([self._buffer, np.empty_like(self._buffer)])
+            self._buffer[self._count] = row
+            self._count += 1
+
+    def drain(self) -> np.ndarray:
+        """Renvoie (copie) et retire toutes les lignes en attente (appelé par l'interface)"""
+        with self._lock:
+            block = self._buffer[:self._count].copy()
+            self._count = 0
+        return block
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class ScanChannel():
+    """Canaux d'un scan 2D : points (i, j, valeur) et convergence (lecture, itération)"""
+
+    def __init__(self) -> None:
+        self.points = BlockChannel(3)
+        self.convergence = BlockChannel(2)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Débit soutenu de la chaîne d'acquisition de histogramme.py (FrequencyHistogram) avec
+le compteur simulé : lecture des blocs, histogramme, statistiques glissantes, Allan,
+et rafraîchissement de l'affichage par le timer.
+
+Pour chaque configuration, la fenêtre tourne DURATION secondes ; on rapporte les
+échantillons/s traités et le coût moyen d'un rafraîchissement (update_histogram).
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_spcnt.py
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+from apt_interface.SPCNT import SPCNT, SPCNTConfig
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+import histogramme  # noqa: E402
+
+DURATION = 3.0  # secondes
+RESOURCE = "SIM::SPCNT::dist=normal;mean=500;std=50;seed=0"
+
+CONFIGS = [
+    ("query", 50, False),
+    ("bulk", 50, False),
+    ("bulk", 1000, False),
+    ("bulk", 10000, True),
+]
+
+
+def bench(app, mode, block_size, binary):
+    source = SPCNT(conf=SPCNTConfig(resource=RESOURCE, mode=mode, block_size=block_size, binary=binary))
+    refresh = []
+
+    with contextlib.redirect_stdout(io.StringIO()):  # moyennes affichées par collect_data
+        window = histogramme.FrequencyHistogram(source)
+        update = window.update_histogram
+
+        def timed_update():
+            t0 = time.perf_counter()
+            update()
+            refresh.append(time.perf_counter() - t0)
+
+        window.timer.timeout.disconnect()
+        window.timer.timeout.connect(timed_update)
+
+        t0 = time.perf_counter()
+        QTimer.singleShot(int(DURATION * 1000), app.quit)
+        app.exec_()
+        elapsed = time.perf_counter() - t0
+        window.close()
+
+    samples = window.histogram.total
+    mean_refresh = sum(refresh) / len(refresh) if refresh else float("nan")
+    print(f"{mode:5s} bloc={block_size:6d} {'bin' if binary else 'txt'} : "
+          f"{samples / elapsed:12.0f} échantillons/s, "
+          f"{len(refresh)} rafraîchissements, {mean_refresh * 1e3:.2f} ms chacun")
+
+
+def main():
+    app = QApplication.instance() or QApplication(sys.argv)
+    for mode, block_size, binary in CONFIGS:
+        bench(app, mode, block_size, binary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Débit soutenu worker -> interface : signaux Qt en file (un événement par point,
+comme l'ancien ScanWorker.updatePlot) contre BlockChannel lu par un timer à 30 Hz.
+
+Un thread produit des points (i, j, valeur) aussi vite que possible pendant
+DURATION secondes ; on compte les points effectivement traités dans le thread
+principal pendant cette durée, le nombre d'événements que ce thread a dû traiter
+et le retard accumulé à la fin.
+
+    python benchmarks/bench_transport.py
+"""
+
+import sys
+import time
+from pyqtgraph.Qt import QtCore
+from apt_interface.transport import BlockChannel
+
+DURATION = 3.0     # secondes
+FRAME_RATE = 30
+
+
+class Producer(QtCore.QObject):
+    point = QtCore.pyqtSignal(int, int, float)
+
+    def __init__(self, mode, channel):
+        super().__init__()
+        self.mode = mode
+        self.channel = channel
+        self.sent = 0
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        end = time.perf_counter() + DURATION
+        while time.perf_counter() < end:
+            for _ in range(100):
+                if self.mode == "signal":
+                    self.point.emit(self.sent % 500, self.sent // 500, 1.0)
+                else:
+                    self.channel.append(self.sent % 500, self.sent // 500, 1.0)
+                self.sent += 1
+
+
+def bench(mode):
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+    channel = BlockChannel(3)
+    received = [0]
+    events = [0]
+
+    def on_point(i, j, value):
+        received[0] += 1
+        events[0] += 1
+
+    def on_frame():
+        received[0] += len(channel.drain())
+        events[0] += 1
+
+    thread = QtCore.QThread()
+    producer = Producer(mode, channel)
+    producer.moveToThread(thread)
+    thread.started.connect(producer.run)
+
+    if mode == "signal":
+        producer.point.connect(on_point)
+    else:
+        timer = QtCore.QTimer()
+        timer.timeout.connect(on_frame)
+        timer.start(int(1000 / FRAME_RATE))
+
+    QtCore.QTimer.singleShot(int(DURATION * 1000), app.quit)
+    t0 = time.perf_counter()
+    thread.start()
+    app.exec_()
+    elapsed = time.perf_counter() - t0
+
+    thread.quit()
+    thread.wait()
+    return received[0] / elapsed, events[0] / elapsed, producer.sent - received[0]
+
+
+if __name__ == "__main__":
+    for mode in ("signal", "channel"):
+        rate, event_rate, backlog = bench(mode)
+        print(f"{mode:8s}: {rate:12.0f} points/s traités, {event_rate:10.0f} événements/s, "
+              f"retard final {backlog} points")
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks sans matériel, résultats enregistrés en JSON pour comparer
+deux versions du code.
+
+  - codec        : Device.write / write_with_data (pack) et décodage d'une lecture KSG101
+  - commands     : consignes d'un scan 2 axes, appels KPZ101 point par point contre trajectoire compilée
+  - trajectories : Scan.balayage et Scan.spiral de 10^3 à 10^7 points
+  - closed_loop  : move_axis_to_um_closed_loop sur un axe émulé (itérations par déplacement)
+  - realtime     : RealTimePlot (update + refresh) sur une carte 500x500
+  - histogram    : FrequencyHistogram, coût par échantillon et par rafraîchissement
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/suite.py [-o results.json] [--compare old.json]
+    python benchmarks/suite.py --only codec trajectories
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from struct import unpack
+
+import numpy as np
+
+from apt_interface.KPZ101 import KPZ101
+from apt_interface.device import Device
+from apt_interface.emulator import EmulatedStage, emulated_axis
+from apt_interface.closed_loop import counts_to_um, move_axis_to_um_closed_loop
+from apt_interface.scan import Scan
+from apt_interface.trajectory import CompiledTrajectory
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONF = os.path.join(HERE, "..", "apt_interface", "conf")
+TIME_BUDGET = 60.0  # s, une taille de trajectoire n'est pas lancée si l'estimation dépasse ce budget
+
+
+def timeit(func, repeat: int) -> float:
+    """Durée moyenne d'un appel (s)"""
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - t0) / repeat
+
+
+class NullFtdi():
+    def write_data(self, data) -> int:
+        return len(data)
+
+
+def bench_codec() -> dict:
+    dev = Device("29000000", 115200)
+    dev.ftdi = NullFtdi()
+    n = 200000
+    data = b"\x01\x00\xff\x7f"
+    reply = bytes(12)
+    return {
+        "write_per_s": 1 / timeit(lambda: dev.write(0x0210, 2, 0x01), n),
+        "write_with_data_per_s": 1 / timeit(lambda: dev.write_with_data(0x0643, 4, data), n),
+        "unpack_reading_per_s": 1 / timeit(lambda: unpack("HHHHhH", reply)[4], n),
+    }
+
+
+def bench_commands(n: int = 100000) -> dict:
+    axes = (KPZ101(os.path.join(CONF, "config_KPZ_X.yaml")), KPZ101(os.path.join(CONF, "config_KPZ_Y.yaml")))
+    for kpz in axes:
+        kpz.dev.ftdi = NullFtdi()
+    rng = np.random.default_rng(0)
+    coords = rng.uniform(0, 70, (n, 2))
+
+    def legacy() -> None:
+        for coord in coords:
+            for j, axis_coord in enumerate(coord):
+                axes[j].set_output_voltage(int(axis_coord))
+
+    t0 = time.perf_counter()
+    trajectory = CompiledTrajectory(coords, axes, "open_loop")
+    compile_time = time.perf_counter() - t0
+
+    def compiled() -> None:
+        for i in range(n):
+            trajectory.send(i)
+
+    return {
+        "legacy_us_per_point": 1e6 * timeit(legacy, 1) / n,
+        "compile_ms": 1e3 * compile_time,
+        "compiled_us_per_point": 1e6 * timeit(compiled, 1) / n,
+    }
+
+
+def make_scan() -> Scan:
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+        f.write("zoi:\n  ref_point: {X: 0, Y: 0, Z: null}\n  dimensions: {X: 10, Y: 10, Z: null}\n"
+                "scan_type: hilbert\nhilbert: {order: 1}\nmode: open_loop\nacquisition_time: 0.001\n")
+    try:
+        return Scan((), f.name)
+    finally:
+        os.remove(f.name)
+
+
+def bench_trajectories() -> dict:
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        scan = make_scan()
+
+    for name in ("balayage", "spiral"):
+        rate = None
+        for exponent in range(3, 8):
+            n = 10 ** exponent
+            if rate is not None and n / rate > TIME_BUDGET:
+                results[f"{name}_1e{exponent}_s"] = None  # trop long, ignoré
+                continue
+
+            if name == "balayage":
+                side = int(round(np.sqrt(n)))
+                scan.deltaX = scan.deltaY = side
+                func = lambda: scan.balayage(1, 1, None)
+            else:
+                func = lambda: scan.spiral(n)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                coords = func()
+                elapsed = time.perf_counter() - t0
+            rate = len(coords) / elapsed
+            results[f"{name}_1e{exponent}_s"] = elapsed
+        results[f"{name}_points_per_s"] = rate
+    return results
+
+
+def bench_closed_loop(moves: int = 20) -> dict:
+    stage = EmulatedStage(seed=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        kpz, ksg = emulated_axis(os.path.join(CONF, "config_KPZ_X.yaml"),
+                                 os.path.join(CONF, "config_KSG_X.yaml"), stage)
+    rng = np.random.default_rng(0)
+    iterations = []
+    errors = []
+    durations = []
+
+    with contextlib.redirect_stdout(io.StringIO()), ksg, kpz:
+        ksg.zeroing()
+        kpz.enable_output()
+        for target in rng.uniform(1.0, 15.0, moves):
+            count = [0]
+
+            def on_iteration(reading, iteration):
+                count[0] = iteration
+
+            t0 = time.perf_counter()
+            reading = move_axis_to_um_closed_loop(kpz, ksg, target, gain=0.002, tol_um=0.05,
+                                                  sleep=0.0, max_iter=200, update_callback=on_iteration)
+            durations.append(time.perf_counter() - t0)
+            iterations.append(count[0])
+            errors.append(abs(counts_to_um(reading) - target))
+
+    return {
+        "iterations_mean": float(np.mean(iterations)),
+        "iterations_max": int(np.max(iterations)),
+        "move_s": float(np.mean(durations)),
+        "final_error_um": float(np.mean(errors)),
+    }
+
+
+def bench_realtime(n: int = 500, chunk: int = 2000) -> dict:
+    import pyqtgraph as pg
+    from apt_interface.prime import RealTimePlot
+
+    app = pg.mkQApp()
+    plot = RealTimePlot({"LX": n - 1, "LY": n - 1, "DX": 1, "DY": 1})
+    plot.timer.stop()
+    values = np.random.default_rng(0).uniform(0, 100, n * n)
+
+    refresh = 0.0
+    frames = 0
+    t0 = time.perf_counter()
+    for k in range(0, n * n, chunk):
+        for index in range(k, min(k + chunk, n * n)):
+            plot.update(index % n, index // n, values[index])
+        t1 = time.perf_counter()
+        plot.refresh()
+        refresh += time.perf_counter() - t1
+        frames += 1
+    elapsed = time.perf_counter() - t0
+    app.processEvents()
+
+    return {
+        "points_per_s": n * n / elapsed,
+        "refresh_ms": 1e3 * refresh / frames,
+        "points_per_frame": chunk,
+    }
+
+
+class BlockSource():
+    """Source pour FrequencyHistogram : `count` blocs pré-calculés puis fin de flux"""
+
+    def __init__(self, count: int, block_size: int) -> None:
+        from apt_interface.SPCNT import FrequencyBlock
+
+        rng = np.random.default_rng(0)
+        self.blocks = [FrequencyBlock(float(k), 1e-3 * block_size, rng.normal(500, 50, block_size))
+                       for k in range(count)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def read_block(self):
+        if not self.blocks:
+            raise EOFError("end of blocks")
+        return self.blocks.pop()
+
+
+def bench_histogram(count: int = 2000, block_size: int = 50) -> dict:
+    import pyqtgraph as pg
+
+    sys.path.insert(0, os.path.join(HERE, "..", ".."))
+    import histogramme
+
+    app = pg.mkQApp()
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        window = histogramme.FrequencyHistogram(BlockSource(count, block_size))
+        window.timer.stop()
+        window.data_thread.join()
+        ingest = time.perf_counter() - t0
+
+        refresh = timeit(window.update_histogram, 200)
+        window.close()
+    app.processEvents()
+
+    samples = count * block_size
+    return {
+        "ingest_us_per_sample": 1e6 * ingest / samples,
+        "update_histogram_ms": 1e3 * refresh,
+    }
+
+
+BENCHMARKS = {
+    "codec": bench_codec,
+    "commands": bench_commands,
+    "trajectories": bench_trajectories,
+    "closed_loop": bench_closed_loop,
+    "realtime": bench_realtime,
+    "histogram": bench_histogram,
+}
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Rapport nouveau / ancien pour chaque mesure commune"""
+    for group, values in results.items():
+        for key, value in values.items():
+            old = baseline.get(group, {}).get(key)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                print(f"{group}.{key:32s} {old:12.4g} -> {value:12.4g}  (x{value / old:.2f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks apt_interface (sans matériel)")
+    parser.add_argument("-o", "--output", help="fichier JSON des résultats")
+    parser.add_argument("--compare", help="résultats de référence (JSON)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks à lancer")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"--- {name}")
+        results[name] = BENCHMARKS[name]()
+        for key, value in results[name].items():
+            print(f"{key:32s} {value}")
+
+    output = args.output or os.path.join(
+        HERE, "results", datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(), "numpy": np.__version__,
+                   "machine": platform.machine(), "results": results}, f, indent=2)
+    print(f"Résultats enregistrés dans {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    main()
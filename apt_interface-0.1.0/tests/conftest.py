@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+CONF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "apt_interface", "conf")
+
+
+@pytest.fixture
+def conf_dir() -> str:
+    """Répertoire des fichiers yaml livrés avec le paquet"""
+    return CONF_DIR
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Device.recover : réponses perdues, tronquées ou décalées, injectées dans l'émulateur"""
+
+from struct import unpack_from
+
+import pytest
+
+from apt_interface.device import Device, DeviceError
+from apt_interface.emulator import EmulatedFtdi
+from apt_interface.latency import AdaptiveTiming
+
+READ = 0x07dd  # lecture de la jauge, réponse de 12 octets
+SIZE = 12
+
+
+@pytest.fixture
+def device():
+    dev = Device("59000407", 115200)
+    dev.ftdi = EmulatedFtdi()
+    dev.url = "ftdi://ftdi:0xfaf0:59000407/1"
+    dev.timing = AdaptiveTiming(default_timeout=5e-3, max_timeout=0.02)
+    return dev
+
+
+def counters(dev: Device, **expected) -> dict:
+    return {**{key: 0 for key in dev.recovery}, **expected}
+
+
+def check_reply(data: bytes) -> None:
+    assert len(data) == SIZE
+    assert unpack_from("<H", data)[0] == READ + 1
+
+
+def test_clean_reply_needs_no_recovery(device):
+    check_reply(device.read_data(READ, SIZE))
+    assert device.recovery == counters(device)
+
+
+def test_garbage_before_the_reply_is_resynchronized(device):
+    device.ftdi.faults = ["garbage"]
+    check_reply(device.read_data(READ, SIZE))
+    assert device.recovery == counters(device, resync=1)
+    assert not device.ftdi.rx  # les octets de fin de trame ont été lus
+
+
+@pytest.mark.parametrize("fault", ["drop", "truncate"])
+def test_lost_or_truncated_reply_is_requested_again(device, fault):
+    device.ftdi.faults = [fault]
+    check_reply(device.read_data(READ, SIZE))
+    assert device.recovery == counters(device, purge=1, retry=1)
+    check_reply(device.read_data(READ, SIZE))  # rien ne reste en attente
+
+
+def test_link_is_reopened_after_failed_retries(device):
+    device.ftdi.faults = ["drop"] * 3
+    check_reply(device.read_data(READ, SIZE, retries=2))
+    assert device.recovery == counters(device, purge=2, retry=2, reopen=1)
+
+
+def test_device_error_when_nothing_works(device):
+    device.ftdi.faults = ["drop"] * 4
+    with pytest.raises(DeviceError):
+        device.read_data(READ, SIZE, retries=2)
+    assert device.recovery == counters(device, purge=2, retry=2, reopen=1, failed=1)
+    check_reply(device.read_data(READ, SIZE))  # l'appareil reste utilisable ensuite
+
+
+def test_valid_reply_checks_header_and_length(device):
+    device.ftdi.write_data(bytes(6))  # trame inconnue, sans réponse
+    device.write(READ, 0, 0)
+    data = bytes(device.ftdi.read_data_bytes(SIZE))
+    assert device.valid_reply(data, READ, SIZE)
+    assert not device.valid_reply(data[:-1], READ, SIZE)
+    assert not device.valid_reply(data, 0x07db, SIZE)
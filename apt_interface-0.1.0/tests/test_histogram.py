@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""histogram : FixedBinHistogram contre np.histogram"""
+
+import numpy as np
+import pytest
+
+from apt_interface.histogram import FixedBinHistogram
+
+
+def reference(histogram: FixedBinHistogram, values: np.ndarray) -> np.ndarray:
+    edges = np.append(histogram.bins, histogram.bins[-1] + histogram.bin_size)
+    inside = values[(values >= edges[0]) & (values < edges[-1])]  # np.histogram inclut le bord droit
+    return np.histogram(inside, edges)[0]
+
+
+@pytest.mark.parametrize("low, high, bin_size", [(-50, 1050, 10), (0, 100, 7), (-3, 3, 0.5)])
+def test_add_many_matches_np_histogram(low, high, bin_size):
+    rng = np.random.default_rng(7)
+    histogram = FixedBinHistogram(low, high, bin_size)
+    values = rng.uniform(low - 100, high + 100, 5000)
+    values[:len(histogram.bins)] = histogram.bins  # bords de classes
+    for block in np.array_split(values, 7):
+        histogram.add_many(block)
+
+    np.testing.assert_array_equal(histogram.counts, reference(histogram, values))
+    assert histogram.total == len(values)
+    assert histogram.out_of_range == len(values) - histogram.counts.sum()
+
+
+def test_add_and_add_many_agree():
+    values = np.array([-60.0, -50.0, -40.1, 0.0, 9.999, 10.0, 1049.9, 1050.0, 5000.0, np.nan, -np.inf, np.inf])
+    one, many = FixedBinHistogram(), FixedBinHistogram()
+    for value in values:
+        one.add(value)
+    many.add_many(values)
+    np.testing.assert_array_equal(one.counts, many.counts)
+    assert (one.total, one.out_of_range) == (many.total, many.out_of_range) == (12, 6)
+
+
+def test_bins_are_aligned_on_multiples_of_bin_size():
+    histogram = FixedBinHistogram(-45, 100, 10)
+    assert histogram.bins[0] == -50 and histogram.bins[-1] == 90
+    histogram.add_many([-45.0, 95.0, 100.0])
+    assert (histogram.counts[0], histogram.counts[-1], histogram.out_of_range) == (1, 1, 1)
+
+
+def test_proportions_include_out_of_range_samples():
+    histogram = FixedBinHistogram(0, 20, 10)
+    assert histogram.proportions().tolist() == [0.0, 0.0]
+    histogram.add_many([1.0, 2.0, 15.0, 500.0])
+    np.testing.assert_allclose(histogram.proportions(), [50.0, 25.0])
+    histogram.clear()
+    assert histogram.total == histogram.out_of_range == histogram.counts.sum() == 0
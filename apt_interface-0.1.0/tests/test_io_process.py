@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""io_process : anneau en mémoire partagée et processus d'acquisition sur platines émulées"""
+
+import os
+
+import numpy as np
+import pytest
+
+from apt_interface.io_process import ScanProcess, SharedRing
+from apt_interface.scan2d import Scan2DConfig
+
+
+@pytest.fixture
+def ring():
+    writer = SharedRing(2, capacity=4)
+    reader = SharedRing(2, name=writer.name)
+    reader.readonly()
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_reader_sees_rows_in_order(ring):
+    writer, reader = ring
+    assert reader.capacity == 4 and len(reader) == 0
+    for k in range(3):
+        writer.append(k, -k)
+    assert len(reader) == 3
+    np.testing.assert_array_equal(reader.drain(), [[0, 0], [1, -1], [2, -2]])
+    for k in range(3, 6):  # passe la fin de l'anneau
+        writer.append(k, -k)
+    np.testing.assert_array_equal(reader.drain(), [[3, -3], [4, -4], [5, -5]])
+    assert reader.lost == 0 and len(reader.drain()) == 0
+
+
+def test_reader_keeps_the_last_rows_when_overrun(ring):
+    writer, reader = ring
+    for k in range(11):
+        writer.append(k, 10 * k)
+    block = reader.drain()
+    np.testing.assert_array_equal(block[:, 0], [7, 8, 9, 10])
+    np.testing.assert_array_equal(block[:, 1], [70, 80, 90, 100])
+    assert reader.lost == 7
+    writer.append(11, 110)
+    np.testing.assert_array_equal(reader.drain(), [[11, 110]])
+
+
+def test_readonly_reader_cannot_write(ring):
+    _, reader = ring
+    with pytest.raises(ValueError):
+        reader.append(1, 2)
+
+
+def scan_config(tmp_path, conf_dir, **options) -> Scan2DConfig:
+    paths = {key: os.path.join(conf_dir, f"config_{name}.yaml")
+             for key, name in (("kpz_x", "KPZ_X"), ("ksg_x", "KSG_X"), ("kpz_y", "KPZ_Y"), ("ksg_y", "KSG_Y"))}
+    options = {"LX": 0.4, "DX": 0.2, "LY": 0.2, "DY": 0.1, "SETTLE_TIME": 0.0, "SLEEP": 0.0, "TOL_UM": 1.0,
+               "emulate": True, "output": str(tmp_path / "scan.csv"), **paths, **options}
+    return Scan2DConfig(**options)
+
+
+def test_scan_process_end_to_end(tmp_path, conf_dir):
+    config = scan_config(tmp_path, conf_dir)
+    process = ScanProcess(config, progress_interval=float("inf"))
+    try:
+        process.start()
+        assert process.wait() == ("finished", None)
+        points = process.channel.points.drain()
+        assert len(process.channel.convergence.drain()) > 0
+    finally:
+        process.close()
+
+    assert (config.nx, config.ny) == (3, 3)
+    assert sorted(map(tuple, points[:, :2].astype(int))) == [(i, j) for i in range(3) for j in range(3)]
+    assert np.isfinite(points[:, 2]).all()
+    assert os.path.exists(config.output)
+
+
+def test_scan_process_stop_command(tmp_path, conf_dir):
+    config = scan_config(tmp_path, conf_dir, LX=20.0, LY=20.0, SETTLE_TIME=0.01)
+    process = ScanProcess(config, progress_interval=float("inf"))
+    try:
+        process.start()
+        while len(process.channel.points) == 0:
+            assert process.poll(0.05) is None
+        process.stop()
+        assert process.wait() == ("finished", None)
+        assert len(process.channel.points.drain()) < config.nx * config.ny
+    finally:
+        process.close()
+
+
+def test_scan_process_reports_errors(tmp_path, conf_dir):
+    config = scan_config(tmp_path, conf_dir, kpz_x=str(tmp_path / "missing.yaml"))
+    process = ScanProcess(config)
+    try:
+        process.start()
+        status, detail = process.wait()
+    finally:
+        process.close()
+    assert status == "error" and "FileNotFoundError" in detail
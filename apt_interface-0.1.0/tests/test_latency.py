@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""latency : fenêtre de latences, délais d'AdaptiveTiming, profils enregistrés"""
+
+import numpy as np
+import pytest
+
+from apt_interface.latency import AdaptiveTiming, LatencyProfile, LatencyStats, Window
+
+
+def test_window_keeps_the_last_values():
+    window = Window(4)
+    assert window.quantiles() is None
+    for value in range(10):
+        window.add(float(value))
+    np.testing.assert_allclose(window.quantiles(), np.quantile([6.0, 7.0, 8.0, 9.0], (.05, .5, .9, .99)))
+    window.add(100.0)  # les centiles sont recalculés après un ajout
+    assert window.quantiles()[-1] > 9.0
+
+
+def test_defaults_without_measurements():
+    timing = AdaptiveTiming()
+    assert timing.timeout(0x07dd) == timing.default_timeout
+    assert timing.poll(0x07dd) == timing.max_poll
+    assert timing.first_poll(0x07dd) == 0.0
+
+
+def test_deadlines_follow_the_quantiles():
+    timing = AdaptiveTiming(margin=3.0, min_timeout=1e-3, first_fraction=0.8, poll_fraction=0.1)
+    for _ in range(100):
+        timing.record(0x07dd, 0.004)
+    assert timing.timeout(0x07dd) == pytest.approx(0.012)
+    assert timing.first_poll(0x07dd) == pytest.approx(0.0032)
+    assert timing.poll(0x07dd) == pytest.approx(4e-4)
+    assert timing.timeout(0x07db) == timing.default_timeout  # chaque requête a sa fenêtre
+
+
+def test_deadlines_are_bounded():
+    timing = AdaptiveTiming(min_timeout=5e-3, max_timeout=0.5, min_poll=1e-4, max_poll=2e-3)
+    timing.record(1, 1e-6)
+    timing.record(2, 10.0)
+    assert timing.timeout(1) == 5e-3 and timing.poll(1) == 1e-4
+    assert timing.timeout(2) == 0.5 and timing.poll(2) == 2e-3
+
+
+def test_timeouts_double_the_deadline_and_replies_bring_it_back():
+    timing = AdaptiveTiming(min_timeout=1e-3, max_timeout=10.0, max_scale=16.0)
+    for _ in range(50):
+        timing.record(1, 0.002)
+    nominal = timing.timeout(1)
+    timing.record_timeout(1)
+    assert timing.timeout(1) == pytest.approx(2 * nominal)
+    for _ in range(10):
+        timing.record_timeout(1)
+    assert timing.timeout(1) == pytest.approx(16 * nominal)
+    assert timing.timeouts[1] == 11
+    for _ in range(1000):
+        timing.record(1, 0.002)
+    assert timing.timeout(1) == pytest.approx(nominal)
+
+
+def test_profile_save_load_and_seed(tmp_path):
+    samples = [0.001, 0.002, 0.003, 0.004]
+    stats = LatencyStats(p50=0.0025, p90=0.0037, p99=0.004, max=0.004, timeouts=1, samples=samples)
+    profile = LatencyProfile(serial="59000407", measured_at=1.0, latency_timer_ms=2, requests={0x07dd: stats})
+    path = profile.save(str(tmp_path))
+    assert path == LatencyProfile.path("59000407", str(tmp_path))
+
+    loaded = LatencyProfile.load("59000407", str(tmp_path))
+    assert loaded == profile
+    assert "0x07dd" in loaded.summary_text()
+    assert LatencyProfile.load("29000000", str(tmp_path)) is None
+
+    timing = AdaptiveTiming(window=3)
+    timing.seed(loaded)
+    np.testing.assert_allclose(timing.latencies[0x07dd].values, samples[-3:])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""live_stats : RingBuffer contre une liste de référence, RunningStats contre numpy"""
+
+import numpy as np
+import pytest
+
+from apt_interface.live_stats import RingBuffer, RunningStats
+
+
+def check(ring: RingBuffer, reference: list, capacity: int) -> None:
+    kept = reference[-capacity:]
+    np.testing.assert_array_equal(ring.values(), kept)
+    np.testing.assert_array_equal(ring.indices(), np.arange(len(reference) - len(kept), len(reference)))
+    assert len(ring) == len(kept) and ring.total == len(reference)
+
+
+@pytest.mark.parametrize("sizes", [[1] * 12, [3, 4, 5], [2, 9], [12], [0, 5, 0, 7], [4, 4, 4, 1, 6]])
+def test_extend_wraps_like_a_list(sizes):
+    capacity = 5
+    ring = RingBuffer(capacity)
+    reference = []
+    value = 0.0
+    for size in sizes:
+        values = value + np.arange(size)
+        value += size
+        ring.extend(values)
+        reference += list(values)
+        check(ring, reference, capacity)
+
+
+def test_append_and_extend_mix():
+    ring = RingBuffer(4)
+    reference = []
+    for k in range(7):
+        ring.append(float(k))
+        reference.append(float(k))
+        ring.extend([100.0 + k, 200.0 + k])
+        reference += [100.0 + k, 200.0 + k]
+        check(ring, reference, 4)
+    ring.clear()
+    check(ring, [], 4)
+    ring.extend([1.0, 2.0])
+    check(ring, [1.0, 2.0], 4)
+
+
+def test_running_stats_merge_blocks():
+    rng = np.random.default_rng(6)
+    stats = RunningStats(n_rows=5)
+    all_rows, all_values = [], []
+    for size in (1, 7, 0, 30, 2, 100):
+        rows = rng.integers(0, 4, size)  # la ligne 4 n'est jamais mesurée
+        values = 1e6 + rng.normal(0, 3, size)  # grande moyenne : la fusion doit rester précise
+        stats.update(rows, values)
+        all_rows += list(rows)
+        all_values += list(values)
+
+        if len(all_values):
+            assert stats.count == len(all_values)
+            assert stats.mean == pytest.approx(np.mean(all_values), rel=1e-12)
+            assert stats.min == min(all_values) and stats.max == max(all_values)
+        if len(all_values) > 1:
+            assert stats.std == pytest.approx(np.std(all_values, ddof=1), rel=1e-6)
+
+    means = stats.row_means()
+    for row in range(4):
+        expected = np.mean([v for r, v in zip(all_rows, all_values) if r == row])
+        assert means[row] == pytest.approx(expected)
+    assert np.isnan(means[4])
+
+
+def test_running_stats_empty_and_single():
+    stats = RunningStats(n_rows=1)
+    assert stats.std == 0.0 and str(stats) == "Aucune mesure"
+    stats.update([0], [4.0])
+    assert (stats.count, stats.mean, stats.std) == (1, 4.0, 0.0)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""multistage : vérification des recettes et isolement des platines en échec"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+from pydantic_yaml import parse_yaml_file_as
+
+from apt_interface.KPZ101 import KPZ101Config
+from apt_interface.multistage import MultiStageScan, check_recipes, serial_of, stage_names
+from apt_interface.scan2d import Scan2DConfig
+
+
+def recipe(tmp_path, conf_dir, name: str, **options) -> Scan2DConfig:
+    paths = {"kpz_x": "config_KPZ_X.yaml", "ksg_x": "config_KSG_X.yaml",
+             "kpz_y": "config_KPZ_Y.yaml", "ksg_y": "config_KSG_Y.yaml"}
+    paths = {key: os.path.join(conf_dir, value) for key, value in {**paths, **options.pop("paths", {})}.items()}
+    options = {"LX": 0.4, "DX": 0.2, "LY": 0.2, "DY": 0.1, "SETTLE_TIME": 0.0, "SLEEP": 0.0, "TOL_UM": 1.0,
+               "emulate": True, "output": str(tmp_path / f"{name}.csv"), **paths, **options}
+    return Scan2DConfig(**options)
+
+
+def test_shared_output_is_rejected(tmp_path, conf_dir):
+    output = str(tmp_path / "same.csv")
+    recipes = {"a": recipe(tmp_path, conf_dir, "a", output=output),
+               "b": recipe(tmp_path, conf_dir, "b", output=output)}
+    with pytest.raises(ValueError, match="output"):
+        check_recipes(recipes)
+
+
+def test_shared_controller_is_rejected(tmp_path, conf_dir):
+    # deux platines réelles avec la même jauge X
+    recipes = {"a": recipe(tmp_path, conf_dir, "a", emulate=False),
+               "b": recipe(tmp_path, conf_dir, "b", emulate=False,
+                           paths={"kpz_x": "config_KPZ_X2.yaml", "kpz_y": "config_KPZ_Y2.yaml",
+                                  "ksg_y": "config_KSG_Y.yaml"})}
+    with pytest.raises(ValueError, match="59000407"):
+        check_recipes(recipes)
+
+
+def test_emulated_stages_may_share_config_files(tmp_path, conf_dir):
+    check_recipes({"a": recipe(tmp_path, conf_dir, "a"), "b": recipe(tmp_path, conf_dir, "b")})
+
+
+def test_logical_names_are_resolved(tmp_path, conf_dir):
+    names = tmp_path / "instruments.yaml"
+    names.write_text('X_axis_controller: "29501986"\n')
+    config = tmp_path / "kpz.yaml"
+    config.write_text(json.dumps({"serial_nm": "X_axis_controller", "instruments": str(names)}))
+    assert serial_of(parse_yaml_file_as(KPZ101Config, str(config))) == "29501986"
+
+
+def test_failing_stage_does_not_stop_the_others(tmp_path, conf_dir):
+    recipes = {"good": recipe(tmp_path, conf_dir, "good"),
+               "broken": recipe(tmp_path, conf_dir, "broken", paths={"kpz_y": "missing.yaml"}),
+               "other": recipe(tmp_path, conf_dir, "other", LX=0.8)}
+    scan = MultiStageScan(recipes, progress_interval=float("inf"))
+    jobs = scan.run()
+
+    assert jobs["broken"].status == "error" and "FileNotFoundError" in jobs["broken"].detail
+    for name in ("good", "other"):
+        job = jobs[name]
+        assert job.status == "finished"
+        assert job.done == job.total
+        assert np.isfinite(job.map).all()
+    assert jobs["other"].map.shape == (3, 5)
+
+    path = tmp_path / "maps.npz"
+    scan.save(str(path))
+    with np.load(path) as maps:
+        assert set(maps.files) == {"good", "broken", "other"}
+
+
+def test_stage_names():
+    assert stage_names(["a/x.yaml", "b/y.yaml"]) == ["x", "y"]
+    assert stage_names(["a/x.yaml", "b/x.yaml"]) == ["x_0", "x_1"]
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""orchestrator : ordre de parcours des recettes et fermeture des appareils, sur platines émulées"""
+
+import csv
+import json
+import os
+
+import numpy as np
+import pytest
+
+from apt_interface import orchestrator
+from apt_interface.KPZ101 import KPZ101
+from apt_interface.KSG101 import KSG101
+from apt_interface.emulator import EmulatedFtdi, EmulatedStage
+from apt_interface.orchestrator import Orchestrator
+
+
+class TrackedFtdi(EmulatedFtdi):
+    """EmulatedFtdi qui garde la trace des ouvertures et fermetures"""
+
+    instances: list["TrackedFtdi"] = []
+    fail_open: set[str] = set()
+
+    def __init__(self, stage: EmulatedStage) -> None:
+        super().__init__(stage)
+        self.is_open = False
+        TrackedFtdi.instances.append(self)
+
+    def open_from_url(self, url: str) -> None:
+        if any(serial in url for serial in self.fail_open):
+            raise OSError(f"cannot open {url}")
+        super().open_from_url(url)
+        self.is_open = True
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+@pytest.fixture
+def emulated(monkeypatch):
+    """KPZ101/KSG101 de l'orchestrateur branchés sur des platines émulées (une par numéro d'axe)"""
+    TrackedFtdi.instances = []
+    TrackedFtdi.fail_open = set()
+    stages = {}
+
+    def stage_for(config_file: str) -> EmulatedStage:
+        axis = os.path.basename(config_file).split("_")[-1]  # X.yaml, Y2.yaml... : KPZ et KSG d'un axe partagent
+        return stages.setdefault(axis, EmulatedStage(time_constant=0.0, noise_counts=0.0))
+
+    class EmulatedKPZ101(KPZ101):
+        def __init__(self, config_file):
+            super().__init__(config_file)
+            self.dev.ftdi = TrackedFtdi(stage_for(config_file))
+
+    class EmulatedKSG101(KSG101):
+        def __init__(self, config_file):
+            super().__init__(config_file)
+            self.dev.ftdi = TrackedFtdi(stage_for(config_file))
+
+    monkeypatch.setattr(orchestrator, "KPZ101", EmulatedKPZ101)
+    monkeypatch.setattr(orchestrator, "KSG101", EmulatedKSG101)
+    return TrackedFtdi
+
+
+@pytest.fixture
+def recipe(tmp_path, conf_dir):
+    def write(axes: dict, order: list, **options) -> str:
+        for axis in axes.values():
+            for key in ("kpz", "ksg"):
+                if key in axis:
+                    axis[key] = os.path.join(conf_dir, axis[key])
+        path = tmp_path / "recipe.yaml"
+        path.write_text(json.dumps({"axes": axes, "order": order, **options}))  # le JSON est du YAML valide
+        return str(path)
+    return write
+
+
+def visited(orch: Orchestrator) -> list[tuple]:
+    return [index for index, _ in orch.points()]
+
+
+def test_serpentine_2d(recipe):
+    orch = Orchestrator(recipe({"Y": {"kpz": "config_KPZ_Y.yaml", "start": 0, "stop": 2, "step": 1},
+                                "X": {"kpz": "config_KPZ_X.yaml", "start": 0, "stop": 3, "step": 1}},
+                               ["Y", "X"]))
+    assert visited(orch) == [(0, 0), (0, 1), (0, 2), (0, 3),
+                             (1, 3), (1, 2), (1, 1), (1, 0),
+                             (2, 0), (2, 1), (2, 2), (2, 3)]
+
+
+def test_raster_without_serpentine(recipe):
+    orch = Orchestrator(recipe({"Y": {"kpz": "config_KPZ_Y.yaml", "start": 0, "stop": 1, "step": 1},
+                                "X": {"kpz": "config_KPZ_X.yaml", "start": 0, "stop": 2, "step": 1}},
+                               ["Y", "X"], serpentine=False))
+    assert visited(orch) == [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2)]
+
+
+def test_serpentine_3d_moves_one_axis_one_step_at_a_time(recipe):
+    orch = Orchestrator(recipe({"Z": {"kpz": "config_KPZ.yaml", "start": 0, "stop": 2, "step": 1},
+                                "Y": {"kpz": "config_KPZ_Y.yaml", "start": 0, "stop": 2, "step": 1},
+                                "X": {"kpz": "config_KPZ_X.yaml", "start": 0, "stop": 3, "step": 1}},
+                               ["Z", "Y", "X"]))
+    points = visited(orch)
+    assert orch.shape == (3, 3, 4)
+    assert sorted(points) == sorted(np.ndindex(*orch.shape))
+    steps = np.abs(np.diff(np.array(points), axis=0))
+    assert (steps.sum(axis=1) == 1).all()
+    assert [p[0] for p in points] == sorted(p[0] for p in points)  # Z, boucle externe, ne revient jamais
+
+
+def test_interleaved_axes_move_together(recipe):
+    orch = Orchestrator(recipe({"Y1": {"kpz": "config_KPZ_Y.yaml", "start": 0, "stop": 10, "step": 10},
+                                "Y2": {"kpz": "config_KPZ_Y2.yaml", "start": 20, "stop": 40, "step": 20},
+                                "X1": {"kpz": "config_KPZ_X.yaml", "start": 0, "stop": 2, "step": 1},
+                                "X2": {"kpz": "config_KPZ_X2.yaml", "start": 5, "stop": 7, "step": 1}},
+                               [["Y1", "Y2"], ["X1", "X2"]]))
+    assert orch.shape == (2, 3)
+    setpoints = [s for _, s in orch.points()]
+    assert [(s["Y1"], s["Y2"]) for s in setpoints] == [(0, 20)] * 3 + [(10, 40)] * 3
+    assert [(s["X1"], s["X2"]) for s in setpoints] == [(0, 5), (1, 6), (2, 7), (2, 7), (1, 6), (0, 5)]
+
+
+def test_interleaved_axes_need_the_same_number_of_points(recipe):
+    with pytest.raises(ValueError):
+        Orchestrator(recipe({"X1": {"kpz": "config_KPZ_X.yaml", "start": 0, "stop": 2, "step": 1},
+                             "X2": {"kpz": "config_KPZ_X2.yaml", "start": 0, "stop": 3, "step": 1}},
+                            [["X1", "X2"]]))
+
+
+def test_run_on_emulated_axes(emulated, recipe, tmp_path):
+    output = tmp_path / "scan.csv"
+    path = recipe({"Y": {"kpz": "config_KPZ_Y.yaml", "start": 0, "stop": 20, "step": 10},
+                   "X": {"kpz": "config_KPZ_X.yaml", "ksg": "config_KSG_X.yaml", "start": 1, "stop": 3, "step": 1}},
+                  ["Y", "X"], closed_loop={"sleep": 0.0}, output=str(output))
+    with Orchestrator(path) as orch:
+        stage_y = orch.kpz["Y"].dev.ftdi.stage
+        voltages = []
+        result = orch.run(lambda: voltages.append(stage_y.voltage) or len(voltages))
+
+    assert result.shape == (3, 3)
+    np.testing.assert_array_equal(result, [[1, 2, 3], [6, 5, 4], [7, 8, 9]])
+    assert voltages == pytest.approx([0] * 3 + [10] * 3 + [20] * 3, abs=0.01)  # tension quantifiée sur 15 bits
+    with open(output) as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    assert rows[0] == ["i0", "i1", "Y", "X", "value"]
+    assert [row[:2] for row in rows[1:4]] == [["0", "0"], ["0", "1"], ["0", "2"]]
+    assert [row[:2] for row in rows[4:7]] == [["1", "2"], ["1", "1"], ["1", "0"]]
+    assert not any(ftdi.is_open for ftdi in emulated.instances)
+
+
+def test_devices_are_closed_when_one_fails_to_open(emulated, recipe):
+    path = recipe({"Y": {"kpz": "config_KPZ_Y.yaml", "ksg": "config_KSG_Y.yaml", "start": 0, "stop": 1, "step": 1},
+                   "X": {"kpz": "config_KPZ_X.yaml", "ksg": "config_KSG_X.yaml", "start": 0, "stop": 1, "step": 1}},
+                  ["Y", "X"])
+    emulated.fail_open = {"59000407"}
+    with pytest.raises(OSError):
+        with Orchestrator(path):
+            pass
+    assert len(emulated.instances) == 4
+    assert not any(ftdi.is_open for ftdi in emulated.instances)
+
+
+def test_devices_are_closed_when_setup_fails(emulated, recipe, monkeypatch):
+    path = recipe({"X": {"kpz": "config_KPZ_X.yaml", "ksg": "config_KSG_X.yaml", "start": 0, "stop": 1, "step": 1}},
+                  ["X"])
+
+    def broken_zeroing(self):
+        raise IOError("zeroing failed")
+
+    monkeypatch.setattr(orchestrator.KSG101, "zeroing", broken_zeroing)
+    orch = Orchestrator(path)
+    with pytest.raises(IOError):
+        orch.__enter__()
+    assert not orch.kpz and not orch.ksg
+    assert len(emulated.instances) == 2
+    assert not any(ftdi.is_open for ftdi in emulated.instances)
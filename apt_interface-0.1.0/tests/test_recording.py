@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""recording : écriture par paquets, relecture memmap, ReplaySource et analyse hors ligne"""
+
+import os
+
+import numpy as np
+import pytest
+
+from apt_interface.SPCNT import FrequencyBlock
+from apt_interface.histogram import FixedBinHistogram
+from apt_interface.recording import (HEADER_SIZE, RECORD, FrequencyRecorder, ReplaySource, analyse,
+                                     block_times, load)
+from apt_interface.stability import AllanDeviation
+
+
+def blocks(n_blocks: int = 10, size: int = 37, period: float = 1e-3) -> list[FrequencyBlock]:
+    rng = np.random.default_rng(5)
+    return [FrequencyBlock(100.0 + (k + 1) * size * period, size * period, rng.uniform(0, 1000, size))
+            for k in range(n_blocks)]
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "freq.bin"
+    with FrequencyRecorder(str(path), chunk_size=50) as recorder:  # paquets à cheval sur les blocs
+        for block in blocks():
+            recorder.write_block(block)
+    return str(path)
+
+
+def test_block_times_are_spread_over_the_block():
+    times = block_times(FrequencyBlock(10.0, 1.0, np.zeros(4)))
+    np.testing.assert_allclose(times, [9.25, 9.5, 9.75, 10.0])
+
+
+def test_records_round_trip(recording):
+    records = load(recording)
+    expected = blocks()
+    assert len(records) == 10 * 37
+    np.testing.assert_allclose(records["f"], np.concatenate([b.frequencies for b in expected]).astype(np.float32))
+    np.testing.assert_allclose(records["t"], np.concatenate([block_times(b) for b in expected]))
+    assert (np.diff(records["t"]) > 0).all()
+
+
+def test_appending_keeps_a_single_header(recording):
+    with FrequencyRecorder(recording) as recorder:
+        recorder.write_block(FrequencyBlock(200.0, 0.1, np.array([1.0, 2.0])))
+    assert os.path.getsize(recording) == HEADER_SIZE + (10 * 37 + 2) * RECORD.itemsize
+    np.testing.assert_array_equal(load(recording)["f"][-2:], [1.0, 2.0])
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\x00" * 64)
+    with pytest.raises(ValueError):
+        load(str(path))
+
+
+def test_replay_gives_back_the_recorded_samples(recording):
+    records = load(recording)
+    with ReplaySource(recording, block_size=64, realtime=False) as source:
+        replayed = []
+        while True:
+            try:
+                block = source.read_block()
+            except EOFError:
+                break
+            replayed.append(block)
+    np.testing.assert_array_equal(np.concatenate([b.frequencies for b in replayed]), records["f"])
+    assert replayed[-1].timestamp == records["t"][-1]
+    assert sum(b.duration for b in replayed) == pytest.approx(records["t"][-1] - records["t"][0])
+
+
+def test_analyse_by_chunks_matches_a_single_pass(recording):
+    histogram, allan = analyse(recording, chunk_size=23, allan=AllanDeviation(max_m=16))
+    frequencies = load(recording)["f"].astype(float)
+
+    expected = FixedBinHistogram()
+    expected.add_many(frequencies)
+    np.testing.assert_array_equal(histogram.counts, expected.counts)
+
+    single = AllanDeviation(max_m=16)
+    single.update(frequencies, 0.0)
+    np.testing.assert_allclose(allan.deviation()[1], single.deviation()[1], rtol=1e-9)
+    assert allan.n_samples == len(frequencies)
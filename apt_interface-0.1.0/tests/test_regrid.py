@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""regrid : IDW par index de cases contre un calcul direct, moyenne par case"""
+
+import numpy as np
+import pytest
+
+from apt_interface.regrid import CellIndex, Grid, bin_points, interpolate_idw, make_grid, regrid
+
+
+def idw_brute_force(x, y, values, grid, radius, power=2.0):
+    gx, gy = np.meshgrid(grid.x, grid.y)
+    d2 = (gx.ravel()[:, None] - x[None, :]) ** 2 + (gy.ravel()[:, None] - y[None, :]) ** 2
+    weights = np.where(d2 <= radius ** 2, 1.0 / np.maximum(d2, 1e-24) ** (power / 2), 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return ((weights @ values) / weights.sum(axis=1)).reshape(grid.ny, grid.nx)
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 10, 2000)
+    y = rng.uniform(-5, 5, 2000)
+    return x, y, np.sin(x) + np.cos(y)
+
+
+@pytest.mark.parametrize("radius", [0.3, 0.75, 2.0])
+def test_idw_matches_brute_force(points, radius):
+    x, y, values = points
+    grid = make_grid(x, y, 0.5)
+    expected = idw_brute_force(x, y, values, grid, radius)
+    result = interpolate_idw(x, y, values, grid, radius)
+    np.testing.assert_allclose(result, expected, rtol=1e-10, equal_nan=True)
+
+
+def test_idw_chunks_do_not_change_the_result(points):
+    x, y, values = points
+    grid = make_grid(x, y, 0.5)
+    np.testing.assert_allclose(interpolate_idw(x, y, values, grid, 0.75, chunk=50),
+                               interpolate_idw(x, y, values, grid, 0.75), equal_nan=True)
+
+
+def test_idw_is_exact_on_a_measured_node():
+    x = np.array([0.0, 1.0, 0.4])
+    y = np.array([0.0, 0.0, 0.3])
+    result = interpolate_idw(x, y, np.array([3.0, 7.0, 1.0]), Grid(0.0, 0.0, 1.0, 1.0, 2, 1), radius=0.9)
+    np.testing.assert_allclose(result, [[3.0, 7.0]])
+
+
+def test_cell_index_finds_all_points_within_a_cell(points):
+    x, y, _ = points
+    index = CellIndex(x, y, 0.8)
+    qx, qy = np.array([3.1, 0.0, 9.9]), np.array([0.2, -5.0, 4.9])
+    q, p = index.neighbours(qx, qy)
+    for k in range(len(qx)):
+        near = np.flatnonzero(np.hypot(x - qx[k], y - qy[k]) <= 0.8)
+        assert set(near) <= set(p[q == k])
+
+
+def test_bin_points_averages_each_cell():
+    x = np.array([0.1, -0.2, 1.1, 2.4, 2.6])
+    y = np.array([0.0, 0.1, 0.0, 0.0, 0.0])
+    values = np.array([1.0, 3.0, 5.0, 7.0, 9.0])
+    grid = Grid(0.0, 0.0, 1.0, 1.0, 4, 1)
+    np.testing.assert_allclose(bin_points(x, y, values, grid, chunk=2), [[2.0, 5.0, 7.0, 9.0]])
+
+
+def test_bin_points_ignores_points_outside_the_grid():
+    grid = Grid(0.0, 0.0, 1.0, 1.0, 2, 2)
+    result = bin_points(np.array([0.0, 5.0]), np.array([0.0, 0.0]), np.array([4.0, 8.0]), grid)
+    assert result[0, 0] == 4.0
+    assert np.isnan(result).sum() == 3
+
+
+def test_regrid_drops_non_finite_points():
+    x = np.array([0.0, 1.0, np.nan, 2.0])
+    y = np.zeros(4)
+    values = np.array([1.0, np.inf, 3.0, 5.0])
+    result, grid = regrid(x, y, values, 1.0)
+    assert (grid.nx, grid.ny) == (3, 1)
+    np.testing.assert_array_equal(np.isnan(result), [[False, True, False]])
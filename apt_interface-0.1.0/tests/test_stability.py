@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""stability : écart-type d'Allan incrémental contre le calcul direct, statistiques glissantes"""
+
+import numpy as np
+import pytest
+
+from apt_interface.stability import AllanDeviation, SlidingStats
+
+
+def adev_direct(frequencies: np.ndarray, m: int) -> float:
+    """Écart-type d'Allan recouvrant, sur toute la série à la fois"""
+    phase = np.cumsum(frequencies - frequencies[0])
+    d = phase[2 * m:] - 2 * phase[m:-m] + phase[:-2 * m]
+    return float(np.sqrt(np.mean(d ** 2) / (2 * m ** 2)))
+
+
+@pytest.mark.parametrize("block", [1, 7, 100, 5000])
+def test_incremental_matches_direct(block):
+    rng = np.random.default_rng(3)
+    frequencies = 1e6 + rng.normal(0, 2.0, 5000) + np.cumsum(rng.normal(0, 0.05, 5000))
+    allan = AllanDeviation(max_m=512)
+    for start in range(0, len(frequencies), block):
+        allan.update(frequencies[start:start + block], 1e-3 * len(frequencies[start:start + block]))
+
+    tau, adev = allan.deviation()
+    m = np.round(tau / 1e-3).astype(int)
+    np.testing.assert_array_equal(m, allan.m)
+    expected = [adev_direct(frequencies, int(k)) for k in m]
+    np.testing.assert_allclose(adev, expected, rtol=1e-9)
+
+
+def test_white_frequency_noise_averages_down():
+    rng = np.random.default_rng(4)
+    allan = AllanDeviation(max_m=100)
+    allan.update(rng.normal(0, 1.0, 200_000), 200.0)
+    tau, adev = allan.deviation()
+    np.testing.assert_allclose(adev, 1.0 / np.sqrt(allan.m), rtol=0.1)
+    assert allan.tau0 == pytest.approx(1e-3)
+
+
+def test_only_computable_tau_are_reported():
+    allan = AllanDeviation(max_m=1000)
+    allan.update(np.arange(25.0), 1.0)
+    tau, _ = allan.deviation()
+    assert len(tau) and (tau / allan.tau0 <= 12).all()
+    assert AllanDeviation().deviation()[0].size == 0
+
+
+def test_sliding_stats_keep_the_last_window():
+    stats = SlidingStats(window=10)
+    assert np.isnan(stats.mean) and np.isnan(stats.std)
+    values = np.arange(25.0)
+    stats.update(values[:13])
+    stats.update(values[13:])
+    assert stats.mean == pytest.approx(values[-10:].mean())
+    assert stats.std == pytest.approx(values[-10:].std(ddof=1))
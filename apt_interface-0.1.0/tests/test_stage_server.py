@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""stage_server / stage_client : protocole binaire sur un serveur de platines émulées"""
+
+import json
+import os
+import socket
+import stat
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from apt_interface.stage_client import StageClient, StageError
+from apt_interface.stage_server import (AXIS_READ_UM, COMMAND, DEVICE_ERROR, KSG_GET_IO, KSG_READ, KSG_READ_MANY,
+                                        MAX_READ_MANY, OK, PING, REQUEST, RESULT, TABLE, UNKNOWN_DEVICE,
+                                        UNKNOWN_OPCODE, StageServer, recv_exact, result_count)
+
+
+@pytest.fixture
+def server(tmp_path, conf_dir):
+    config = {
+        "socket": str(tmp_path / "stages.sock"),
+        "devices": {
+            "kpz_x": {"kind": "KPZ101", "config": os.path.join(conf_dir, "config_KPZ_X.yaml")},
+            "ksg_x": {"kind": "KSG101", "config": os.path.join(conf_dir, "config_KSG_X.yaml")},
+            "kpz_y": {"kind": "KPZ101", "config": os.path.join(conf_dir, "config_KPZ_Y.yaml")},
+            "ksg_y": {"kind": "KSG101", "config": os.path.join(conf_dir, "config_KSG_Y.yaml")},
+        },
+        "axes": {"x": {"kpz": "kpz_x", "ksg": "ksg_x"}, "y": {"kpz": "kpz_y", "ksg": "ksg_y"}},
+        "closed_loop": {"gain": 0.002, "tol_um": 0.5, "sleep": 0.0, "max_iter": 200, "n_avg": 4},
+        "emulate": True,
+    }
+    path = tmp_path / "stage_server.yaml"
+    path.write_text(json.dumps(config))  # le JSON est du YAML valide
+
+    with StageServer(str(path)) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        while server._server is None or not os.path.exists(server.conf.socket):
+            time.sleep(0.01)
+        yield server
+        server.shutdown()
+        thread.join()
+
+
+@pytest.fixture
+def client(server):
+    with StageClient(server.conf.socket) as client:
+        client.kpz("kpz_x").enable_output()
+        client.kpz("kpz_y").enable_output()
+        yield client
+
+
+def test_result_count():
+    assert result_count(KSG_READ, 0) == 1
+    assert result_count(KSG_GET_IO, 0) == 2
+    assert result_count(KSG_READ_MANY, 10) == 10
+    assert result_count(KSG_READ_MANY, 0) == 1
+    assert result_count(KSG_READ_MANY, 10 * MAX_READ_MANY) == MAX_READ_MANY
+
+
+def test_socket_is_private(server):
+    assert stat.S_IMODE(os.stat(server.conf.socket).st_mode) == 0o600
+
+
+def test_raw_framing(server):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(server.conf.socket)
+        size, = TABLE.unpack(recv_exact(sock, TABLE.size))
+        names = [d["name"] for d in json.loads(recv_exact(sock, size))["devices"]]
+        assert names == ["kpz_x", "ksg_x", "kpz_y", "ksg_y", "x", "y"]
+
+        commands = [(PING, 0, 0.0), (KSG_READ_MANY, 1, 3), (KSG_GET_IO, 1, 0.0), (KSG_READ, 0, 0.0),
+                    (PING, 42, 0.0)]
+        sock.sendall(REQUEST.pack(len(commands), 1234) + b"".join(COMMAND.pack(*c) for c in commands))
+        count, request_id = REQUEST.unpack(recv_exact(sock, REQUEST.size))
+        assert (count, request_id) == (1 + 3 + 2 + 1 + 1, 1234)
+        results = list(RESULT.iter_unpack(recv_exact(sock, count * RESULT.size)))
+
+    statuses = [status for status, _ in results]
+    assert statuses == [OK] * 6 + [UNKNOWN_OPCODE, UNKNOWN_DEVICE]
+    assert results[4:6] == [(OK, 1.0), (OK, 2.0)]  # unité puis sortie
+
+
+def test_batch_of_moves_and_reads(client):
+    with client.batch() as batch:
+        x = batch.move_um("x", 5.0)
+        many = batch.read_many("ksg_x", 20)
+        y = batch.move_um("y", 2.0)
+        read_y = batch.read_um("y")
+        single = batch.get_reading("ksg_y")
+
+    assert x.status == y.status == OK
+    assert abs(x.value - 5.0) < 0.5 and abs(y.value - 2.0) < 0.5
+    assert isinstance(many.value, np.ndarray) and many.value.shape == (20,)
+    assert abs(read_y.value - 2.0) < 1.0
+    assert single.status == OK and single.value != 0
+
+
+def test_remote_devices_mirror_the_local_api(client):
+    ksg = client.ksg("ksg_x")
+    assert ksg.read_many(MAX_READ_MANY + 10).shape == (MAX_READ_MANY + 10,)
+    stats = ksg.read_stats(8)
+    assert stats.used + stats.rejected == 8
+    assert ksg.get_io() == (1, 2)
+    assert ksg.get_max_travel() == 200
+    assert client.move_um("x", 3.0) == pytest.approx(3.0, abs=0.5)
+
+
+def test_errors_become_stage_errors(client):
+    with pytest.raises(StageError):
+        client.kpz("kpz_x").set_output_voltage(1000)  # hors limites : DEVICE_ERROR
+    with pytest.raises(StageError):
+        with client.batch() as batch:
+            ok = batch.get_reading("ksg_x")
+            bad = batch.set_output_voltage("kpz_y", -1)
+    assert ok.status == OK and bad.status == DEVICE_ERROR
+    with pytest.raises(TypeError):
+        client.kpz("ksg_x")
+    with pytest.raises(KeyError):
+        client.ksg("nothing")
+    assert client.command(AXIS_READ_UM, "x", kind="axis") == pytest.approx(client.read_um("x"), abs=1.0)
+
+
+def test_commands_on_one_device_are_serialized(server, client):
+    index = server.names.index("ksg_x")
+    device = server.objects[index]
+    active = []
+    overlaps = []
+    original = device.get_reading
+
+    def slow_reading():
+        active.append(1)
+        overlaps.append(len(active))
+        time.sleep(0.005)
+        active.pop()
+        return original()
+
+    device.get_reading = slow_reading
+
+    def worker():
+        with StageClient(server.conf.socket) as other:
+            for _ in range(10):
+                other.ksg("ksg_x").get_reading()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    client.read_um("x")  # l'axe prend aussi le verrou de ksg_x
+    for thread in threads:
+        thread.join()
+    assert len(overlaps) >= 40 and max(overlaps) == 1
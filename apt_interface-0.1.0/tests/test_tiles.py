@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""tiles : niveau 0 contre une carte dense, niveaux de la pyramide contre nanmean"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+from apt_interface.tiles import TiledMap
+
+
+def dense(tiled: TiledMap, level: int) -> np.ndarray:
+    """Niveau `level` reconstitué en une seule carte (NaN hors tuiles allouées)"""
+    t = tiled.tile
+    span = tiled.span(level)
+    ny, nx = -(-tiled.ny // span) * t, -(-tiled.nx // span) * t
+    result = np.full((ny, nx), np.nan, dtype=np.float32)
+    for (ty, tx), tile in tiled.tiles[level].items():
+        result[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t] = tile
+    return result
+
+
+def reference_pyramid(reference: np.ndarray, tile: int, n_levels: int) -> list[np.ndarray]:
+    """Réductions successives par 2 (nanmean des blocs 2 x 2) de la carte complétée par des NaN"""
+    span = tile << (n_levels - 1)
+    ny, nx = -(-reference.shape[0] // span) * span, -(-reference.shape[1] // span) * span
+    level = np.full((ny, nx), np.nan, dtype=np.float32)
+    level[:reference.shape[0], :reference.shape[1]] = reference
+    levels = [level]
+    for _ in range(1, n_levels):
+        a, b = level.shape
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # blocs entièrement NaN
+            level = np.nanmean(level.reshape(a // 2, 2, b // 2, 2), axis=(1, 3))
+        levels.append(level)
+    return levels
+
+
+def check(tiled: TiledMap, reference: np.ndarray) -> None:
+    for level, expected in enumerate(reference_pyramid(reference, tiled.tile, tiled.n_levels)):
+        result = dense(tiled, level)
+        ny, nx = min(result.shape[0], expected.shape[0]), min(result.shape[1], expected.shape[1])
+        # hors des tuiles allouées, la référence n'a que des NaN
+        assert np.isnan(expected[ny:]).all() and np.isnan(expected[:, nx:]).all()
+        np.testing.assert_allclose(result[:ny, :nx], expected[:ny, :nx], rtol=1e-5, atol=1e-6, equal_nan=True)
+
+
+@pytest.mark.parametrize("shape", [(50, 70), (64, 64), (33, 200)])
+def test_raster_rows_match_dense_reference(shape):
+    ny, nx = shape
+    tiled = TiledMap(ny, nx, tile=8)
+    reference = np.full(shape, np.nan, dtype=np.float32)
+    rng = np.random.default_rng(1)
+    for j in range(ny):
+        values = rng.normal(size=nx).astype(np.float32)
+        tiled.set(np.full(nx, j), np.arange(nx), values)
+        reference[j] = values
+        if j % 7 == 0:
+            check(tiled, reference)
+    check(tiled, reference)
+
+
+def test_scattered_writes_and_overwrites():
+    tiled = TiledMap(40, 40, tile=4)
+    reference = np.full((40, 40), np.nan, dtype=np.float32)
+    rng = np.random.default_rng(2)
+    for _ in range(30):
+        j = rng.integers(0, 40, 25)
+        i = rng.integers(0, 40, 25)
+        values = rng.normal(size=25).astype(np.float32)
+        tiled.set(j, i, values)
+        for jj, ii, v in zip(j, i, values):  # le dernier point écrit l'emporte
+            reference[jj, ii] = v
+        check(tiled, reference)
+
+
+def test_tiles_are_allocated_on_first_write():
+    tiled = TiledMap(1000, 1000, tile=16)
+    assert tiled.nbytes == 0
+    tiled.set([5], [900], [1.0])
+    assert list(tiled.tiles[0]) == [(0, 56)]
+    assert tiled.get(5, 900) == 1.0
+    assert np.isnan(tiled.get(500, 500))
+    assert tiled.nbytes == tiled.n_levels * 16 * 16 * 4
+
+
+def test_versions_and_visible_tiles():
+    tiled = TiledMap(64, 64, tile=8)
+    tiled.set([0, 0], [0, 40], [1.0, 2.0])
+    assert tiled.versions[0] == {(0, 0): 1, (0, 5): 1}
+    tiled.set([1], [1], [3.0])
+    assert tiled.versions[0] == {(0, 0): 2, (0, 5): 1}
+    assert tiled.visible(0, 0, 20, 0, 20) == [(0, 0)]
+    assert sorted(tiled.visible(0, 0, 63, 0, 63)) == [(0, 0), (0, 5)]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""transport : BlockChannel contre une liste de référence"""
+
+import threading
+
+import numpy as np
+
+from apt_interface.transport import BlockChannel, ScanChannel
+
+
+def test_drain_returns_pending_rows_once():
+    channel = BlockChannel(3, capacity=4)
+    assert len(channel) == 0 and channel.drain().shape == (0, 3)
+    channel.append(0, 1, 2.5)
+    channel.append(1, 1, 3.5)
+    assert len(channel) == 2
+    np.testing.assert_array_equal(channel.drain(), [[0, 1, 2.5], [1, 1, 3.5]])
+    assert len(channel) == 0 and len(channel.drain()) == 0
+
+
+def test_buffer_grows_when_not_drained_in_time():
+    channel = BlockChannel(2, capacity=3)
+    reference = []
+    for k in range(10):
+        channel.append(k, -k)
+        reference.append((k, -k))
+    np.testing.assert_array_equal(channel.drain(), reference)
+    channel.append(99, 98)  # capacité agrandie conservée, écriture depuis le début
+    np.testing.assert_array_equal(channel.drain(), [[99, 98]])
+
+
+def test_drained_block_is_a_copy():
+    channel = BlockChannel(1, capacity=2)
+    channel.append(1.0)
+    block = channel.drain()
+    channel.append(2.0)
+    assert block[0, 0] == 1.0
+
+
+def test_concurrent_writer_and_reader_lose_nothing():
+    channel = BlockChannel(2, capacity=8)
+    n = 20000
+
+    def writer():
+        for k in range(n):
+            channel.append(k, 2 * k)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    blocks = []
+    while thread.is_alive():
+        blocks.append(channel.drain())
+    thread.join()
+    blocks.append(channel.drain())
+    rows = np.concatenate(blocks)
+    np.testing.assert_array_equal(rows[:, 0], np.arange(n))
+    np.testing.assert_array_equal(rows[:, 1], 2 * np.arange(n))
+
+
+def test_scan_channel_widths():
+    channel = ScanChannel()
+    assert (channel.points.width, channel.convergence.width) == (3, 2)
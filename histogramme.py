@@ -1,22 +1,27 @@
-import pyvisa
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
+import argparse
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QLabel
+from PyQt5.QtCore import QTimer
 import pyqtgraph as pg
-from collections import Counter
 import threading
-import time
-import random
+import numpy as np
+from apt_interface.histogram import FixedBinHistogram
+from apt_interface.SPCNT import SPCNT, SPCNTConfig
+from apt_interface.stability import SlidingStats, AllanDeviation
+from apt_interface.recording import FrequencyRecorder, ReplaySource
 n_moy = 50
+fenetre = 1000 # échantillons de la moyenne glissante
+refresh_rate = 10 # rafraîchissements de l'histogramme par seconde
 
 class FrequencyHistogram(QMainWindow):
-    def __init__(self):
+    def __init__(self, source=None, recorder=None):
         super().__init__()
         self.setWindowTitle("Histogramme des Fréquences")
         self.setGeometry(100, 100, 800, 600)
         
         # Configuration de la fenêtre
         self.main_widget = QWidget()
-        self.layout = QVBoxLayout(self.main_widget)
+        self.layout = QHBoxLayout(self.main_widget)
         self.setCentralWidget(self.main_widget)
         
         # Histogramme
@@ -30,77 +35,115 @@ class FrequencyHistogram(QMainWindow):
         self.histogram_plot.setMouseEnabled(x=False, y=True)
         self.histogram_plot.getViewBox().setLimits(xMin=-50, xMax=1050) #fenêtrage
         
-        # init histogramme
-        self.frequency_counts = Counter()
-        self.frequency_bins = []
-        self.frequency_values = []
+        # init histogramme (classes fixes sur la fenêtre affichée)
+        self.histogram = FixedBinHistogram(low=-50, high=1050, bin_size=10)
+
+        # Stabilité : moyenne glissante et écart-type d'Allan, à côté de l'histogramme
+        self.sliding = SlidingStats(window=fenetre)
+        self.allan = AllanDeviation(max_m=100000)
+        self.stats_layout = QVBoxLayout()
+        self.layout.addLayout(self.stats_layout)
+        self.stats_label = QLabel()
+        self.stats_layout.addWidget(self.stats_label)
+        self.allan_plot = pg.PlotWidget()
+        self.allan_plot.setLogMode(x=True, y=True)
+        self.allan_plot.setLabel('left', 'Écart-type d\'Allan (Hz)')
+        self.allan_plot.setLabel('bottom', 'Tau (s)')
+        self.allan_curve = self.allan_plot.plot(pen='y', symbol='o', symbolSize=5)
+        self.stats_layout.addWidget(self.allan_plot)
         
-        # Initialiser PyVISA 
-        self.rm = pyvisa.ResourceManager()
-        self.instr = self.rm.open_resource('USB0::0x1313::0x8091::M01103986::INSTR') #identifiant de l'instrument
+        # Initialiser le compteur (lecture par blocs de block_size échantillons)
+        # ou l'enregistrement à relire
+        if source is None:
+            source = SPCNT(conf=SPCNTConfig(resource='USB0::0x1313::0x8091::M01103986::INSTR', #identifiant de l'instrument
+                                            block_size=n_moy))
+        self.counter = source
+        self.counter.__enter__()
+
+        # Enregistrement éventuel des échantillons (fichier binaire horodaté)
+        self.recorder = recorder
+        if self.recorder is not None:
+            self.recorder.__enter__()
         
         # Thread pour lire les données en temps réel
         self.running = True
         self.data_thread = threading.Thread(target=self.collect_data)
         self.data_thread.start()
 
-    def get_frequency_bin(self, frequency, bin_size=10):
-        """Regrouper une fréquence par tranches de `bin_size`"""
-        return int(frequency // bin_size) * bin_size
+        # Affichage rafraîchi dans le thread de l'interface, indépendamment de l'acquisition
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_histogram)
+        self.timer.start(int(1000 / refresh_rate))
 
     def collect_data(self):
         try:
-            compteur = 0
-            moyennes = 0
+            reste = np.empty(0) # échantillons pas encore moyennés
             while self.running:
-                compteur+=1
-                
-                frequency = int(self.instr.query("MEAS:FREQ?"))#lit la frequence sur le spcnt
+                block = self.counter.read_block() #lit un bloc de fréquences sur le spcnt
+                if self.recorder is not None:
+                    self.recorder.write_block(block)
                 
-                binned_freq = self.get_frequency_bin(frequency, bin_size=10)  # Regrouper par paquets (bin_size)
-                self.frequency_counts[binned_freq] += 1
-                self.update_histogram()
-                moyennes = moyennes + frequency
-                if compteur == n_moy :
-                    
-                    print(moyennes / n_moy)
-                    compteur=0
-                    moyennes=0
-                time.sleep(0.01)
+                self.histogram.add_many(block.frequencies)
+                self.sliding.update(block.frequencies)
+                self.allan.update(block.frequencies, block.duration)
+
+                # moyenne tous les n_moy échantillons
+                reste = np.concatenate([reste, block.frequencies])
+                n = len(reste) // n_moy * n_moy
+                for moyenne in reste[:n].reshape(-1, n_moy).mean(axis=1):
+                    print(moyenne)
+                reste = reste[n:]
                 
+        except EOFError:
+            print("Fin de l'enregistrement")
         except Exception as e:
             print("An error occurred:", e)
 
     def update_histogram(self):
-        # Normaliser les données
-        total_count = sum(self.frequency_counts.values())
-        if total_count > 0:
-            normalized_values = [count / total_count * 100 for count in self.frequency_counts.values()]
-        else:
-            normalized_values = []
+        # Normaliser les données (proportions en %)
+        frequency_values = self.histogram.proportions()
 
-        # Trier les intervalles et leurs valeurs
-        if self.frequency_counts:
-            self.frequency_bins, self.frequency_values = zip(*sorted(zip(self.frequency_counts.keys(), normalized_values)))
-        else:
-            self.frequency_bins, self.frequency_values = [], []
-        
         # Mettre à jour l'histogramme
         if self.bar_graph is None:
-            self.bar_graph = pg.BarGraphItem(x=self.frequency_bins, height=self.frequency_values, width=8, brush='r')
+            self.bar_graph = pg.BarGraphItem(x=self.histogram.bins, height=frequency_values, width=8, brush='r')
             self.histogram_plot.addItem(self.bar_graph)
         else:
-            self.bar_graph.setOpts(x=self.frequency_bins, height=self.frequency_values)
+            self.bar_graph.setOpts(height=frequency_values)
+
+        # Statistiques de stabilité
+        self.stats_label.setText(f"Moyenne glissante ({fenetre} éch.) : {self.sliding.mean:.2f} Hz\n"
+                                 f"Écart-type : {self.sliding.std:.2f} Hz")
+        tau, adev = self.allan.deviation()
+        if len(tau):
+            self.allan_curve.setData(tau, adev)
 
     def closeEvent(self, event):
         # Arrêter le thread proprement
         self.running = False
+        self.timer.stop()
         self.data_thread.join()
+        self.counter.__exit__()
+        if self.recorder is not None:
+            self.recorder.__exit__()
         event.accept()
 
 # Main
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Histogramme des fréquences du SPCNT")
+    parser.add_argument("--record", help="enregistre les échantillons dans ce fichier")
+    parser.add_argument("--replay", help="relit un enregistrement au lieu du compteur")
+    parser.add_argument("--fast", action="store_true", help="relecture aussi rapide que possible")
+    parser.add_argument("--resource", help="ressource VISA du compteur (SIM::SPCNT::... pour le simulateur)")
+    args = parser.parse_args()
+
+    source = None
+    if args.replay:
+        source = ReplaySource(args.replay, block_size=n_moy, realtime=not args.fast)
+    elif args.resource:
+        source = SPCNT(conf=SPCNTConfig(resource=args.resource, block_size=n_moy))
+    recorder = FrequencyRecorder(args.record) if args.record else None
+
     app = QApplication(sys.argv)
-    window = FrequencyHistogram()
+    window = FrequencyHistogram(source, recorder)
     window.show()
     sys.exit(app.exec_())